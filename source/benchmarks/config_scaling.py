@@ -0,0 +1,192 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+"""
+Measure how configuration lookup, validation and resource construction scale with the number of prefixes in the
+configuration file. Synthetic configurations are built from the prefix sections of the test fixture
+tests/fixtures/config_and_overrides.yaml. Resources are constructed against a stubbed Amazon Forecast client, so no
+AWS credentials or service calls are required.
+
+Run from the source directory: python -m benchmarks.config_scaling [--sizes 10,100,1000] [--check]
+"""
+
+import json
+import os
+import time
+import timeit
+
+import botocore.session
+import click
+import yaml
+from botocore.stub import Stubber
+
+import shared.helpers
+import shared.validation
+from shared.Dataset.dataset_file import DatasetFile
+from shared.config import Config
+from shared.validation import ModelValidator, ValidationCache
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "fixtures", "config_and_overrides.yaml"
+)
+
+# the valid prefix sections of the fixture - synthetic prefixes cycle through these
+TEMPLATES = [
+    "Override",
+    "RetailDemandTRM",
+    "RetailDemandTR",
+    "RetailDemandT",
+    "RetailDemandTNPTS",
+    "RetailDemandTRMProphet",
+]
+
+DEFAULT_SIZES = "10,100,1000,10000,50000"
+
+# lookups should not depend on the number of prefixes: fail --check if the largest config is this much slower
+MAX_LOOKUP_RATIO = 5.0
+
+
+def synthetic_config(prefixes) -> dict:
+    """
+    Build a synthetic configuration
+    :param prefixes: the number of prefixes to configure (in addition to Default)
+    :return: dict of the configuration, as it would be parsed from a configuration file
+    """
+    with open(FIXTURE, "r") as f:
+        fixture = yaml.safe_load(f)
+
+    config = {"Default": fixture["Default"]}
+    for n in range(prefixes):
+        config[f"Prefix{n:05d}"] = fixture[TEMPLATES[n % len(TEMPLATES)]]
+
+    # round trip the configuration so that each section is a distinct object, as it would be if parsed
+    return json.loads(json.dumps(config))
+
+
+def stub_clients():
+    """
+    Replace the global Amazon Forecast client with a stubbed client, and inject the AWS account and region
+    :return: the active Stubber - it has no queued responses, so any service call fails the benchmark
+    """
+    region = os.environ.setdefault("AWS_REGION", "us-east-1")
+    cli = botocore.session.get_session().create_client(
+        "forecast",
+        region_name=region,
+        aws_access_key_id="benchmark",
+        aws_secret_access_key="benchmark",
+    )
+    stubber = Stubber(cli)
+    stubber.activate()
+
+    shared.helpers.client_factory._clients["forecast"] = cli
+    shared.helpers.account_resolver = shared.helpers.AccountResolver(
+        account_id="1" * 12, region=region
+    )
+    return stubber
+
+
+def best_us(fn, number, repeat):
+    """
+    Time a function
+    :param fn: the function to time
+    :param number: the calls per run
+    :param repeat: the number of runs (the best run is reported)
+    :return: the time per call in microseconds
+    """
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+
+def measure(prefixes, number, repeat):
+    """
+    Measure configuration lookup, validation and resource construction for a synthetic configuration
+    :param prefixes: the number of prefixes to configure
+    :param number: the calls per run for per-file operations
+    :param repeat: the number of runs (the best run is reported)
+    :return: dict of timings
+    """
+    data = synthetic_config(prefixes)
+
+    # the last prefix is the worst case for any lookup that scans the configuration
+    dataset_file = DatasetFile(f"Prefix{prefixes - 1:05d}.csv", "benchmark")
+    unconfigured_file = DatasetFile("Unconfigured.csv", "benchmark")
+
+    start = time.perf_counter()
+    config = Config()
+    config.config = data
+    config.config_item(dataset_file, "Predictor")
+    first_lookup_ms = (time.perf_counter() - start) * 1e3
+
+    results = {
+        "prefixes": prefixes,
+        "first_lookup_ms": first_lookup_ms,
+        "config_item_us": best_us(
+            lambda: config.config_item(dataset_file, "Predictor"), number, repeat
+        ),
+        "config_item_default_us": best_us(
+            lambda: config.config_item(unconfigured_file, "Predictor"), number, repeat
+        ),
+        "required_datasets_us": best_us(
+            lambda: config.required_datasets(dataset_file), number, repeat
+        ),
+        "forecast_us": best_us(lambda: config.forecast(dataset_file), number, repeat),
+    }
+
+    # validate with an empty validation result cache, then again with the results of the first validation cached
+    shared.validation.validation_forecast_validator = ModelValidator(
+        "forecast", cache=ValidationCache()
+    )
+    config = Config()
+    config.config = data
+    start = time.perf_counter()
+    errors = config.validate()
+    results["validate_ms"] = (time.perf_counter() - start) * 1e3
+
+    config = Config()
+    config.config = data
+    start = time.perf_counter()
+    config.validate()
+    results["validate_cached_ms"] = (time.perf_counter() - start) * 1e3
+    results["validation_errors"] = len(errors)
+    return results
+
+
+@click.command()
+@click.option(
+    "--sizes", help="Comma separated numbers of prefixes.", default=DEFAULT_SIZES
+)
+@click.option("--number", help="Calls per run for per-file operations.", default=200)
+@click.option("--repeat", help="Number of runs (the best run is reported).", default=5)
+@click.option(
+    "--check",
+    help=f"Exit non-zero if lookups on the largest config are over {MAX_LOOKUP_RATIO}x slower than the smallest.",
+    is_flag=True,
+)
+def benchmark(sizes, number, repeat, check):
+    """Benchmark configuration lookup, validation and resource construction by number of prefixes"""
+    stubber = stub_clients()
+
+    results = [measure(int(size), number, repeat) for size in sizes.split(",") if size]
+    stubber.assert_no_pending_responses()
+
+    smallest, largest = results[0], results[-1]
+    ratios = {
+        name: largest[name] / smallest[name]
+        for name in ["config_item_us", "required_datasets_us", "forecast_us"]
+    }
+
+    click.echo(json.dumps({"sizes": results, "lookup_ratios": ratios}, indent=2))
+    if check and max(ratios.values()) > MAX_LOOKUP_RATIO:
+        raise click.ClickException(f"lookups do not scale: {ratios}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,135 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+"""
+Measure the cold start import time of each AWS Lambda handler with `python -X importtime`, and check it against a
+per-handler budget of import time and modules imported. Each handler is imported in a fresh interpreter; the best of
+--repeat runs is reported.
+
+Run from the source directory: python -m benchmarks.importtime [--check]
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import click
+
+# budgets for each handler module: its import time (milliseconds, best of 5, including botocore) and the number of
+# modules it imports. Measured on one vCPU at about 135-205 ms and 352-363 modules (the import time of botocore.session,
+# which every handler needs to create its clients, is about 140 ms of this) - the budgets leave about 10% for noise.
+BUDGETS = {
+    "lambdas.createdataset.handler": {"import_ms": 195, "modules": 365},
+    "lambdas.createdatasetgroup.handler": {"import_ms": 215, "modules": 365},
+    "lambdas.createdatasetimportjob.handler": {"import_ms": 215, "modules": 365},
+    "lambdas.createpredictor.handler": {"import_ms": 220, "modules": 365},
+    "lambdas.createforecast.handler": {"import_ms": 225, "modules": 365},
+    "lambdas.notification.handler": {"import_ms": 220, "modules": 365},
+    "lambdas.preparedataset.handler": {"import_ms": 215, "modules": 370},
+    "lambdas.sns.handler": {"import_ms": 215, "modules": 360},
+}
+
+# modules that no handler should load at import time - these are imported where they are used, if at all
+DEFERRED_MODULES = [
+    "boto3",
+    "s3transfer",
+    "packaging",
+    "yaml",
+    "pyarrow",
+    "botocore.stub",
+    "shared.validation",
+    "shared.Dataset.dataset",
+    "shared.Dataset.dataset_import_job",
+    "shared.Dataset.dataset_profile",
+    "shared.DatasetGroup.dataset_group",
+    "shared.Predictor.predictor",
+    "shared.Forecast.forecast",
+]
+
+
+def import_times(module):
+    """
+    Import a module in a fresh interpreter with -X importtime
+    :param module: the module name (e.g. lambdas.sns.handler)
+    :return: dict of imported module name to its cumulative import time in microseconds
+    """
+    env = dict(os.environ)
+    env.setdefault("AWS_REGION", "us-east-1")
+    # measure imports only - clients are created in the handler init phase
+    env.pop("CLIENT_WARMUP", None)
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module, repeat):
+    """
+    Measure the import time of a module
+    :param module: the module name (e.g. lambdas.sns.handler)
+    :param repeat: the number of fresh interpreter runs (the best run is reported)
+    :return: dict of import time (ms) and imported modules
+    """
+    runs = [import_times(module) for _ in range(repeat)]
+    best = min(runs, key=lambda times: times[module])
+    return {
+        "import_ms": best[module] / 1000,
+        "modules": len(best),
+        "shared_modules": sorted(name for name in best if name.startswith("shared")),
+        "deferred_modules": sorted(name for name in DEFERRED_MODULES if name in best),
+    }
+
+
+@click.command()
+@click.option(
+    "--repeat", help="Number of runs per handler (the best run is reported).", default=5
+)
+@click.option(
+    "--check", help="Exit non-zero if any handler exceeds its budget.", is_flag=True
+)
+def benchmark(repeat, check):
+    """Benchmark the import time of each AWS Lambda handler against its budget"""
+    results = {}
+    over_budget = []
+    for module, budget in BUDGETS.items():
+        result = measure(module, repeat)
+        result["budget_ms"] = budget["import_ms"]
+        result["budget_modules"] = budget["modules"]
+        results[module] = result
+        if (
+            result["import_ms"] > budget["import_ms"]
+            or result["modules"] > budget["modules"]
+            or result["deferred_modules"]
+        ):
+            over_budget.append(module)
+
+    click.echo(json.dumps(results, indent=2))
+    if check and over_budget:
+        raise click.ClickException(f"import time over budget: {', '.join(over_budget)}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,120 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+"""
+Compare the cost of validating Amazon Forecast resource parameters with the botocore Stubber (the previous
+InputValidator implementation) against the compiled botocore model validator, with and without the validation
+result cache.
+
+Run from the source directory: python -m benchmarks.validation
+"""
+
+import json
+import os
+import timeit
+
+import boto3
+import click
+from botocore.stub import Stubber
+
+from shared.validation import ModelValidator, ValidationCache
+
+PARAMS = {
+    "create_dataset_group": {"DatasetGroupName": "placeholder", "Domain": "RETAIL"},
+    "create_dataset": {
+        "DatasetName": "placeholder",
+        "DatasetType": "TARGET_TIME_SERIES",
+        "Domain": "RETAIL",
+        "DataFrequency": "D",
+        "Schema": {
+            "Attributes": [
+                {"AttributeName": "item_id", "AttributeType": "string"},
+                {"AttributeName": "timestamp", "AttributeType": "timestamp"},
+                {"AttributeName": "demand", "AttributeType": "float"},
+            ]
+        },
+    },
+    "create_predictor": {
+        "PredictorName": "placeholder",
+        "InputDataConfig": {"DatasetGroupArn": "placeholder"},
+        "AlgorithmArn": "arn:aws:forecast:::algorithm/NPTS",
+        "ForecastHorizon": 72,
+        "PerformAutoML": False,
+        "PerformHPO": False,
+        "FeaturizationConfig": {"ForecastFrequency": "D"},
+    },
+    "create_forecast": {
+        "ForecastName": "placeholder",
+        "PredictorArn": "placeholder",
+        "ForecastTypes": ["0.10", "0.50", "0.90"],
+    },
+}
+
+
+def stubber_validate(cli, method, params):
+    """The previous InputValidator implementation"""
+    with Stubber(cli) as stubber:
+        stubber.add_response(method, {}, params)
+        getattr(cli, method)(**params)
+
+
+@click.command()
+@click.option("--number", help="Validations per operation per run.", default=200)
+@click.option("--repeat", help="Number of runs (the best run is reported).", default=5)
+def benchmark(number, repeat):
+    """Benchmark Stubber-based validation against the compiled model validator"""
+    region = os.environ.setdefault("AWS_REGION", "us-east-1")
+    cli = boto3.client("forecast", region_name=region)
+
+    compile_s = min(
+        timeit.repeat(lambda: ModelValidator("forecast"), number=1, repeat=repeat)
+    )
+    validator = ModelValidator("forecast")
+    cached_validator = ModelValidator("forecast", cache=ValidationCache())
+
+    results = {"compile_s": compile_s, "operations": {}}
+    for method, params in PARAMS.items():
+        stubber_s = min(
+            timeit.repeat(
+                lambda: stubber_validate(cli, method, params),
+                number=number,
+                repeat=repeat,
+            )
+        )
+        model_s = min(
+            timeit.repeat(
+                lambda: validator.validate(method, **params),
+                number=number,
+                repeat=repeat,
+            )
+        )
+        cached_s = min(
+            timeit.repeat(
+                lambda: cached_validator.validate(method, **params),
+                number=number,
+                repeat=repeat,
+            )
+        )
+        results["operations"][method] = {
+            "stubber_us": stubber_s / number * 1e6,
+            "model_us": model_s / number * 1e6,
+            "cached_us": cached_s / number * 1e6,
+            "speedup": stubber_s / model_s,
+            "cached_speedup": stubber_s / cached_s,
+        }
+
+    click.echo(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    benchmark()
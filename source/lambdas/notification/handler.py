@@ -14,16 +14,30 @@
 import json
 from os import environ
 
+from botocore.exceptions import BotoCoreError, ClientError
+
+from shared.Dataset.dataset_file import MULTIPART_MARKER
 from shared.config import Config, ConfigNotFound
 from shared.helpers import get_sfn_client
+from shared.instrumentation import instrumented
 from shared.logging import get_logger
 from shared.s3.notification import Event
 
 logger = get_logger(__name__)
 
 
+def config_by_reference():
+    """
+    Check if the config should be passed to the state machine as a reference to a config snapshot in S3 (instead of
+    being embedded in the state machine input) using environment variable CONFIG_BY_REFERENCE
+    :return: True if the config should be passed by reference
+    """
+    return environ.get("CONFIG_BY_REFERENCE", "false").lower() in ["true", "yes", "1"]
+
+
+@instrumented
 def notification(event: dict, context):
-    """Handles an S3 Event Notification (for any .csv file written to any key under train/*)
+    """Handles an S3 Event Notification (for any .csv file or multipart dataset marker written to any key under train/*)
 
     :param dict event: AWS Lambda Event (in this case, an S3 Event message)
     :param context: The AWS Lambda Context object
@@ -34,14 +48,37 @@ def notification(event: dict, context):
     evt = Event(event)
     s3_config = None
 
+    if evt.shard:
+        logger.info(
+            "Ignoring shard %s - .csv files in a folder train/<name>/ are the shards of a multipart dataset, processed once train/<name>%s is written (upload other datasets as train/<name>.csv)"
+            % (evt.key, MULTIPART_MARKER)
+        )
+        return
+
+    if evt.stray_marker:
+        logger.warning(
+            "Ignoring %s - the marker of a multipart dataset train/<name>/ is written next to its folder as train/<name>%s"
+            % (evt.key, MULTIPART_MARKER)
+        )
+        return
+
     # Build the input to the state machine
     state_input = {"bucket": evt.bucket, "dataset_file": evt.key}
     logger.info(
         "Triggered by s3 notification on bucket %s, key %s" % (evt.bucket, evt.key)
     )
     try:
-        s3_config = Config.from_s3(evt.bucket)
-        state_input["config"] = s3_config.config
+        s3_config = Config.from_s3(evt.bucket, prefix=evt.file.prefix)
+        if config_by_reference():
+            try:
+                state_input["config_ref"] = s3_config.snapshot(evt.bucket)
+            except (BotoCoreError, ClientError) as excinfo:
+                logger.warning(
+                    "Could not store the config snapshot, passing the config inline: %s"
+                    % str(excinfo)
+                )
+        if "config_ref" not in state_input:
+            state_input["config"] = s3_config.config
     except ConfigNotFound as excinfo:
         logger.warning("The configuration file was not found")
         state_input["serviceError"] = {
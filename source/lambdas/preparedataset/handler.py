@@ -0,0 +1,195 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+from os import environ
+
+from botocore.exceptions import ClientError
+
+from shared.Dataset.dataset_file import DatasetFile
+from shared.Dataset.dataset_resampler import DatasetResampler
+from shared.Dataset.dataset_validator import DatasetValidationError
+from shared.Dataset.parquet_converter import PARQUET_FORMAT, ParquetConverter
+from shared.config import Config
+from shared.instrumentation import instrumented
+from shared.logging import get_logger
+from shared.status import Status
+
+logger = get_logger(__name__)
+
+
+def profile_max_bytes():
+    """
+    Get the largest dataset file to profile using environment variable DATASET_PROFILE_MAX_BYTES (larger files are
+    not profiled). Profiling is disabled if this is 0.
+    :return: the size in bytes
+    """
+    return int(environ.get("DATASET_PROFILE_MAX_BYTES", 0))
+
+
+def validation_max_bytes():
+    """
+    Get the largest dataset to validate before it is imported using environment variable DATASET_VALIDATION_MAX_BYTES
+    (larger datasets are imported without validation). Validation is disabled if this is 0.
+    :return: the size in bytes
+    """
+    return int(environ.get("DATASET_VALIDATION_MAX_BYTES", 0))
+
+
+def resample_max_bytes():
+    """
+    Get the largest dataset to resample using environment variable DATASET_RESAMPLE_MAX_BYTES (resampling larger
+    datasets fails). There is no limit if this is 0.
+    :return: the size in bytes
+    """
+    return int(environ.get("DATASET_RESAMPLE_MAX_BYTES", 0))
+
+
+def validate_dataset(config: Config, dataset_file: DatasetFile):
+    """
+    Validate a dataset file against its configuration before it is imported
+    :param config: the config for the dataset file
+    :param dataset_file: the dataset file
+    :return: the validation report, or None if the dataset file is too large to validate
+    :raises DatasetValidationError: if the dataset file does not match its configuration
+    """
+    size = dataset_file.head.get("ContentLength")
+    if size > validation_max_bytes():
+        logger.warning(
+            "not validating %s (%d bytes) before import - it is larger than DATASET_VALIDATION_MAX_BYTES"
+            % (dataset_file.key, size)
+        )
+        return None
+
+    # datasets that are resampled to their data frequency are not expected to be sampled at it
+    frequency = None
+    if config.aggregation(dataset_file) is None:
+        frequency = config.data_frequency(dataset_file)
+
+    report = dataset_file.validate(
+        config.dataset_schema(dataset_file),
+        config.data_timestamp_format(dataset_file),
+        frequency,
+    )
+    if not report.valid:
+        raise DatasetValidationError(report)
+    return report
+
+
+@instrumented
+def profiledataset(event, context):
+    """
+    Profile the dataset file that triggered the state machine, storing the profile in the dataset manifest. Profiling
+    is best effort - the dataset is imported whether or not it could be profiled.
+    :param event: lambda event
+    :param context: lambda context
+    :return: the dataset profile (without its per-column statistics), or None if the dataset was not profiled
+    """
+    config = Config.from_sfn(event)
+    dataset_file = DatasetFile(event.get("dataset_file"), event.get("bucket"))
+
+    try:
+        size = dataset_file.head.get("ContentLength")
+        if size > profile_max_bytes():
+            logger.info(
+                "not profiling %s (%d bytes) - it is larger than DATASET_PROFILE_MAX_BYTES"
+                % (dataset_file.key, size)
+            )
+            return None
+        profile = dataset_file.profile(config.dataset_schema(dataset_file))
+    except (ClientError, ValueError) as excinfo:
+        logger.warning("could not profile %s: %s" % (dataset_file.key, str(excinfo)))
+        return None
+
+    return {key: value for key, value in profile.items() if key != "Columns"}
+
+
+@instrumented
+def validatedataset(event, context):
+    """
+    Validate the dataset file that triggered the state machine before it is imported. A dataset file that was already
+    imported at its current version is not validated again.
+    :param event: lambda event
+    :param context: lambda context
+    :return: the validation report (without its errors), or None if the dataset was not validated
+    :raises DatasetValidationError: if the dataset file does not match its configuration
+    """
+    config = Config.from_sfn(event)
+    dataset_file = DatasetFile(event.get("dataset_file"), event.get("bucket"))
+
+    if config.dataset_import_job(dataset_file).status != Status.DOES_NOT_EXIST:
+        return None
+
+    report = validate_dataset(config, dataset_file)
+    if not report:
+        return None
+    return {key: value for key, value in report.as_dict().items() if key != "Errors"}
+
+
+@instrumented
+def resampledataset(event, context):
+    """
+    Resample the dataset file that triggered the state machine to its data frequency before it is imported, if it is
+    configured with an aggregation. A dataset file that was already imported at its current version is not resampled.
+    :param event: lambda event
+    :param context: lambda context
+    :return: the S3 key of the resampled dataset file, or None if the dataset was not resampled
+    :raises ValueError: if the dataset file is too large to resample
+    """
+    config = Config.from_sfn(event)
+    dataset_file = DatasetFile(event.get("dataset_file"), event.get("bucket"))
+
+    dataset_import = config.dataset_import_job(dataset_file)
+    if not dataset_import.resample or dataset_import.status != Status.DOES_NOT_EXIST:
+        return None
+
+    size = dataset_file.head.get("ContentLength")
+    max_bytes = resample_max_bytes()
+    if max_bytes and size > max_bytes:
+        raise ValueError(
+            f"{dataset_file.key} ({size} bytes) is too large to resample - it is larger than "
+            f"DATASET_RESAMPLE_MAX_BYTES ({max_bytes} bytes)"
+        )
+
+    return DatasetResampler(
+        dataset_file.cli,
+        config.dataset_schema(dataset_file),
+        config.data_frequency(dataset_file),
+        timestamp_format=config.data_timestamp_format(dataset_file),
+        data_type=dataset_file.data_type,
+        aggregation=config.aggregation(dataset_file),
+    ).resample(dataset_file)
+
+
+@instrumented
+def convertdataset(event, context):
+    """
+    Convert the dataset file that triggered the state machine (or its resampled copy) to Parquet before it is
+    imported, if it is configured with ImportFormat PARQUET. A dataset file that was already imported at its current
+    version is not converted.
+    :param event: lambda event
+    :param context: lambda context
+    :return: the S3 key of the converted dataset file (or folder), or None if the dataset was not converted
+    """
+    config = Config.from_sfn(event)
+    dataset_file = DatasetFile(event.get("dataset_file"), event.get("bucket"))
+
+    dataset_import = config.dataset_import_job(dataset_file)
+    if (
+        dataset_import.import_format != PARQUET_FORMAT
+        or dataset_import.status != Status.DOES_NOT_EXIST
+    ):
+        return None
+
+    return ParquetConverter(
+        dataset_file.cli, config.dataset_schema(dataset_file)
+    ).convert(dataset_import.import_file)
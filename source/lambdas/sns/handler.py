@@ -16,6 +16,7 @@ import os
 
 from shared.Dataset.dataset_file import DatasetFile
 from shared.helpers import get_sns_client
+from shared.instrumentation import instrumented
 from shared.logging import get_logger
 
 logger = get_logger(__name__)
@@ -63,9 +64,37 @@ def build_message(event):
     else:
         message = f"Forecast for {file.prefix} is ready!"
 
+    profile = event.get("dataset_profile")
+    if profile:
+        message += "\n\n" + profile_summary(file, profile)
+
     return message
 
 
+def profile_summary(file, profile):
+    """
+    Summarize the profile of the dataset file that triggered the forecast
+    :param file: the dataset file
+    :param profile: the dataset profile (from the state machine input)
+    :return: the summary
+    """
+    items = profile.get("Items")
+    if items is not None and profile.get("ItemsEstimated"):
+        items = f"about {items}"
+
+    summary = f"Dataset {file.filename}: {profile.get('Rows')} rows"
+    if items is not None:
+        summary += f", {items} items"
+    if profile.get("StartTimestamp"):
+        summary += (
+            f", from {profile.get('StartTimestamp')} to {profile.get('EndTimestamp')}"
+        )
+    if profile.get("Frequency"):
+        summary += f" (frequency {profile.get('Frequency')})"
+    return summary
+
+
+@instrumented
 def sns(event, context):
     """
     Send an SNS message
@@ -79,6 +108,7 @@ def sns(event, context):
     cli.publish(TopicArn=topic_arn(), Message=build_message(event))
 
 
+@instrumented
 def sns_conditional(event, context):
     """Send an SNS message if 'serviceError' is specified in the input.
     :param event: Lambda event
@@ -11,30 +11,79 @@
 #  and limitations under the License.                                                                                 #
 # #####################################################################################################################
 
+import hashlib
 import json
 from functools import cached_property
 from os.path import split
 
+from botocore.exceptions import ClientError
+
+from shared.Dataset.dataset_manifest import DatasetManifest
 from shared.Dataset.dataset_type import DatasetType
+from shared.Dataset.line_counter import LineCounter, default_chunk_size
 from shared.helpers import get_s3_client
 
+# written next to the folder of a multipart dataset (train/demand/ has marker train/demand_SUCCESS) once all of its
+# shards are written - Forecast imports every object in the folder, so the folder holds nothing but the shards
+MULTIPART_MARKER = "_SUCCESS"
+
 
 class DatasetFile:
-    """Stores characteristics of a dataset file uploaded for ingestion by the solution"""
+    """
+    Stores characteristics of a dataset file uploaded for ingestion by the solution. A key ending with / is a multipart
+    dataset: the .csv shards in that folder (e.g. train/demand/part-0000.csv) are one dataset, named for the folder.
+    It is processed once its marker (e.g. train/demand_SUCCESS) is written next to the folder.
+    """
 
     def __init__(self, key: str, bucket: str):
         self.key = key
         self.bucket = bucket
         self.cli = get_s3_client()
+        self.multipart = key.endswith("/")
 
-        if key.endswith(".related.csv"):
+        _, self.filename = split(key.rstrip("/"))
+        extension = "" if self.multipart else ".csv"
+        if self.filename.endswith(".related" + extension):
             self.data_type = DatasetType.RELATED_TIME_SERIES
-        elif key.endswith(".metadata.csv"):
+        elif self.filename.endswith(".metadata" + extension):
             self.data_type = DatasetType.ITEM_METADATA
         else:
             self.data_type = DatasetType.TARGET_TIME_SERIES
 
-        _, self.filename = split(key)
+    @staticmethod
+    def dataset_key(key: str) -> str:
+        """
+        Get the key of the dataset an S3 key belongs to
+        :param key: the S3 key
+        :return: the folder key (ending with /) for the marker of a multipart dataset, otherwise the key itself
+        """
+        if DatasetFile.is_marker(key):
+            return f"{key[: -len(MULTIPART_MARKER)]}/"
+        return key
+
+    @staticmethod
+    def is_marker(key: str) -> bool:
+        """
+        Check if an S3 key is the marker of a multipart dataset (<folder>_SUCCESS, next to the folder). A _SUCCESS
+        object inside a folder (e.g. train/demand/_SUCCESS) or directly under train/ is not the marker of any dataset.
+        :param key: the S3 key
+        :return: True if the key is a marker
+        """
+        _, filename = split(key)
+        return filename.endswith(MULTIPART_MARKER) and filename != MULTIPART_MARKER
+
+    @staticmethod
+    def is_shard(key: str) -> bool:
+        """
+        Check if an S3 key is a shard of a multipart dataset - a .csv object in a folder directly under train/ (e.g.
+        train/demand/part-0000.csv). Shards are processed once the marker is written. A .csv object nested deeper (e.g.
+        train/demand/2020/data.csv) is not a shard, and is processed as a dataset file of its own.
+        :param key: the S3 key
+        :return: True if the key is a shard
+        """
+        folder, filename = split(key)
+        parent, name = split(folder)
+        return filename.endswith(".csv") and bool(name) and split(parent)[1] == "train"
 
     @property
     def name(self):
@@ -53,29 +102,253 @@ class DatasetFile:
         return prefix
 
     @cached_property
-    def size(self) -> int:
+    def head(self) -> dict:
         """
-        Get the size of the dataset in lines (using S3 select)
-        :return: the size of the dataset in lines
+        Get the metadata of the current version of the dataset file
+        :return: the S3 HeadObject response (for a multipart dataset, its total size and an ETag of its shards)
+        """
+        if not self.multipart:
+            return self.cli.head_object(Bucket=self.bucket, Key=self.key)
+
+        etags = hashlib.sha256()
+        for shard in self.shards:
+            etags.update(f"{shard['Key']}:{shard['ETag']}\n".encode("utf-8"))
+        return {
+            "ETag": f"multipart-{etags.hexdigest()}",
+            "ContentLength": sum(shard["Size"] for shard in self.shards),
+        }
+
+    @cached_property
+    def shards(self) -> list:
+        """
+        Get the shards of a multipart dataset - the .csv objects in its folder. The folder is imported as a whole, so
+        it must not hold any other object. If the marker of the dataset lists the names of its shards (as JSON
+        {"Files": [...]}) they must all be present.
+        :return: list of dict of the Key, ETag and Size of each shard, sorted by key
+        """
+        shards = []
+        others = []
+        paginator = self.cli.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.key):
+            for obj in page.get("Contents", []):
+                folder, _ = split(obj["Key"])
+                if f"{folder}/" == self.key and DatasetFile.is_shard(obj["Key"]):
+                    shards.append(
+                        {"Key": obj["Key"], "ETag": obj["ETag"], "Size": obj["Size"]}
+                    )
+                else:
+                    others.append(obj["Key"])
+
+        if others:
+            raise ValueError(
+                f"multipart dataset {self.key} must only hold .csv shards, found {', '.join(sorted(others))}"
+            )
+
+        names = {split(shard["Key"])[1] for shard in shards}
+        missing = sorted(set(self._expected_shards()) - names)
+        if missing:
+            raise ValueError(
+                f"multipart dataset {self.key} is missing shards {', '.join(missing)}"
+            )
+        if not shards:
+            raise ValueError(f"multipart dataset {self.key} has no shards")
+        return sorted(shards, key=lambda shard: shard["Key"])
+
+    def _expected_shards(self) -> list:
+        try:
+            body = self.cli.get_object(
+                Bucket=self.bucket, Key=self.key.rstrip("/") + MULTIPART_MARKER
+            )["Body"].read()
+        except ClientError:
+            return []
+        if not body.strip():
+            return []
+
+        marker = json.loads(body.decode("utf-8"))
+        if not isinstance(marker, dict) or not isinstance(marker.get("Files"), list):
+            raise ValueError(
+                f"the marker of multipart dataset {self.key} must be empty or list its shards as Files"
+            )
+        return marker["Files"]
+
+    @cached_property
+    def manifest(self) -> DatasetManifest:
+        """
+        Get the manifest of the current version of the dataset file. The manifest is read from S3 if it was already
+        computed for this version of the file, otherwise the file is scanned and the manifest is stored.
+        :return: the manifest
+        """
+        manifest = DatasetManifest.load(
+            self.cli,
+            self.bucket,
+            self.key,
+            self.head.get("ETag"),
+            self.head.get("VersionId"),
+        )
+        if manifest:
+            return manifest
+
+        if self.multipart:
+            manifest = self._multipart_manifest(self._count_shards())
+            manifest.save(self.cli, self.bucket, self.key)
+            return manifest
+
+        count = LineCounter(self.cli).count(
+            self.bucket,
+            self.key,
+            size=self.head.get("ContentLength"),
+            etag=self.head.get("ETag"),
+        )
+        manifest = DatasetManifest(
+            etag=self.head.get("ETag"),
+            version_id=self.head.get("VersionId"),
+            size=count.size,
+            lines=count.lines,
+            fingerprint=count.fingerprint,
+        )
+        manifest.save(self.cli, self.bucket, self.key)
+        return manifest
+
+    def profile(self, schema: dict) -> dict:
+        """
+        Get the profile of the current version of the dataset file (see DatasetProfiler). The profile is read from the
+        manifest if it was already computed for this version of the file, otherwise the file is profiled (in a single
+        pass that also computes the rest of the manifest) and the manifest is stored.
+        :param schema: the dataset schema (from config)
+        :return: the profile
         """
+        from shared.Dataset.dataset_profile import DatasetProfiler
 
-        # This query counts lines that are not blank (have at least one item)
-        query = f"select count(*) as lines from s3object s where s._1 != ''"
+        manifest = DatasetManifest.load(
+            self.cli,
+            self.bucket,
+            self.key,
+            self.head.get("ETag"),
+            self.head.get("VersionId"),
+        )
+        if manifest and manifest.profile:
+            self.__dict__["manifest"] = manifest
+            return manifest.profile
+
+        profiler = DatasetProfiler(schema)
+        if self.multipart:
+            for shard in self.shards:
+                profile = profiler.profile_object(
+                    self.cli, self.bucket, shard["Key"], etag=shard["ETag"]
+                )
+            shards = [
+                {"Key": shard["Key"], "ETag": shard["ETag"], **counts}
+                for shard, counts in zip(self.shards, profiler.objects)
+            ]
+            manifest = self._multipart_manifest(shards, profile)
+            manifest.save(self.cli, self.bucket, self.key)
+            self.__dict__["manifest"] = manifest
+            return profile
 
-        select = self.cli.select_object_content(
-            Bucket=self.bucket,
-            Key=self.key,
-            ExpressionType="SQL",
-            Expression=query,
-            InputSerialization={"CSV": {"FileHeaderInfo": "NONE"}},
-            OutputSerialization={"JSON": {}},
+        profile = profiler.profile_object(
+            self.cli, self.bucket, self.key, etag=self.head.get("ETag")
         )
+        manifest = DatasetManifest(
+            etag=self.head.get("ETag"),
+            version_id=self.head.get("VersionId"),
+            size=profiler.size,
+            lines=profiler.rows,
+            fingerprint=profiler.fingerprint,
+            profile=profile,
+        )
+        manifest.save(self.cli, self.bucket, self.key)
+        self.__dict__["manifest"] = manifest
+        return profile
 
-        for event in select["Payload"]:
-            if "Records" in event:
-                records = event["Records"]["Payload"].decode("utf-8")
+    def validate(self, schema: dict, timestamp_format=None, frequency=None):
+        """
+        Validate the current version of the dataset file against its configuration (see DatasetValidator). The shards
+        of a multipart dataset are validated in order, stopping at the first shard with errors.
+        :param schema: the dataset schema (from config)
+        :param timestamp_format: the data timestamp format (from config)
+        :param frequency: the data frequency (from config)
+        :return: the validation report
+        """
+        from shared.Dataset.dataset_validator import DatasetValidator
+
+        validator = DatasetValidator(schema, timestamp_format, frequency)
+        objects = (
+            [(shard["Key"], shard["ETag"]) for shard in self.shards]
+            if self.multipart
+            else [(self.key, self.head.get("ETag"))]
+        )
+        for key, etag in objects:
+            report = validator.validate_object(self.cli, self.bucket, key, etag=etag)
+            if not report.valid:
+                break
+        return report
 
-        return json.loads(records).get("lines")
+    def _count_shards(self) -> list:
+        """
+        Count the lines of the shards of a multipart dataset in parallel. Shards that have not changed since the
+        manifest of the dataset was last stored are not read again.
+        :return: list of dict of the Key, ETag, Bytes, Lines and Fingerprint of each shard
+        """
+        previous = DatasetManifest.read(self.cli, self.bucket, self.key)
+        known = {
+            shard.get("Key"): shard
+            for shard in ((previous.shards if previous else None) or [])
+            if str(shard.get("Fingerprint")).startswith(
+                f"sha256-{default_chunk_size()}:"
+            )
+        }
+
+        changed = [
+            shard
+            for shard in self.shards
+            if known.get(shard["Key"], {}).get("ETag") != shard["ETag"]
+        ]
+        counts = LineCounter(self.cli).count_objects(
+            self.bucket,
+            [(shard["Key"], shard["Size"], shard["ETag"]) for shard in changed],
+        )
+        for shard, count in zip(changed, counts):
+            known[shard["Key"]] = {
+                "Key": shard["Key"],
+                "ETag": shard["ETag"],
+                "Bytes": count.size,
+                "Lines": count.lines,
+                "Fingerprint": count.fingerprint,
+            }
+        return [known[shard["Key"]] for shard in self.shards]
+
+    def _multipart_manifest(self, shards: list, profile=None) -> DatasetManifest:
+        """
+        Build the manifest of a multipart dataset from the facts of its shards
+        :param shards: list of dict of the Key, ETag, Bytes, Lines and Fingerprint of each shard, sorted by key
+        :param profile: the profile of the dataset (if profiled)
+        :return: the manifest
+        """
+        fingerprints = "\n".join(shard["Fingerprint"] for shard in shards)
+        return DatasetManifest(
+            etag=self.head.get("ETag"),
+            size=sum(shard["Bytes"] for shard in shards),
+            lines=sum(shard["Lines"] for shard in shards),
+            fingerprint=f"multipart-{hashlib.sha256(fingerprints.encode('utf-8')).hexdigest()}",
+            profile=profile,
+            shards=shards,
+        )
+
+    @property
+    def size(self) -> int:
+        """
+        Get the size of the dataset in lines (lines that are not blank - that have at least one item)
+        :return: the size of the dataset in lines
+        """
+        return self.manifest.lines
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Get the fingerprint of the content of the dataset
+        :return: the fingerprint of the dataset
+        """
+        return self.manifest.fingerprint
 
     def __repr__(self):
         return f"DatasetFile(key='{self.key}',bucket='{self.bucket}')"
@@ -11,15 +11,26 @@
 #  and limitations under the License.                                                                                 #
 # #####################################################################################################################
 
+import hashlib
+import json
 from datetime import datetime
 from operator import itemgetter
 from os import environ
 
 from shared.Dataset.data_timestamp_format import DataTimestampFormat
 from shared.Dataset.dataset_file import DatasetFile
+from shared.Dataset.parquet_converter import (
+    CSV_FORMAT,
+    PARQUET_FORMAT,
+    converted_key,
+)
+from shared.Dataset.dataset_resampler import resampled_key
 from shared.helpers import ForecastClient
 from shared.status import Status
 
+# import jobs are tagged with the fingerprint of the dataset file they imported and of how they imported it
+FINGERPRINT_TAG = "SourceFingerprint"
+
 
 class DatasetImportJob(ForecastClient):
     """Represents the desired state of a dataset import job generated by Amazon Forecast"""
@@ -29,23 +40,43 @@ class DatasetImportJob(ForecastClient):
         dataset_file: DatasetFile,
         dataset_arn: str,
         timestamp_format: DataTimestampFormat,
+        import_format: str = CSV_FORMAT,
+        aggregation: dict = None,
+        data_frequency: str = None,
     ):
         self.dataset_file = dataset_file
         self.dataset_arn = dataset_arn
         self.timestamp_format = timestamp_format
+        self.import_format = import_format
+        self.aggregation = aggregation
+        self.data_frequency = data_frequency
+        self.resample = aggregation is not None
+
+        # resampled datasets are imported from their resampled copy, datasets imported as Parquet from their conversion
+        self.import_file = dataset_file
+        if self.resample:
+            self.import_file = DatasetFile(
+                resampled_key(dataset_file.key), dataset_file.bucket
+            )
+        key = self.import_file.key
+        if import_format == PARQUET_FORMAT:
+            key = converted_key(key)
 
         self._import_job_params = {
             "DatasetImportJobName": "PLACEHOLDER",
             "DatasetArn": self.dataset_arn,
             "DataSource": {
                 "S3Config": {
-                    "Path": f"s3://{self.dataset_file.bucket}/{self.dataset_file.key}",
+                    # the key of a multipart dataset is its folder - all of its shards are imported
+                    "Path": f"s3://{self.dataset_file.bucket}/{key}",
                     "RoleArn": environ.get("FORECAST_ROLE"),
                 }
             },
         }
         if self.timestamp_format:
             self._import_job_params["TimestampFormat"] = str(self.timestamp_format)
+        if self.import_format == PARQUET_FORMAT:
+            self._import_job_params["Format"] = PARQUET_FORMAT
 
         super().__init__(resource="dataset_import_job", **self._import_job_params)
 
@@ -101,13 +132,54 @@ class DatasetImportJob(ForecastClient):
 
         # if the data is active, check if it should be updated
         if previous_status.get("Status") == Status.ACTIVE:
-            stats = previous_status.get("FieldStatistics")
-            counts = [stats[item].get("Count") for item in stats]
-            if self.dataset_file.size not in counts:
+            fingerprint = self.imported_fingerprint(
+                previous_imports[0].get("DatasetImportJobArn")
+            )
+            if fingerprint is None:
+                # imports created before fingerprints were recorded are compared by their row counts
+                stats = previous_status.get("FieldStatistics")
+                counts = [stats[item].get("Count") for item in stats]
+                if self.import_file.size not in counts:
+                    return Status.DOES_NOT_EXIST
+            elif fingerprint != self.fingerprint:
                 return Status.DOES_NOT_EXIST
 
         return Status[previous_status.get("Status")]
 
+    @property
+    def fingerprint(self) -> str:
+        """
+        Get the fingerprint of this import of the dataset file - its ETag (resampled and converted copies are derived
+        from, and current with, the version of the dataset file they were imported with) and a digest of the settings
+        that change what is imported from it: the import path, format and timestamp format, and the aggregation and
+        data frequency it is resampled with
+        :return: the fingerprint, usable as a tag value
+        """
+        settings = {
+            "Path": self._import_job_params["DataSource"]["S3Config"]["Path"],
+            "Format": self.import_format,
+            "TimestampFormat": self._import_job_params.get("TimestampFormat"),
+            "Aggregation": self.aggregation,
+            "DataFrequency": self.data_frequency,
+        }
+        digest = hashlib.sha256(
+            json.dumps(settings, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        etag = self.dataset_file.head.get("ETag", "").strip('"')
+        return f"{etag}:{digest[:16]}"
+
+    def imported_fingerprint(self, arn):
+        """
+        Get the content fingerprint of the dataset file a dataset import job imported
+        :param arn: the dataset import job ARN
+        :return: the fingerprint, or None if the dataset import job has no fingerprint
+        """
+        tags = self.cli.list_tags_for_resource(ResourceArn=arn).get("Tags", [])
+        for tag in tags:
+            if tag.get("Key") == FINGERPRINT_TAG:
+                return tag.get("Value")
+        return None
+
     def create(self):
         """
         Create the dataset import job
@@ -116,4 +188,7 @@ class DatasetImportJob(ForecastClient):
         dataset_name = self.dataset_arn.split("/")[-1]
         now = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
         self._import_job_params["DatasetImportJobName"] = f"{dataset_name}_{now}"
+        self._import_job_params["Tags"] = [
+            {"Key": FINGERPRINT_TAG, "Value": self.fingerprint}
+        ]
         self.cli.create_dataset_import_job(**self._import_job_params)
@@ -0,0 +1,147 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import json
+
+from botocore.exceptions import ClientError
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+# manifests are stored next to their dataset file as <key>.manifest.json (next to the folder of a multipart dataset)
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_VERSION = 1  # increment when the manifest format changes
+
+
+class DatasetManifest:
+    """
+    Facts about one version of a dataset file (its line count, content fingerprint and, once profiled, its profile),
+    stored in S3 next to the dataset file so that they are computed once per object version rather than once per
+    invocation. A manifest is only used while the ETag and VersionId it was computed for match the dataset file.
+
+    The manifest of a multipart dataset also records the facts of each shard, so that only new or changed shards are
+    scanned when the dataset changes.
+    """
+
+    def __init__(
+        self,
+        etag,
+        version_id=None,
+        size=None,
+        lines=None,
+        fingerprint=None,
+        profile=None,
+        shards=None,
+    ):
+        self.etag = etag
+        self.version_id = version_id
+        self.size = size
+        self.lines = lines
+        self.fingerprint = fingerprint
+        self.profile = profile
+        self.shards = shards
+
+    @staticmethod
+    def key(source_key) -> str:
+        """
+        Get the key of the manifest of a dataset file
+        :param source_key: the S3 key of the dataset file
+        :return: the S3 key of the manifest
+        """
+        return f"{source_key.rstrip('/')}{MANIFEST_SUFFIX}"
+
+    def as_dict(self):
+        return {
+            "Version": MANIFEST_VERSION,
+            "ETag": self.etag,
+            "VersionId": self.version_id,
+            "Bytes": self.size,
+            "Lines": self.lines,
+            "Fingerprint": self.fingerprint,
+            "Profile": self.profile,
+            "Shards": self.shards,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            etag=data.get("ETag"),
+            version_id=data.get("VersionId"),
+            size=data.get("Bytes"),
+            lines=data.get("Lines"),
+            fingerprint=data.get("Fingerprint"),
+            profile=data.get("Profile"),
+            shards=data.get("Shards"),
+        )
+
+    @classmethod
+    def read(cls, cli, bucket, key):
+        """
+        Read the manifest of a dataset file from S3, whichever version of the dataset file it was computed for
+        :param cli: the S3 client
+        :param bucket: the S3 bucket of the dataset file
+        :param key: the S3 key of the dataset file
+        :return: the manifest, or None if there is no (readable) manifest
+        """
+        try:
+            body = cli.get_object(Bucket=bucket, Key=cls.key(key))["Body"].read()
+            data = json.loads(body.decode("utf-8"))
+        except ClientError as excinfo:
+            logger.debug("no manifest for %s: %s" % (key, excinfo))
+            return None
+        except ValueError as excinfo:
+            logger.warning("could not load manifest for %s: %s" % (key, excinfo))
+            return None
+
+        if not isinstance(data, dict) or data.get("Version") != MANIFEST_VERSION:
+            return None
+        return cls.from_dict(data)
+
+    @classmethod
+    def load(cls, cli, bucket, key, etag, version_id=None):
+        """
+        Load the manifest of a dataset file from S3
+        :param cli: the S3 client
+        :param bucket: the S3 bucket of the dataset file
+        :param key: the S3 key of the dataset file
+        :param etag: the current ETag of the dataset file
+        :param version_id: the current VersionId of the dataset file (if the bucket is versioned)
+        :return: the manifest, or None if there is no manifest for this version of the dataset file
+        """
+        manifest = cls.read(cli, bucket, key)
+        if not manifest:
+            return None
+        if manifest.etag != etag or manifest.version_id != version_id:
+            logger.info("manifest for %s is stale" % key)
+            return None
+        return manifest
+
+    def save(self, cli, bucket, key):
+        """
+        Store the manifest of a dataset file in S3. If the manifest cannot be written, the line count and profile of
+        this version of the dataset file are scanned for again by the next invocation that needs them.
+        :param cli: the S3 client
+        :param bucket: the S3 bucket of the dataset file
+        :param key: the S3 key of the dataset file
+        :return: None
+        """
+        try:
+            cli.put_object(
+                Bucket=bucket,
+                Key=self.key(key),
+                Body=json.dumps(self.as_dict(), sort_keys=True).encode("utf-8"),
+                ContentType="application/json",
+            )
+        except ClientError as excinfo:
+            logger.warning("could not store manifest for %s: %s" % (key, excinfo))
@@ -0,0 +1,371 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import csv
+import hashlib
+import math
+import time
+from collections import Counter
+from datetime import datetime
+
+from shared.Dataset.line_counter import LineCounter, default_chunk_size
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_READ_SIZE = 1024 * 1024  # bytes read from the object at a time
+DEFAULT_MAX_DISTINCT = 100000  # item IDs are counted exactly up to this many
+DEFAULT_MAX_TIMESTAMPS = 100000  # distinct timestamps kept to detect the frequency
+
+ITEM_ID_ATTRIBUTE = "item_id"
+NUMERIC_TYPES = ["float", "integer"]
+
+# the most common interval between consecutive timestamps, by data frequency
+FREQUENCY_SECONDS = {
+    60: "1min",
+    300: "5min",
+    600: "10min",
+    900: "15min",
+    1800: "30min",
+    3600: "H",
+    86400: "D",
+    604800: "W",
+}
+FREQUENCY_DAYS = [(range(28, 32), "M"), (range(365, 367), "Y")]
+
+
+class DistinctCounter:
+    """
+    Counts distinct values in bounded memory: values are counted exactly until there are max_size of them, then
+    estimated with a HyperLogLog sketch.
+    """
+
+    precision = 12
+    registers = 1 << precision
+
+    def __init__(self, max_size=DEFAULT_MAX_DISTINCT):
+        self.max_size = max_size
+        self._values = set()
+        self._sketch = None
+
+    @property
+    def estimated(self) -> bool:
+        """True if the count is an estimate"""
+        return self._sketch is not None
+
+    def add(self, values):
+        """
+        Add values
+        :param values: an iterable of values
+        :return: None
+        """
+        if self._sketch is None:
+            self._values.update(values)
+            if len(self._values) > self.max_size:
+                self._sketch = bytearray(self.registers)
+                for value in self._values:
+                    self._add_to_sketch(value)
+                self._values = None
+        else:
+            for value in values:
+                self._add_to_sketch(value)
+
+    def _add_to_sketch(self, value: str):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        register = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self._sketch[register]:
+            self._sketch[register] = rank
+
+    def count(self) -> int:
+        """
+        Get the number of distinct values
+        :return: the number of distinct values (an estimate, if estimated is True)
+        """
+        if self._sketch is None:
+            return len(self._values)
+
+        m = self.registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0**-rank for rank in self._sketch)
+        zeros = self._sketch.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class ColumnProfile:
+    """Null counts and (for numeric columns) the range of the values of one column"""
+
+    def __init__(self, name, attribute_type=None):
+        self.name = name
+        self.numeric = attribute_type in NUMERIC_TYPES
+        self.nulls = 0
+        self.invalid = 0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, values):
+        """
+        Add the values of the column in a set of rows
+        :param values: a sequence of values
+        :return: None
+        """
+        self.nulls += values.count("")
+        if not self.numeric:
+            return
+
+        values = [value for value in values if value]
+        try:
+            numbers = list(map(float, values))
+        except ValueError:
+            numbers = []
+            for value in values:
+                try:
+                    numbers.append(float(value))
+                except ValueError:
+                    self.invalid += 1
+        if not numbers:
+            return
+
+        low, high = min(numbers), max(numbers)
+        if self.minimum is None or low < self.minimum:
+            self.minimum = low
+        if self.maximum is None or high > self.maximum:
+            self.maximum = high
+
+    def as_dict(self):
+        profile = {"Nulls": self.nulls}
+        if self.numeric:
+            profile.update(
+                {"Min": self.minimum, "Max": self.maximum, "Invalid": self.invalid}
+            )
+        return profile
+
+
+class DatasetProfiler:
+    """
+    Profiles a dataset file in a single streaming pass with bounded memory. Records the number of rows (counted like
+    LineCounter), the number of distinct item IDs, the first and last timestamp, the data frequency, and the nulls and
+    numeric ranges of each column of the dataset schema. The content fingerprint is computed in the same pass, so that
+    the profile can be stored in the dataset manifest.
+
+    Several objects (the shards of a multipart dataset) can be profiled by the same profiler: the profile is of all of
+    them, and the rows, bytes and fingerprint of each object are recorded in objects.
+    """
+
+    def __init__(
+        self,
+        schema: dict,
+        chunk_size=None,
+        read_size=DEFAULT_READ_SIZE,
+        max_distinct=DEFAULT_MAX_DISTINCT,
+        max_timestamps=DEFAULT_MAX_TIMESTAMPS,
+    ):
+        self.attributes = (schema or {}).get("Attributes", [])
+        self.chunk_size = chunk_size or default_chunk_size()
+        self.read_size = read_size
+        self.max_timestamps = max_timestamps
+
+        self.columns = [
+            ColumnProfile(
+                attribute.get("AttributeName"), attribute.get("AttributeType")
+            )
+            for attribute in self.attributes
+        ]
+        names = [column.name for column in self.columns]
+        self._item_column = (
+            names.index(ITEM_ID_ATTRIBUTE) if ITEM_ID_ATTRIBUTE in names else None
+        )
+        self._timestamp_column = next(
+            (
+                idx
+                for idx, attribute in enumerate(self.attributes)
+                if attribute.get("AttributeType") == "timestamp"
+            ),
+            None,
+        )
+
+        self.rows = 0
+        self.size = 0
+        self.items = DistinctCounter(max_distinct)
+        self.start = None
+        self.end = None
+        self._timestamps = set()
+        self.seconds = 0.0
+        self.objects = []
+        self._digests = []
+        self._hasher = hashlib.sha256()
+        self._hashed = 0
+
+    def profile_object(self, cli, bucket, key, etag=None) -> dict:
+        """
+        Profile an S3 object
+        :param cli: the S3 client
+        :param bucket: the S3 bucket
+        :param key: the S3 key
+        :param etag: the ETag of the object (if known) - the profile is of this version of the object
+        :return: the profile
+        """
+        get_args = {"Bucket": bucket, "Key": key}
+        if etag:
+            get_args["IfMatch"] = etag
+        body = cli.get_object(**get_args)["Body"]
+        return self.profile(body.iter_chunks(self.read_size))
+
+    def profile(self, chunks) -> dict:
+        """
+        Profile a dataset (or add a shard of a dataset to its profile)
+        :param chunks: an iterable of the bytes of the dataset
+        :return: the profile
+        """
+        start_time = time.perf_counter()
+        rows, size = self.rows, self.size
+        carry = b""
+        for chunk in chunks:
+            self._hash(chunk)
+            data = carry + chunk
+            cut = data.rfind(b"\n") + 1
+            if cut:
+                self._lines(data[:cut])
+            carry = data[cut:]
+        if carry:
+            self._lines(carry)
+
+        self.objects.append(
+            {
+                "Lines": self.rows - rows,
+                "Bytes": self.size - size,
+                "Fingerprint": self._finish_hash(),
+            }
+        )
+        self.seconds += time.perf_counter() - start_time
+
+        profile = self.as_dict()
+        profile["Seconds"] = self.seconds
+        logger.info(
+            "profiled %d rows (%d bytes) in %.1fs"
+            % (self.rows, self.size, profile["Seconds"])
+        )
+        return profile
+
+    @property
+    def fingerprint(self) -> str:
+        """The content fingerprint of the last object profiled, as computed by LineCounter with the same chunk size"""
+        return self.objects[-1]["Fingerprint"] if self.objects else None
+
+    def _finish_hash(self) -> str:
+        digests = self._digests + ([self._hasher.digest()] if self._hashed else [])
+        self._digests = []
+        self._hasher = hashlib.sha256()
+        self._hashed = 0
+        digest = hashlib.sha256(b"".join(digests)).hexdigest()
+        return f"sha256-{self.chunk_size}:{digest}"
+
+    def _hash(self, chunk: bytes):
+        self.size += len(chunk)
+        view = memoryview(chunk)
+        while view:
+            part = view[: self.chunk_size - self._hashed]
+            self._hasher.update(part)
+            self._hashed += len(part)
+            view = view[len(part) :]
+            if self._hashed == self.chunk_size:
+                self._digests.append(self._hasher.digest())
+                self._hasher = hashlib.sha256()
+                self._hashed = 0
+
+    def _lines(self, data: bytes):
+        """
+        Profile complete lines (or the last line of the dataset)
+        :param data: the lines
+        :return: None
+        """
+        self.rows += LineCounter.count_lines(b"\n" + data, len(data))
+
+        lines = data.decode("utf-8", errors="replace").split("\n")
+        rows = [row for row in csv.reader(lines) if row and row[0] != ""]
+        if not rows:
+            return
+
+        # profile the rows column by column - rows that are missing columns are padded with nulls
+        lengths = list(map(len, rows))
+        width = max(len(self.columns), max(lengths))
+        while len(self.columns) < width:
+            self.columns.append(ColumnProfile(f"_{len(self.columns)}"))
+        if min(lengths) < width:
+            rows = [row + [""] * (width - len(row)) for row in rows]
+        columns = list(zip(*rows))
+
+        for column, values in zip(self.columns, columns):
+            column.add(values)
+        if self._item_column is not None:
+            self.items.add(filter(None, columns[self._item_column]))
+        if self._timestamp_column is not None:
+            self._timestamp(list(filter(None, columns[self._timestamp_column])))
+
+    def _timestamp(self, values):
+        # supported timestamp formats (yyyy-MM-dd and yyyy-MM-dd HH:mm:ss) sort lexicographically
+        if not values:
+            return
+        low, high = min(values), max(values)
+        if self.start is None or low < self.start:
+            self.start = low
+        if self.end is None or high > self.end:
+            self.end = high
+        if len(self._timestamps) < self.max_timestamps:
+            self._timestamps.update(
+                values[: self.max_timestamps - len(self._timestamps)]
+            )
+
+    def frequency(self):
+        """
+        Detect the data frequency from the most common interval between consecutive distinct timestamps
+        :return: the data frequency (e.g. D), or None if it could not be detected
+        """
+        timestamps = []
+        for value in self._timestamps:
+            try:
+                timestamps.append(datetime.fromisoformat(value))
+            except ValueError:
+                continue
+        timestamps.sort()
+
+        intervals = Counter(
+            (later - earlier).total_seconds()
+            for earlier, later in zip(timestamps, timestamps[1:])
+        )
+        if not intervals:
+            return None
+
+        seconds, _ = intervals.most_common(1)[0]
+        if seconds in FREQUENCY_SECONDS:
+            return FREQUENCY_SECONDS[seconds]
+        for days, frequency in FREQUENCY_DAYS:
+            if seconds % 86400 == 0 and int(seconds // 86400) in days:
+                return frequency
+        return None
+
+    def as_dict(self):
+        return {
+            "Rows": self.rows,
+            "Bytes": self.size,
+            "Items": self.items.count() if self._item_column is not None else None,
+            "ItemsEstimated": self.items.estimated,
+            "StartTimestamp": self.start,
+            "EndTimestamp": self.end,
+            "Frequency": self.frequency(),
+            "Columns": {column.name: column.as_dict() for column in self.columns},
+        }
@@ -0,0 +1,433 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import hashlib
+import json
+import time
+
+from shared.Dataset.dataset_type import DatasetType
+from shared.Dataset.dataset_validator import FREQUENCY_MINUTES
+from shared.Dataset.parquet_converter import ARROW_TYPES, has_first_field
+from shared.logging import get_logger
+from shared.s3.multipart_upload import (
+    MultipartUpload,
+    SOURCE_ETAG_METADATA,
+    derived_metadata,
+)
+
+logger = get_logger(__name__)
+
+RESAMPLED_PREFIX = "resampled"  # resampled datasets are stored under resampled/<key>
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024  # bytes of CSV aggregated at a time
+DEFAULT_MAX_PARTIAL_ROWS = 1000000  # partial aggregates held before they are merged
+
+AGGREGATIONS = ["sum", "mean", "min", "max", "first", "last", "count"]
+NUMERIC_TYPES = ["float", "integer"]
+
+# the partial aggregates kept for each aggregation - they are merged with the aggregation of the same name, except for
+# counts (summed) and first/last (the value at the earliest/latest timestamp)
+PARTIALS = {
+    "sum": ["sum"],
+    "mean": ["sum", "count"],
+    "min": ["min"],
+    "max": ["max"],
+    "first": ["first"],
+    "last": ["last"],
+    "count": ["count"],
+}
+
+# Arrow temporal units of the data frequencies of at least a day
+FREQUENCY_UNITS = {"D": "day", "W": "week", "M": "month", "Y": "year"}
+
+# the metadata of a resampled dataset file that records a digest of the settings it was resampled with
+SETTINGS_METADATA = "resample-settings"
+
+BUCKET = "__bucket"
+TIMESTAMP = "__timestamp"
+
+
+def resampled_key(source_key: str) -> str:
+    """
+    Get the key of the resampled copy of a dataset
+    :param source_key: the S3 key of the dataset file (or the folder of a multipart dataset)
+    :return: the S3 key of the resampled dataset file - the shards of a multipart dataset are resampled to one file
+    """
+    if source_key.endswith("/"):
+        return f"{RESAMPLED_PREFIX}/{source_key.rstrip('/')}.csv"
+    return f"{RESAMPLED_PREFIX}/{source_key}"
+
+
+class DatasetResampler:
+    """
+    Aggregates a time series dataset to its configured data frequency before it is imported - e.g. to upload 1 minute
+    events for an hourly forecast. Rows are grouped by their item ID and dimensions (the string attributes of the
+    dataset schema) and their timestamp, rounded down to the start of its period (weeks start on Monday). Each numeric
+    attribute is aggregated with its configured aggregation (one of AGGREGATIONS): by default, the target time series
+    is summed and related time series are averaged.
+
+    The dataset is read with pyarrow in blocks, and each block is aggregated with Table.group_by. The partial
+    aggregates of the blocks are merged (again with Table.group_by) whenever they hold max_partial_rows more rows than
+    twice the groups of the last merge, so memory is bounded by the number of groups of the resampled dataset, and each
+    row is merged a bounded number of times. The resampled dataset is written as CSV to S3 with a multipart upload.
+    """
+
+    def __init__(
+        self,
+        cli,
+        schema: dict,
+        frequency,
+        timestamp_format=None,
+        data_type=DatasetType.TARGET_TIME_SERIES,
+        aggregation: dict = None,
+        block_size=DEFAULT_BLOCK_SIZE,
+        max_partial_rows=DEFAULT_MAX_PARTIAL_ROWS,
+    ):
+        self.cli = cli
+        self.attributes = (schema or {}).get("Attributes", [])
+        self.frequency = str(frequency)
+        self.date_only = str(timestamp_format) == "yyyy-MM-dd"
+        self.block_size = block_size
+        self.max_partial_rows = max_partial_rows
+
+        default = "sum" if data_type == DatasetType.TARGET_TIME_SERIES else "mean"
+        aggregation = aggregation or {}
+        self._keys = []
+        self._values = []
+        self._timestamp = None
+        for attribute in self.attributes:
+            name = attribute.get("AttributeName")
+            attribute_type = attribute.get("AttributeType")
+            if attribute_type == "timestamp":
+                self._timestamp = name
+            elif attribute_type in NUMERIC_TYPES:
+                self._values.append((name, aggregation.get(name, default)))
+            else:
+                self._keys.append(name)
+        if self._timestamp is None:
+            raise ValueError(
+                "datasets without a timestamp attribute cannot be resampled"
+            )
+
+        self.rows = 0
+        self.skipped = 0
+        self.groups = 0
+        self._partials = []
+        self._partial_rows = 0
+        self._merged_rows = 0
+
+    @property
+    def settings(self) -> str:
+        """
+        Get a digest of the settings that change the resampled dataset: the data frequency, whether timestamps are
+        dates, and the key and aggregated columns of the schema
+        :return: the digest (sha256 hex digest)
+        """
+        settings = {
+            "Frequency": self.frequency,
+            "DateOnly": self.date_only,
+            "Timestamp": self._timestamp,
+            "Keys": self._keys,
+            "Values": self._values,
+        }
+        return hashlib.sha256(
+            json.dumps(settings, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def resample(self, dataset_file) -> str:
+        """
+        Resample the current version of a dataset file (all shards of a multipart dataset are aggregated together),
+        unless it was already resampled with the same settings
+        :param dataset_file: the dataset file
+        :return: the S3 key of the resampled dataset file
+        """
+        target = resampled_key(dataset_file.key)
+        etag = dataset_file.head.get("ETag")
+        metadata = {SOURCE_ETAG_METADATA: etag, SETTINGS_METADATA: self.settings}
+        if derived_metadata(self.cli, dataset_file.bucket, target) == metadata:
+            logger.info("%s is already resampled to %s" % (dataset_file.key, target))
+            return target
+
+        objects = (
+            [
+                (shard["Key"], shard["ETag"], shard["Size"])
+                for shard in dataset_file.shards
+            ]
+            if dataset_file.multipart
+            else [(dataset_file.key, etag, dataset_file.head.get("ContentLength"))]
+        )
+
+        start_time = time.perf_counter()
+        for object_key, object_etag, object_size in objects:
+            if not object_size:
+                continue  # pyarrow cannot read an empty CSV file
+            body = self.cli.get_object(
+                Bucket=dataset_file.bucket, Key=object_key, IfMatch=object_etag
+            )["Body"]
+            self.add(body)
+
+        with MultipartUpload(
+            self.cli,
+            dataset_file.bucket,
+            target,
+            metadata=metadata,
+        ) as upload:
+            self.write(upload)
+
+        seconds = time.perf_counter() - start_time
+        logger.info(
+            "resampled %d rows of %s to %d rows (data frequency %s) in %.1fs (%.0f rows/s, %d rows skipped)"
+            % (
+                self.rows,
+                dataset_file.key,
+                self.groups,
+                self.frequency,
+                seconds,
+                self.rows / seconds if seconds else 0,
+                self.skipped,
+            )
+        )
+        return target
+
+    def add(self, body):
+        """
+        Add the rows of a dataset to the aggregation
+        :param body: a readable binary file of the dataset (CSV, not empty)
+        :return: None
+        """
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+
+        schema = self._schema()
+        reader = pa_csv.open_csv(
+            body if isinstance(body, pa.NativeFile) else pa.PythonFile(body, mode="r"),
+            read_options=pa_csv.ReadOptions(
+                column_names=schema.names, block_size=self.block_size
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=schema, strings_can_be_null=False
+            ),
+        )
+        for batch in reader:
+            self._batch(pa.Table.from_batches([batch]))
+
+    def write(self, out):
+        """
+        Write the resampled dataset as CSV
+        :param out: a writable binary file
+        :return: None
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pa_compute
+        import pyarrow.csv as pa_csv
+
+        groups = self._merge()
+        groups = groups.sort_by([(key, "ascending") for key in self._keys + [BUCKET]])
+
+        columns = {key: groups.column(key) for key in self._keys}
+        # casts format timestamps as yyyy-MM-dd HH:mm:ss and dates as yyyy-MM-dd (much faster than strftime)
+        bucket = groups.column(BUCKET)
+        if self.date_only and self.frequency in FREQUENCY_UNITS:
+            bucket = pa_compute.cast(bucket, pa.date32())
+        columns[self._timestamp] = pa_compute.cast(bucket, pa.string())
+        for idx, (name, aggregation) in enumerate(self._values):
+            if aggregation == "mean":
+                columns[name] = pa_compute.divide(
+                    pa_compute.cast(groups.column(f"{idx}_sum"), pa.float64()),
+                    groups.column(f"{idx}_count"),
+                )
+            else:
+                columns[name] = groups.column(f"{idx}_{aggregation}")
+        names = [attribute.get("AttributeName") for attribute in self.attributes]
+        table = pa.table([columns[name] for name in names], names=names)
+
+        # Arrow quotes all strings unless told not to - only quote them if some item ID or dimension must be quoted
+        quoted = any(
+            pa_compute.any(
+                pa_compute.match_substring_regex(columns[key], '[,"\\r\\n]')
+            ).as_py()
+            for key in self._keys
+        )
+        pa_csv.write_csv(
+            table,
+            out,
+            write_options=pa_csv.WriteOptions(
+                include_header=False, quoting_style="needed" if quoted else "none"
+            ),
+        )
+        self.groups += table.num_rows
+
+    def _schema(self):
+        """The Arrow schema of the dataset - timestamps are read as strings"""
+        import pyarrow as pa
+
+        return pa.schema(
+            [
+                (
+                    attribute.get("AttributeName"),
+                    getattr(
+                        pa, ARROW_TYPES.get(attribute.get("AttributeType"), "string")
+                    )(),
+                )
+                for attribute in self.attributes
+            ]
+        )
+
+    def _buckets(self, timestamps):
+        """
+        Round timestamps down to the start of their period
+        :param timestamps: the timestamps (strings, yyyy-MM-dd or yyyy-MM-dd HH:mm:ss)
+        :return: the start of the period of each timestamp (null for invalid timestamps), and the parsed timestamps
+        """
+        import pyarrow.compute as pa_compute
+
+        parsed = pa_compute.strptime(
+            timestamps, format="%Y-%m-%d %H:%M:%S", unit="s", error_is_null=True
+        )
+        if parsed.null_count:
+            parsed = pa_compute.coalesce(
+                parsed,
+                pa_compute.strptime(
+                    timestamps, format="%Y-%m-%d", unit="s", error_is_null=True
+                ),
+            )
+        if self.frequency in FREQUENCY_MINUTES:
+            multiple, unit = FREQUENCY_MINUTES[self.frequency], "minute"
+        else:
+            multiple, unit = 1, FREQUENCY_UNITS[self.frequency]
+        buckets = pa_compute.floor_temporal(
+            parsed, multiple=multiple, unit=unit, week_starts_monday=True
+        )
+        return buckets, parsed
+
+    def _batch(self, table):
+        """
+        Aggregate a block of rows, merging the partial aggregates if there are too many
+        :param table: the rows
+        :return: None
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pa_compute
+
+        rows = table.num_rows
+        table = table.filter(has_first_field(table))
+        buckets, parsed = self._buckets(table.column(self._timestamp))
+        valid = pa_compute.is_valid(buckets)
+        table = table.append_column(BUCKET, buckets).append_column(TIMESTAMP, parsed)
+        table = table.filter(valid)
+        self.rows += table.num_rows
+        self.skipped += rows - table.num_rows
+
+        # the rows of the block are partial aggregates of one value each
+        columns = {key: table.column(key) for key in self._keys + [BUCKET]}
+        for idx, (name, aggregation) in enumerate(self._values):
+            value = table.column(name)
+            for partial in PARTIALS[aggregation]:
+                if partial == "count":
+                    columns[f"{idx}_count"] = pa_compute.cast(
+                        pa_compute.is_valid(value), "int64"
+                    )
+                else:
+                    columns[f"{idx}_{partial}"] = value
+                if partial in ("first", "last"):
+                    columns[f"{idx}_{partial}_timestamp"] = pa_compute.if_else(
+                        pa_compute.is_valid(value),
+                        table.column(TIMESTAMP),
+                        None,
+                    )
+
+        self._partials.append(self._aggregate(pa.table(columns)))
+        self._partial_rows += self._partials[-1].num_rows
+        if self._partial_rows > 2 * self._merged_rows + self.max_partial_rows:
+            logger.debug("merging %d partial aggregates" % self._partial_rows)
+            self._partials = [self._merge()]
+            self._partial_rows = self._merged_rows = self._partials[0].num_rows
+
+    def _merge(self):
+        """
+        Merge the partial aggregates of the blocks added so far
+        :return: the partial aggregates, one row per group
+        """
+        import pyarrow as pa
+
+        if not self._partials:
+            self._batch(self._schema().empty_table())
+        if len(self._partials) == 1:
+            return self._partials[0]
+        return self._aggregate(pa.concat_tables(self._partials))
+
+    def _aggregate(self, partials):
+        """
+        Aggregate partial aggregates by group
+        :param partials: the partial aggregates (several rows per group)
+        :return: the partial aggregates, one row per group
+        """
+        groups = self._keys + [BUCKET]
+        aggregations = []
+        selections = []
+        for idx, (_, aggregation) in enumerate(self._values):
+            for partial in PARTIALS[aggregation]:
+                column = f"{idx}_{partial}"
+                if partial in ("first", "last"):
+                    selections.append((column, partial))
+                else:
+                    aggregations.append(
+                        (column, "sum" if partial == "count" else partial)
+                    )
+
+        grouped = partials.group_by(groups).aggregate(aggregations)
+        names = {f"{column}_{function}": column for column, function in aggregations}
+        grouped = grouped.rename_columns(
+            [names.get(name, name) for name in grouped.column_names]
+        )
+
+        # first/last: the value at the earliest/latest timestamp of each group (the first/last in order of the rows
+        # for the same timestamp). Rows are sorted by group and timestamp (null timestamps, of null values, sort
+        # outside of the valid ones) and the first/last row of each group is kept - one row per group, in the order
+        # of the groups sorted by group.
+        if selections:
+            order = [(name, "ascending") for name in groups]
+            grouped = grouped.sort_by(order)
+            for column, partial in selections:
+                timestamp = f"{column}_timestamp"
+                selected = partials.select(groups + [timestamp, column]).sort_by(
+                    order + [(timestamp, "ascending")],
+                    null_placement="at_end" if partial == "first" else "at_start",
+                )
+                selected = selected.filter(self._group_boundaries(selected, partial))
+                grouped = grouped.append_column(
+                    timestamp, selected.column(timestamp)
+                ).append_column(column, selected.column(column))
+        return grouped
+
+    @staticmethod
+    def _group_boundaries(table, partial):
+        """
+        Find the first (or last) row of each group of a table sorted by group
+        :param table: the table - its first columns, up to the timestamp of a partial aggregate, are the group
+        :param partial: first or last
+        :return: a boolean mask of the rows
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pa_compute
+
+        if table.num_rows == 0:
+            return pa.array([], pa.bool_())
+        change = None
+        for column in table.columns[: table.num_columns - 2]:
+            column = column.combine_chunks()
+            differs = pa_compute.not_equal(column[1:], column[:-1])
+            change = differs if change is None else pa_compute.or_(change, differs)
+        if partial == "first":
+            return pa.concat_arrays([pa.array([True]), change])
+        return pa.concat_arrays([change, pa.array([True])])
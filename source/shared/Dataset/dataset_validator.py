@@ -0,0 +1,520 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import io
+import time
+from datetime import date, timedelta
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_READ_SIZE = 1024 * 1024  # bytes read from the object at a time
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024  # bytes of CSV parsed at a time
+DEFAULT_BATCH_SIZE = 10000  # rows validated together
+DEFAULT_MAX_ERRORS = 10  # validation stops after this many row errors
+
+ITEM_ID_ATTRIBUTE = "item_id"
+INTEGER = r"^[+-]?\d+$"
+
+# the pattern each timestamp format must match, and the strptime format it is parsed with
+TIMESTAMP_FORMATS = {
+    "yyyy-MM-dd": (r"^\d{4}-\d{2}-\d{2}$", "%Y-%m-%d"),
+    "yyyy-MM-dd HH:mm:ss": (
+        r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$",
+        "%Y-%m-%d %H:%M:%S",
+    ),
+}
+
+# the minutes between timestamps on the sampling grid of sub-daily data frequencies
+FREQUENCY_MINUTES = {
+    "1min": 1,
+    "5min": 5,
+    "10min": 10,
+    "15min": 15,
+    "30min": 30,
+    "H": 60,
+}
+
+
+def _month_end(day: date) -> bool:
+    return (day + timedelta(days=1)).day == 1
+
+
+class _Chunks(io.RawIOBase):
+    """A readable binary file of an iterable of chunks of bytes, counting the bytes read in a validation report"""
+
+    def __init__(self, chunks, report):
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._chunk = memoryview(b"")
+        self._report = report
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        # fill the buffer (pyarrow parses each read as a block of CSV)
+        read = 0
+        while read < len(buffer):
+            if not self._chunk:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._report.size += len(chunk)
+                self._chunk = memoryview(chunk)
+            size = min(len(buffer) - read, len(self._chunk))
+            buffer[read : read + size] = self._chunk[:size]
+            self._chunk = self._chunk[size:]
+            read += size
+        return read
+
+
+class RowError:
+    """A validation error in one row of a dataset (rows are numbered from 1, counting blank rows)"""
+
+    def __init__(self, row, message, key=None):
+        self.row = row
+        self.message = message
+        self.key = key
+
+    def __str__(self):
+        location = f"{self.key} row {self.row}" if self.key else f"row {self.row}"
+        return f"{location}: {self.message}"
+
+
+class DatasetValidationError(Exception):
+    """Raised when a dataset does not match its configured schema, timestamp format or data frequency"""
+
+    def __init__(self, report):
+        self.report = report
+        errors = "\n".join(str(error) for error in report.errors)
+        super().__init__(
+            f"the dataset does not match its configuration (validation stopped after {report.rows} rows):\n{errors}"
+        )
+
+
+class ValidationReport:
+    """The result of validating a dataset"""
+
+    def __init__(self):
+        self.rows = 0
+        self.size = 0
+        self.seconds = 0.0
+        self.errors = []
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    @property
+    def throughput(self) -> float:
+        """
+        Get the validation throughput
+        :return: the throughput in rows/s
+        """
+        if not self.seconds:
+            return 0.0
+        return self.rows / self.seconds
+
+    def as_dict(self):
+        return {
+            "Rows": self.rows,
+            "Bytes": self.size,
+            "Seconds": self.seconds,
+            "RowsPerSecond": self.throughput,
+            "Errors": [str(error) for error in self.errors],
+        }
+
+
+class DatasetValidator:
+    """
+    Validates a dataset against its configuration before it is imported, in a single streaming pass with bounded
+    memory: the dataset is read with pyarrow in blocks of CSV, and each block is validated a batch of rows at a time,
+    column by column, with pyarrow.compute. Each row must have one value per attribute of the dataset schema, numeric
+    attributes must be numbers, item IDs and timestamps must be present, timestamps must match the timestamp format and
+    lie on the sampling grid of the data frequency. Validation stops at the first max_errors errors.
+
+    Rows with the wrong number of columns are skipped by the CSV reader and reported by their row number. Blank rows
+    (rows without any value) are numbered, but not validated or counted.
+
+    The sampling grid is checked per timestamp: sub-daily timestamps must be a multiple of the frequency past the hour
+    (or midnight, for H), daily and coarser timestamps must be at midnight, and weekly, monthly and yearly timestamps
+    must fall on the same weekday, day of the month (or the end of the month) or day of the year as the first
+    timestamp of the dataset.
+    """
+
+    def __init__(
+        self,
+        schema: dict,
+        timestamp_format=None,
+        frequency=None,
+        read_size=DEFAULT_READ_SIZE,
+        block_size=DEFAULT_BLOCK_SIZE,
+        batch_size=DEFAULT_BATCH_SIZE,
+        max_errors=DEFAULT_MAX_ERRORS,
+    ):
+        self.attributes = (schema or {}).get("Attributes", [])
+        self.timestamp_format = str(timestamp_format) if timestamp_format else None
+        self.frequency = str(frequency) if frequency else None
+        self.read_size = read_size
+        self.block_size = block_size
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.report = ValidationReport()
+        self._anchor = None
+        self._key = None
+        self._errors = []
+        self._next = 1
+        self._invalid = []
+
+    def validate_object(self, cli, bucket, key, etag=None) -> ValidationReport:
+        """
+        Validate an S3 object (or add a shard of a dataset to the validation)
+        :param cli: the S3 client
+        :param bucket: the S3 bucket
+        :param key: the S3 key
+        :param etag: the ETag of the object (if known) - this version of the object is validated
+        :return: the validation report
+        """
+        get_args = {"Bucket": bucket, "Key": key}
+        if etag:
+            get_args["IfMatch"] = etag
+        body = cli.get_object(**get_args)["Body"]
+        self._key = key
+        return self.validate(body.iter_chunks(self.read_size))
+
+    def validate(self, chunks) -> ValidationReport:
+        """
+        Validate a dataset
+        :param chunks: an iterable of the bytes of the dataset
+        :return: the validation report
+        """
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+
+        start_time = time.perf_counter()
+        size = self.report.size
+        names = [attribute.get("AttributeName") for attribute in self.attributes]
+        self._next = 1
+        self._invalid = []
+        try:
+            reader = pa_csv.open_csv(
+                pa.PythonFile(_Chunks(chunks, self.report), mode="r"),
+                read_options=pa_csv.ReadOptions(
+                    column_names=names or None,
+                    autogenerate_column_names=not names,
+                    block_size=self.block_size,
+                    use_threads=False,  # the invalid row handler is given row numbers
+                ),
+                parse_options=pa_csv.ParseOptions(
+                    ignore_empty_lines=False, invalid_row_handler=self._invalid_row
+                ),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={name: pa.string() for name in names},
+                    strings_can_be_null=True,
+                    null_values=[""],
+                ),
+            )
+            for block in reader:
+                for offset in range(0, block.num_rows, self.batch_size):
+                    self._validate_batch(block.slice(offset, self.batch_size))
+                    if self._limit <= 0:
+                        break
+                self._validate_batch(None)
+                if self._limit <= 0:
+                    break
+            else:
+                self._validate_batch(None, final=True)
+        except pa.ArrowInvalid as excinfo:
+            # an empty object has no rows, anything else that cannot be read is an error at the rows not yet read
+            if self._invalid and len(self._invalid) >= self._limit:
+                self._validate_batch(None, final=True)
+            elif self.report.size > size:
+                self._errors = [RowError(self._next, str(excinfo), self._key)]
+                self._report_errors()
+        self.report.seconds += time.perf_counter() - start_time
+
+        logger.info(
+            "validated %d rows (%d bytes) at %.0f rows/s with %d errors"
+            % (
+                self.report.rows,
+                self.report.size,
+                self.report.throughput,
+                len(self.report.errors),
+            )
+        )
+        return self.report
+
+    @property
+    def _limit(self) -> int:
+        """The number of errors still to be reported before validation stops"""
+        return self.max_errors - len(self.report.errors)
+
+    def _invalid_row(self, row):
+        """
+        Skip (and record) a row with the wrong number of columns. Blocks without any other rows are not read as
+        batches, so reading stops once there are as many of these rows as errors still to report.
+        """
+        self._invalid.append((row.number, row.actual_columns))
+        return "skip" if len(self._invalid) < self._limit else "error"
+
+    def _error(self, row, message):
+        self._errors.append(RowError(row, message, self._key))
+
+    def _report_errors(self):
+        self._errors.sort(key=lambda error: error.row)
+        self.report.errors.extend(self._errors[: self._limit])
+        self._errors = []
+
+    def _validate_batch(self, batch, final=False):
+        """
+        Validate a batch of rows, and the rows with the wrong number of columns before it
+        :param batch: the rows (a pyarrow RecordBatch), or None to only report the rows with the wrong number of
+        columns before the next batch (or, if final, all of them)
+        :param final: True if there are no more rows
+        :return: None
+        """
+        import pyarrow.compute as pa_compute
+
+        # the rows of the batch are numbered after the skipped rows before (and between) them
+        rows = batch.num_rows if batch is not None else 0
+        skipped = 0
+        while skipped < len(self._invalid) and (
+            final or self._invalid[skipped][0] <= self._next + rows + skipped
+        ):
+            skipped += 1
+        invalid, self._invalid = self._invalid[:skipped], self._invalid[skipped:]
+        first = self._next
+        self._next += rows + skipped
+        self.report.rows += skipped
+
+        width = len(self.attributes)
+        if invalid:
+            names = ", ".join(
+                attribute.get("AttributeName") for attribute in self.attributes
+            )
+            for number, columns in invalid[: self._limit]:
+                self._error(
+                    number, f"expected {width} columns ({names}) but found {columns}"
+                )
+        if not rows:
+            self._report_errors()
+            return
+
+        skipped_numbers = [number for number, _ in invalid]
+
+        def number(index):
+            number = first + index
+            for skipped_number in skipped_numbers:
+                if skipped_number > number:
+                    break
+                number += 1
+            return number
+
+        present = [pa_compute.is_valid(column) for column in batch.columns]
+        nonblank = present[0]
+        for column in present[1:]:
+            nonblank = pa_compute.or_(nonblank, column)
+        self.report.rows += pa_compute.sum(nonblank).as_py() or 0
+
+        for attribute, values, valid in zip(self.attributes, batch.columns, present):
+            name = attribute.get("AttributeName")
+            attribute_type = attribute.get("AttributeType")
+            if attribute_type == "float":
+                self._check(number, values, self._not_float(values), name, "a float")
+            elif attribute_type == "integer":
+                not_integer = pa_compute.invert(
+                    pa_compute.match_substring_regex(values, INTEGER)
+                )
+                self._check(number, values, not_integer, name, "an integer")
+            elif attribute_type == "timestamp":
+                self._check_missing(number, valid, nonblank, name)
+                self._check_timestamps(number, values, name)
+            elif name == ITEM_ID_ATTRIBUTE:
+                self._check_missing(number, valid, nonblank, name)
+        self._report_errors()
+
+    def _rows(self, mask):
+        """The indices of the first rows of a mask (as many as there are errors still to report)"""
+        import pyarrow.compute as pa_compute
+
+        indices = pa_compute.indices_nonzero(pa_compute.fill_null(mask, False))
+        return indices[: max(self._limit, 0)].to_pylist()
+
+    def _check_missing(self, number, valid, nonblank, name):
+        import pyarrow.compute as pa_compute
+
+        missing = pa_compute.and_not(nonblank, valid)
+        for index in self._rows(missing):
+            self._error(number(index), f"{name} is missing")
+
+    def _check(self, number, values, invalid, name, description):
+        if invalid is None:
+            return
+        for index in self._rows(invalid):
+            value = values[index].as_py()
+            self._error(number(index), f"{name} value {value!r} is not {description}")
+
+    @staticmethod
+    def _not_float(values):
+        """
+        Find the values that are not floats
+        :param values: the values (strings)
+        :return: a boolean mask of the values that are not floats, or None if all of them are
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pa_compute
+
+        values = pa_compute.replace_substring_regex(values, r"^\+", "")
+        try:
+            pa_compute.cast(values, pa.float64())
+            return None
+        except pa.ArrowInvalid:
+            pass
+
+        # find the distinct values that cannot be cast
+        invalid = []
+        for value in pa_compute.unique(values).drop_null():
+            try:
+                pa_compute.cast(value, pa.float64())
+            except pa.ArrowInvalid:
+                invalid.append(value.as_py())
+        return pa_compute.is_in(values, value_set=pa.array(invalid, pa.string()))
+
+    def _check_timestamps(self, number, values, name):
+        """
+        Check timestamps against the timestamp format and the sampling grid of the data frequency
+        :param number: the row number of each index of the batch
+        :param values: the timestamps (strings)
+        :param name: the name of the timestamp attribute
+        :return: None
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pa_compute
+
+        problems = []
+        pattern, strptime_format = TIMESTAMP_FORMATS.get(
+            self.timestamp_format, (None, None)
+        )
+        valid = pa_compute.is_valid(values)
+        if pattern:
+            unmatched = pa_compute.invert(
+                pa_compute.match_substring_regex(values, pattern)
+            )
+            problems.append(
+                (
+                    unmatched,
+                    f"does not match the timestamp format {self.timestamp_format}",
+                )
+            )
+            valid = pa_compute.and_not(valid, unmatched)
+
+        formats = (
+            [strptime_format] if strptime_format else ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d"]
+        )
+        parsed = pa_compute.coalesce(
+            *[
+                pa_compute.strptime(values, format=fmt, unit="s", error_is_null=True)
+                for fmt in formats
+            ]
+        )
+        # strptime rolls invalid dates and times over (2020-02-30 is parsed as 2020-03-01) - they do not format back
+        formatted = pa_compute.cast(parsed, pa.string())
+        formatted = pa_compute.if_else(
+            pa_compute.equal(pa_compute.utf8_length(values), 10),
+            pa_compute.utf8_slice_codeunits(formatted, 0, 10),
+            formatted,
+        )
+        invalid = pa_compute.and_not(
+            valid,
+            pa_compute.fill_null(pa_compute.equal(formatted, values), False),
+        )
+        problems.append((invalid, "is not a valid timestamp"))
+        valid = pa_compute.and_not(valid, invalid)
+
+        if self.frequency in FREQUENCY_MINUTES:
+            off_grid = pa_compute.not_equal(
+                pa_compute.floor_temporal(
+                    parsed, multiple=FREQUENCY_MINUTES[self.frequency], unit="minute"
+                ),
+                parsed,
+            )
+            problems.append(
+                (
+                    pa_compute.and_(valid, off_grid),
+                    f"is not on the sampling grid of data frequency {self.frequency}",
+                )
+            )
+        elif self.frequency:
+            days = pa_compute.floor_temporal(parsed, unit="day")
+            not_midnight = pa_compute.and_(valid, pa_compute.not_equal(days, parsed))
+            problems.append(
+                (
+                    not_midnight,
+                    f"is not at midnight (data frequency {self.frequency})",
+                )
+            )
+            valid = pa_compute.and_not(valid, not_midnight)
+            problems.extend(self._check_anchor(parsed, valid))
+
+        for mask, problem in problems:
+            for index in self._rows(mask):
+                value = values[index].as_py()
+                self._error(number(index), f"{name} value {value!r} {problem}")
+
+    def _check_anchor(self, parsed, valid):
+        """
+        Check weekly, monthly and yearly timestamps against the first timestamp of the dataset
+        :param parsed: the timestamps (at midnight, where valid)
+        :param valid: a boolean mask of the valid timestamps
+        :return: list of the boolean mask of the timestamps with a problem, and the problem
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pa_compute
+
+        if self.frequency not in ["W", "M", "Y"]:
+            return []
+        if self._anchor is None:
+            first = pa_compute.index(valid, True).as_py()
+            if first < 0:
+                return []
+            self._anchor = parsed[first].as_py().date()
+        anchor = self._anchor
+
+        if self.frequency == "W":
+            off_grid = pa_compute.not_equal(
+                pa_compute.day_of_week(parsed), anchor.weekday()
+            )
+            problem = f"is not on the same weekday as {anchor} (data frequency W)"
+        elif self.frequency == "M":
+            off_grid = pa_compute.not_equal(pa_compute.day(parsed), anchor.day)
+            if _month_end(anchor):
+                next_day = pa_compute.add(
+                    parsed, pa.scalar(timedelta(days=1), pa.duration("s"))
+                )
+                off_grid = pa_compute.and_not(
+                    off_grid, pa_compute.equal(pa_compute.day(next_day), 1)
+                )
+            problem = (
+                f"is not on the same day of the month as {anchor} (data frequency M)"
+            )
+        else:
+            off_grid = pa_compute.or_(
+                pa_compute.not_equal(pa_compute.month(parsed), anchor.month),
+                pa_compute.not_equal(pa_compute.day(parsed), anchor.day),
+            )
+            problem = (
+                f"is not on the same day of the year as {anchor} (data frequency Y)"
+            )
+        return [(pa_compute.and_(valid, off_grid), problem)]
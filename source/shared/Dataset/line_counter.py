@@ -0,0 +1,188 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # bytes per ranged GET
+DEFAULT_WORKERS = 8  # concurrent ranged GETs
+
+# bytes past the end of a range needed to decide whether the last line starting in the range is blank ('""\r\n')
+LOOKAHEAD = 4
+
+# a newline that starts a line with an empty first field: a blank line, a line starting with a delimiter, or a line
+# starting with an empty quoted field (or a newline at the end of the object, which does not start a line)
+BLANK_LINE = re.compile(rb'\n(?=[\n,]|\r\n|\r\Z|""(?:[\n,]|\r\n|\r?\Z)|\Z)')
+
+
+def default_chunk_size() -> int:
+    """
+    Get the size of the byte ranges line counts and fingerprints are computed over, from environment variable
+    LINE_COUNT_CHUNK_SIZE
+    :return: the chunk size in bytes
+    """
+    return int(os.environ.get("LINE_COUNT_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+
+
+class LineCount:
+    """The result of counting the lines of an S3 object"""
+
+    def __init__(self, lines, size, seconds, ranges, fingerprint=None):
+        self.lines = lines
+        self.size = size
+        self.seconds = seconds
+        self.ranges = ranges
+        self.fingerprint = fingerprint
+
+    @property
+    def throughput(self) -> float:
+        """
+        Get the line counting throughput
+        :return: the throughput in MiB/s
+        """
+        if not self.seconds:
+            return 0.0
+        return self.size / self.seconds / (1024 * 1024)
+
+    def as_dict(self):
+        return {
+            "Lines": self.lines,
+            "Bytes": self.size,
+            "Seconds": self.seconds,
+            "Ranges": self.ranges,
+            "Fingerprint": self.fingerprint,
+            "MiBPerSecond": self.throughput,
+        }
+
+
+class LineCounter:
+    """
+    Counts the lines of a CSV object in S3 that have a non-empty first field - the same lines counted by the S3 Select
+    query `select count(*) from s3object s where s._1 != ''` - by downloading byte ranges of the object in parallel and
+    counting newlines in each range. Records are delimited by newlines (a trailing carriage return is part of the
+    delimiter); newlines in quoted fields are counted as record delimiters.
+
+    The content of the object is fingerprinted in the same pass: the fingerprint is the sha256 of the sha256 of each
+    range, so it depends on the chunk size (which is part of the fingerprint).
+    """
+
+    def __init__(self, cli, chunk_size=None, workers=None):
+        self.cli = cli
+        self.chunk_size = chunk_size or default_chunk_size()
+        self.workers = workers or int(
+            os.environ.get("LINE_COUNT_WORKERS", DEFAULT_WORKERS)
+        )
+
+    def count(self, bucket, key, size=None, etag=None) -> LineCount:
+        """
+        Count the lines of an S3 object
+        :param bucket: the S3 bucket
+        :param key: the S3 key
+        :param size: the size of the object in bytes (if known)
+        :param etag: the ETag of the object (if known) - all ranges are read from this version of the object
+        :return: the line count
+        """
+        if size is None or etag is None:
+            head = self.cli.head_object(Bucket=bucket, Key=key)
+            size = head.get("ContentLength")
+            etag = head.get("ETag")
+
+        return next(iter(self.count_objects(bucket, [(key, size, etag)])))
+
+    def count_objects(self, bucket, objects) -> list:
+        """
+        Count the lines of several S3 objects (e.g. the shards of a multipart dataset). The ranges of all objects are
+        read by the same pool of workers, so small objects do not leave workers idle.
+        :param bucket: the S3 bucket
+        :param objects: a list of (key, size, etag) of the objects
+        :return: a list of the line counts, in the order of objects
+        """
+        start_time = time.perf_counter()
+        ranges = [
+            (key, size, etag, start, min(start + self.chunk_size, size))
+            for key, size, etag in objects
+            for start in range(0, size, self.chunk_size)
+        ]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            counts = list(executor.map(lambda r: self._count_range(bucket, *r), ranges))
+
+        results = []
+        counts = iter(counts)
+        for key, size, _ in objects:
+            object_counts = list(islice(counts, -(-size // self.chunk_size)))
+            lines = sum(lines for lines, _ in object_counts)
+            digest = hashlib.sha256(
+                b"".join(digest for _, digest in object_counts)
+            ).hexdigest()
+            result = LineCount(
+                lines,
+                size,
+                time.perf_counter() - start_time,
+                len(object_counts),
+                fingerprint=f"sha256-{self.chunk_size}:{digest}",
+            )
+            logger.info(
+                "counted %d lines in s3://%s/%s (%d bytes, %d ranges) at %.1f MiB/s"
+                % (lines, bucket, key, size, len(object_counts), result.throughput)
+            )
+            results.append(result)
+        return results
+
+    def _count_range(self, bucket, key, size, etag, start, end):
+        """
+        Count the lines that start in a byte range of an S3 object
+        :param bucket: the S3 bucket
+        :param key: the S3 key
+        :param size: the size of the object in bytes
+        :param etag: the ETag of the object
+        :param start: the first byte of the range
+        :param end: the byte after the last byte of the range
+        :return: the number of lines with a non-empty first field that start in the range, and the range digest
+        """
+        # include the byte before the range (to know if the range starts a line) and enough bytes after the range to
+        # know if its last line is blank
+        first = max(start - 1, 0)
+        last = min(end + LOOKAHEAD, size) - 1
+        get_args = {"Bucket": bucket, "Key": key, "Range": f"bytes={first}-{last}"}
+        if etag:
+            get_args["IfMatch"] = etag
+        body = self.cli.get_object(**get_args)["Body"].read()
+
+        offset = start - first
+        digest = hashlib.sha256(memoryview(body)[offset : offset + end - start])
+        lines = self.count_lines(body if start else b"\n" + body, end - start)
+        return lines, digest.digest()
+
+    @staticmethod
+    def count_lines(data: bytes, length) -> int:
+        """
+        Count the lines with a non-empty first field that start in a range of data
+        :param data: the byte before the range (a newline at the start of the object), the range and its lookahead
+        :param length: the length of the range in bytes
+        :return: the number of lines with a non-empty first field that start in the range
+        """
+        # each newline in data[0:length] starts a line in the range
+        lines = data.count(b"\n", 0, length)
+        for match in BLANK_LINE.finditer(data):
+            if match.start() >= length:
+                break
+            lines -= 1
+        return lines
@@ -0,0 +1,178 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+from os.path import splitext
+
+from shared.logging import get_logger
+from shared.s3.multipart_upload import (
+    DEFAULT_PART_SIZE,
+    MultipartUpload,
+    SOURCE_ETAG_METADATA,
+    source_etag,
+)
+
+logger = get_logger(__name__)
+
+CONVERTED_PREFIX = "converted"  # converted datasets are stored under converted/<key>
+PARQUET_FORMAT = "PARQUET"
+CSV_FORMAT = "CSV"
+COMPRESSION = "snappy"
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024  # bytes of CSV converted at a time
+
+# Arrow types of the dataset schema attribute types - timestamps are kept as strings in the configured timestamp format,
+# geolocations as strings in the configured geolocation format
+ARROW_TYPES = {"integer": "int64", "float": "float64"}
+
+
+def has_first_field(table):
+    """
+    Find the rows of a dataset with a first field (rows with an empty first field are not counted as rows of the
+    dataset, see LineCounter)
+    :param table: the rows (a pyarrow RecordBatch or Table)
+    :return: a boolean mask of the rows
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pa_compute
+
+    column = table.column(0)
+    valid = pa_compute.is_valid(column)
+    if pa.types.is_string(column.type):
+        valid = pa_compute.and_(valid, pa_compute.not_equal(column, ""))
+    return valid
+
+
+def converted_key(source_key: str) -> str:
+    """
+    Get the key of the Parquet conversion of a dataset
+    :param source_key: the S3 key of the dataset file (or the folder of a multipart dataset)
+    :return: the S3 key of the converted dataset file (or folder)
+    """
+    if source_key.endswith("/"):
+        return f"{CONVERTED_PREFIX}/{source_key}"
+    return f"{CONVERTED_PREFIX}/{splitext(source_key)[0]}.parquet"
+
+
+class ParquetConverter:
+    """
+    Converts a dataset from CSV to Parquet, typed by the dataset schema and compressed, in a single streaming pass:
+    blocks of CSV read from S3 are written as Parquet row groups to a multipart upload. Rows with an empty first field
+    are dropped (they are not counted as rows of the dataset, see LineCounter). A converted object records the ETag
+    of the CSV it was converted from, so each version of a dataset is converted once.
+    """
+
+    def __init__(
+        self,
+        cli,
+        schema: dict,
+        part_size=DEFAULT_PART_SIZE,
+        block_size=DEFAULT_BLOCK_SIZE,
+    ):
+        self.cli = cli
+        self.attributes = (schema or {}).get("Attributes", [])
+        self.part_size = part_size
+        self.block_size = block_size
+
+    def convert(self, dataset_file) -> str:
+        """
+        Convert the current version of a dataset file (or each shard of a multipart dataset) to Parquet
+        :param dataset_file: the dataset file
+        :return: the S3 key of the converted dataset file (or folder)
+        """
+        target = converted_key(dataset_file.key)
+        if not dataset_file.multipart:
+            self.convert_object(
+                dataset_file.bucket,
+                dataset_file.key,
+                target,
+                etag=dataset_file.head.get("ETag"),
+            )
+            return target
+
+        converted = set()
+        for shard in dataset_file.shards:
+            shard_target = converted_key(shard["Key"])
+            self.convert_object(
+                dataset_file.bucket, shard["Key"], shard_target, etag=shard["ETag"]
+            )
+            converted.add(shard_target)
+
+        # the whole folder is imported, so remove the conversions of shards that no longer exist
+        paginator = self.cli.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=dataset_file.bucket, Prefix=target):
+            for obj in page.get("Contents", []):
+                if obj["Key"] not in converted:
+                    logger.info("removing stale converted shard %s" % obj["Key"])
+                    self.cli.delete_object(Bucket=dataset_file.bucket, Key=obj["Key"])
+        return target
+
+    def convert_object(self, bucket, key, target, etag=None):
+        """
+        Convert a CSV object to Parquet, unless it was already converted
+        :param bucket: the S3 bucket
+        :param key: the S3 key of the CSV object
+        :param target: the S3 key of the Parquet object
+        :param etag: the ETag of the CSV object (if known) - this version of the object is converted
+        :return: None
+        """
+        if etag and source_etag(self.cli, bucket, target) == etag:
+            logger.info("%s is already converted to %s" % (key, target))
+            return
+
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pa_parquet
+
+        schema = pa.schema(
+            [
+                (
+                    attribute.get("AttributeName"),
+                    getattr(
+                        pa, ARROW_TYPES.get(attribute.get("AttributeType"), "string")
+                    )(),
+                )
+                for attribute in self.attributes
+            ]
+        )
+
+        get_args = {"Bucket": bucket, "Key": key}
+        if etag:
+            get_args["IfMatch"] = etag
+        body = self.cli.get_object(**get_args)["Body"]
+        reader = pa_csv.open_csv(
+            pa.PythonFile(body, mode="r"),
+            read_options=pa_csv.ReadOptions(
+                column_names=schema.names, block_size=self.block_size
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=schema, strings_can_be_null=False
+            ),
+        )
+
+        rows = 0
+        metadata = {SOURCE_ETAG_METADATA: etag} if etag else {}
+        with MultipartUpload(
+            self.cli, bucket, target, self.part_size, metadata
+        ) as upload:
+            with pa_parquet.ParquetWriter(
+                upload, schema, compression=COMPRESSION
+            ) as writer:
+                for batch in reader:
+                    batch = batch.filter(has_first_field(batch))
+                    rows += batch.num_rows
+                    writer.write_table(pa.Table.from_batches([batch], schema=schema))
+
+        logger.info(
+            "converted %d rows of %s to %s (%d bytes)"
+            % (rows, key, target, upload.size)
+        )
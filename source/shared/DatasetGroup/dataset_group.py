@@ -126,9 +126,4 @@ class DatasetGroup(ForecastClient):
         info = self.cli.describe_dataset_group(DatasetGroupArn=self.arn)
         dataset_arns = info.get("DatasetArns")
 
-        datasets_info = [
-            self.cli.describe_dataset(DatasetArn=dataset_arn)
-            for dataset_arn in dataset_arns
-        ]
-
-        return datasets_info
+        return self.describe_many("describe_dataset", dataset_arns)
@@ -87,10 +87,9 @@ class Predictor(ForecastClient):
             DatasetGroupArn=self._dataset_group.arn
         )
 
-        datasets = [
-            self.cli.describe_dataset(DatasetArn=arn)
-            for arn in dataset_group.get("DatasetArns")
-        ]
+        datasets = self.describe_many(
+            "describe_dataset", dataset_group.get("DatasetArns")
+        )
 
         datasets_ready = all(dataset.get("Status") == "ACTIVE" for dataset in datasets)
         if not datasets_ready:
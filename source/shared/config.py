@@ -12,37 +12,123 @@
 # #####################################################################################################################
 
 import copy
-from typing import List
+import json
+from typing import List, TYPE_CHECKING
 
-from botocore.exceptions import ParamValidationError
+from botocore.exceptions import ClientError, ParamValidationError
 
 from shared.Dataset.data_frequency import DataFrequency
 from shared.Dataset.data_timestamp_format import DataTimestampFormat
-from shared.Dataset.dataset import Dataset
 from shared.Dataset.dataset_domain import DatasetDomain
 from shared.Dataset.dataset_file import DatasetFile
-from shared.Dataset.dataset_import_job import DatasetImportJob
 from shared.Dataset.dataset_type import DatasetType
-from shared.DatasetGroup.dataset_group import DatasetGroup
-from shared.Forecast.forecast import Forecast
-from shared.Predictor.predictor import Predictor
+from shared.config_cache import (
+    CompiledConfig,
+    ConfigCacheEntry,
+    get_config_cache,
+    get_config_snapshots,
+)
 from shared.helpers import get_s3_client, get_sfn_client
+from shared.logging import get_logger
+
+# resource modules are imported where they are used, so that each AWS Lambda function only loads the resources it needs
+if TYPE_CHECKING:  # pragma: no cover
+    from shared.Dataset.dataset import Dataset
 
 DEFAULT_KEY = "Default"  # Config file defaults under 'Default' section
 DEFAULT_S3_KEY = "forecast-defaults.yaml"  # S3 bucket key for forecast defaults
+DEFAULT_S3_SHARD_PREFIX = (
+    "config"  # S3 bucket key prefix for per-prefix config files (<prefix>.yaml)
+)
 DEFAULT_SFN_KEY = "config"  # StepFunctions input path for config
+DEFAULT_SFN_REF_KEY = (
+    "config_ref"  # StepFunctions input path for a config snapshot reference
+)
+
+logger = get_logger(__name__)
 
 
 class ConfigNotFound(Exception):
     pass
 
 
+class ConfigIndex:
+    """
+    An index of the configuration items of each config section (e.g. a prefix or `Default`) by dataset type. A section
+    is resolved once per dataset type - its `Dataset` is the entry of its `Datasets` with that dataset type - and all of
+    its dotted paths (e.g. Dataset.Domain) are flattened, so lookups do not depend on the number of sections. The
+    config the index is built from is never modified.
+    """
+
+    def __init__(self, config: dict):
+        self._config = config or {}
+        self._sections = {}
+
+    def section(self, key, data_type) -> dict:
+        """
+        Get the resolved items of a config section for a dataset type
+        :param key: the config section key (e.g. the dataset file prefix)
+        :param data_type: the dataset type
+        :return: dict of dotted path to config item
+        """
+        index_key = (key, str(data_type))
+        items = self._sections.get(index_key)
+        if items is None:
+            section = self._config.get(key, {})
+            if not isinstance(section, dict):
+                section = {}
+
+            for dataset in section.get("Datasets", []):
+                if dataset.get("DatasetType") == data_type:
+                    section = {**section, "Dataset": dataset}
+
+            items = {}
+            self._flatten(section, "", items)
+            self._sections[index_key] = items
+        return items
+
+    def _flatten(self, node: dict, path: str, items: dict):
+        for key, value in node.items():
+            items[path + key] = value
+            if isinstance(value, dict):
+                self._flatten(value, f"{path}{key}.", items)
+
+    def get(self, key, data_type, item):
+        """
+        Get a config item from a config section
+        :param key: the config section key (e.g. the dataset file prefix)
+        :param data_type: the dataset type
+        :param item: the dotted path of the config item (e.g. Dataset.Domain)
+        :return: the config item, or {} if it is not configured
+        """
+        return self.section(key, data_type).get(item, {})
+
+
 class Config:
     """Used to generate Amazon Forecast resources as specified from a configuration file."""
 
     def __init__(self):
         self.s3 = get_s3_client()
         self.sfn = get_sfn_client()
+        self._config = None
+        self._index = ConfigIndex({})
+        self._cache_key = None
+        self._cache_entry = None
+
+    @property
+    def config(self) -> dict:
+        """
+        Get the loaded configuration
+        :return: dict of the configuration
+        """
+        return self._config
+
+    @config.setter
+    def config(self, config: dict):
+        self._config = config
+        self._index = ConfigIndex(config)
+        self._cache_key = None
+        self._cache_entry = None
 
     def config_item(self, dataset_file: DatasetFile, item: str):
         """
@@ -51,27 +137,14 @@ class Config:
         :param item: The config item to get
         :return: The configured config item or default if an override is not specified.
         """
-        config = self.config.copy()
-
-        # unroll the config for this dataset file type
-        for key in config.keys():
-            for dataset in config.get(key).get("Datasets", []):
-                if dataset.get("DatasetType") == dataset_file.data_type:
-                    config[key]["Dataset"] = dataset
-
-        override = config.get(dataset_file.prefix, {})
-        defaults = config.get(DEFAULT_KEY, {})
-
-        config_filter = item.split(".")
-
-        for key in config_filter:
-            override = override.get(key, {})
-            defaults = defaults.get(key, {})
+        override = self._index.get(dataset_file.prefix, dataset_file.data_type, item)
+        defaults = self._index.get(DEFAULT_KEY, dataset_file.data_type, item)
 
         if not override and not defaults:
             raise ValueError(f"configuration item missing key or value for {item}")
 
-        return override if override else defaults
+        # callers get their own copy of the config item, so that they can't modify the index
+        return copy.deepcopy(override if override else defaults)
 
     def dataset_domain(self, dataset_file: DatasetFile) -> DatasetDomain:
         """
@@ -120,13 +193,47 @@ class Config:
         format = self.config_item(dataset_file, "Dataset.TimestampFormat")
         return DataTimestampFormat(format)
 
-    def dataset(self, dataset_file: DatasetFile) -> Dataset:
+    def import_format(self, dataset_file: DatasetFile) -> str:
+        """
+        Get the format datasets are imported in from config (Dataset.ImportFormat, CSV by default). Datasets imported
+        as PARQUET are converted from CSV before they are imported.
+        :param dataset_file: The dataset file to use
+        :return: the import format (CSV or PARQUET)
+        """
+        from shared.Dataset.parquet_converter import CSV_FORMAT
+
+        try:
+            return self.config_item(dataset_file, "Dataset.ImportFormat")
+        except ValueError:
+            return CSV_FORMAT
+
+    def aggregation(self, dataset_file: DatasetFile):
+        """
+        Get the aggregation of each column of a dataset from config (Dataset.Aggregation). Datasets with an aggregation
+        are resampled to their data frequency before they are imported - columns that are not configured are summed
+        (target time series) or averaged (related time series).
+        :param dataset_file: The dataset file to use
+        :return: dict of column name to aggregation, or None if the dataset is not resampled
+        """
+        # metadata has no timestamps to resample
+        if dataset_file.data_type == DatasetType.ITEM_METADATA:
+            return None
+
+        try:
+            aggregation = self.config_item(dataset_file, "Dataset.Aggregation")
+        except ValueError:
+            return None
+        return aggregation
+
+    def dataset(self, dataset_file: DatasetFile) -> "Dataset":
         """
         Get the dataset from config
         :param dataset_file: The dataset file to use
         :return: the dataset
         """
         """Get the dataset referenced by the dataset file"""
+        from shared.Dataset.dataset import Dataset
+
         dataset_parameters = {
             "dataset_name": dataset_file.name,
             "dataset_type": dataset_file.data_type,
@@ -139,7 +246,7 @@ class Config:
         ds = Dataset(**dataset_parameters)
         return ds
 
-    def datasets(self, dataset_file: DatasetFile) -> List[Dataset]:
+    def datasets(self, dataset_file: DatasetFile) -> List["Dataset"]:
         """
         Get all datasets that would be referenced by a dataset group.
         :param dataset_file: The dataset file to use
@@ -177,6 +284,7 @@ class Config:
         :param dataset_file: The dataset file to use
         :return: The dataset group
         """
+        from shared.DatasetGroup.dataset_group import DatasetGroup
 
         dsg = DatasetGroup(
             dataset_group_name=dataset_file.prefix,
@@ -197,12 +305,19 @@ class Config:
         :param dataset_file: The dataset file to use
         :return: The dataset import job
         """
+        from shared.Dataset.dataset_import_job import DatasetImportJob
 
         ds = self.dataset(dataset_file)
+        aggregation = self.aggregation(dataset_file)
         dsi = DatasetImportJob(
             dataset_file=dataset_file,
             dataset_arn=ds.arn,
             timestamp_format=self.data_timestamp_format(dataset_file),
+            import_format=self.import_format(dataset_file),
+            aggregation=aggregation,
+            data_frequency=(
+                None if aggregation is None else str(self.data_frequency(dataset_file))
+            ),
         )
 
         return dsi
@@ -240,6 +355,8 @@ class Config:
         :param dataset_file: The dataset file to use
         :return: The predictor
         """
+        from shared.Predictor.predictor import Predictor
+
         predictor_config = self.config_item(dataset_file, "Predictor")
 
         dsg = self.dataset_group(dataset_file)
@@ -256,6 +373,8 @@ class Config:
         :param dataset_file: The dataset file to use
         :return: The forecast
         """
+        from shared.Forecast.forecast import Forecast
+
         forecast_config = self.config_item(dataset_file, "Forecast")
 
         dsg = self.dataset_group(dataset_file)
@@ -273,55 +392,200 @@ class Config:
         :return: Config
         """
         cfg = Config()
-        cfg.config = event.get(DEFAULT_SFN_KEY)
+        if DEFAULT_SFN_REF_KEY in event:
+            cfg.config = get_config_snapshots().get(cfg.s3, event[DEFAULT_SFN_REF_KEY])
+        else:
+            cfg.config = event.get(DEFAULT_SFN_KEY)
         return cfg
 
+    def snapshot(self, bucket) -> str:
+        """
+        Store a snapshot of this config in S3, addressed by the hash of its content
+        :param bucket: The bucket to store the snapshot in
+        :return: The snapshot reference, to pass to the AWS Step Functions State Machine as `config_ref`
+        """
+        return get_config_snapshots().put(self.s3, bucket, self.config)
+
     @classmethod
-    def from_s3(cls, bucket):
+    def from_s3(cls, bucket, prefix=None):
         """
-        Used to load Config from S3 (using default key DEFAULT_S3_KEY)
+        Used to load Config from S3 (using default key DEFAULT_S3_KEY). If a prefix is provided, only the `Default`
+        config and the config for that prefix are loaded - the prefix config is read from its own config file
+        (DEFAULT_S3_SHARD_PREFIX/<prefix>.yaml) if it exists, otherwise from DEFAULT_S3_KEY.
         :param bucket: The bucket to load config from
+        :param prefix: The dataset file prefix to load config for (by default, all config in DEFAULT_S3_KEY is loaded)
         :return: Config
         """
         cfg = Config()
-        try:
-            s3_config = cfg.s3.get_object(Bucket=bucket, Key=DEFAULT_S3_KEY)
-        except cfg.s3.exceptions.NoSuchKey:
+        cached = cls._load(cfg.s3, bucket, DEFAULT_S3_KEY)
+        if not cached:
             raise ConfigNotFound(
                 f"Configuration file s3://{bucket}/{DEFAULT_S3_KEY} not found. Please refer to the solutions implementation guide for configuration instructions."
             )
 
-        # try to load the configuration as YAML
+        if not prefix:
+            cfg.config = cached.config
+            cfg._cache_key = (bucket, DEFAULT_S3_KEY)
+            cfg._cache_entry = cached
+            return cfg
+
+        shard = cls._load(
+            cfg.s3, bucket, f"{DEFAULT_S3_SHARD_PREFIX}/{prefix}.yaml", shard=True
+        )
+
+        # the config of a prefix (and its validation errors) is cached under the ETags of the files it was loaded from
+        cache_key = (bucket, f"{DEFAULT_S3_KEY}#{prefix}")
+        etag = f"{cached.etag}:{shard.etag if shard else ''}"
+        entry = get_config_cache().get(*cache_key)
+        if not entry or entry.etag != etag:
+            loaded_cfg = {DEFAULT_KEY: cached.config[DEFAULT_KEY]}
+            if shard:
+                loaded_cfg[prefix] = shard.config
+            elif prefix in cached.config:
+                loaded_cfg[prefix] = cached.config[prefix]
+            entry = ConfigCacheEntry(etag, loaded_cfg)
+
+        cfg.config = entry.config
+        cfg._cache_key = cache_key
+        cfg._cache_entry = entry
+        return cfg
+
+    @classmethod
+    def _load(cls, cli, bucket, key, shard=False) -> ConfigCacheEntry:
+        """
+        Load a configuration file from S3. Files are cached by ETag, and only downloaded and parsed if they changed. On
+        a cache miss, the compiled configuration file (if current) is used instead of parsing the YAML.
+        :param cli: The S3 client
+        :param bucket: The bucket to load the configuration file from
+        :param key: The key of the configuration file
+        :param shard: True if the file is the configuration of a single prefix
+        :return: The cached configuration file, or None if it does not exist
+        """
+        cache = get_config_cache()
+        cached = cache.get(bucket, key)
+
+        if not cached:
+            cached = cls._load_compiled(cli, bucket, key)
+            if cached:
+                cache.put(bucket, key, cached)
+                return cached
+
+        # only download and parse the configuration if it has changed since it was cached
+        get_args = {"Bucket": bucket, "Key": key}
+        if cached:
+            get_args["IfNoneMatch"] = cached.etag
+
+        try:
+            s3_config = cli.get_object(**get_args)
+        except cli.exceptions.NoSuchKey:
+            cache.invalidate(bucket, key)
+            return None
+        except ClientError as excinfo:
+            if not cached or excinfo.response["Error"]["Code"] != "304":
+                raise
+            logger.debug("%s is unchanged, using cached config" % key)
+            return cached
+
+        loaded_cfg = cls._parse(
+            s3_config.get("Body").read().decode("utf-8"), key=key, shard=shard
+        )
+
+        cached = ConfigCacheEntry(s3_config.get("ETag"), loaded_cfg)
+        cache.put(bucket, key, cached)
+        cls._store_compiled(cli, bucket, key, cached)
+        return cached
+
+    @staticmethod
+    def _load_compiled(cli, bucket, key) -> ConfigCacheEntry:
+        """
+        Load the compiled configuration file of a configuration file from S3
+        :param cli: The S3 client
+        :param bucket: The bucket to load the configuration file from
+        :param key: The key of the configuration file
+        :return: The configuration, or None if there is no current compiled configuration file
+        """
+        try:
+            etag = cli.head_object(Bucket=bucket, Key=key).get("ETag")
+        except ClientError as excinfo:
+            if excinfo.response["Error"]["Code"] != "404":
+                raise
+            return None
+
+        # the compiled configuration file is optional - fall back to parsing the YAML if it can't be read
+        try:
+            compiled = cli.get_object(Bucket=bucket, Key=CompiledConfig.key(key))
+        except ClientError as excinfo:
+            logger.debug("no compiled config for %s: %s" % (key, excinfo))
+            return None
+
+        loaded_cfg = CompiledConfig.deserialize(compiled.get("Body").read(), etag)
+        if loaded_cfg is None:
+            logger.info("compiled config for %s is stale" % key)
+            return None
+
+        logger.debug("using compiled config for %s" % key)
+        return ConfigCacheEntry(etag, loaded_cfg)
+
+    @staticmethod
+    def _store_compiled(cli, bucket, key, cached: ConfigCacheEntry):
+        """
+        Store the compiled configuration file of a configuration file in S3. A caller that may not write the compiled
+        file (e.g. a role with read-only access to the bucket) logs a warning and keeps parsing the YAML on each load.
+        :param cli: The S3 client
+        :param bucket: The bucket of the configuration file
+        :param key: The key of the configuration file
+        :param cached: The parsed configuration file
+        :return: None
+        """
+        try:
+            cli.put_object(
+                Bucket=bucket,
+                Key=CompiledConfig.key(key),
+                Body=CompiledConfig.serialize(cached.etag, cached.config),
+                ContentType="application/json",
+            )
+        except (ClientError, TypeError, ValueError) as excinfo:
+            logger.warning(
+                "could not store compiled config for %s: %s" % (key, excinfo)
+            )
+
+    @staticmethod
+    def _parse(body: str, key=DEFAULT_S3_KEY, shard=False) -> dict:
+        """
+        Parse and check the structure of a configuration file
+        :param body: the configuration file contents
+        :param key: the configuration file key
+        :param shard: True if the file is the configuration of a single prefix (and has no `Default` key)
+        :return: dict of the configuration. Raises ValueError if the configuration file is not valid
+        """
+        # try to load the configuration as YAML (with the libyaml C loader, if available)
         import yaml
 
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
         try:
-            loaded_cfg = yaml.safe_load(s3_config.get("Body").read().decode("utf-8"))
+            loaded_cfg = yaml.load(body, Loader=loader)
         except yaml.YAMLError as excinfo:
-            raise ValueError(f"{DEFAULT_S3_KEY} is not a valid config file: {excinfo}")
+            raise ValueError(f"{key} is not a valid config file: {excinfo}")
 
         # make sure the config is a dictionary
         cfg_type = type(loaded_cfg).__name__
         if cfg_type != "dict":
-            raise ValueError(
-                f"{DEFAULT_S3_KEY} should contain a YAML dict but is a {cfg_type}."
-            )
+            raise ValueError(f"{key} should contain a YAML dict but is a {cfg_type}.")
 
         # make sure the config contains a default key
         default = loaded_cfg.get("Default")
-        if not default:
-            raise ValueError(f"{DEFAULT_S3_KEY} should contain a `Default` key")
+        if not default and not shard:
+            raise ValueError(f"{key} should contain a `Default` key")
 
-        cfg.config = loaded_cfg
-        return cfg
+        return loaded_cfg
 
     def _valid_toplevel_keys(self, errors):
-        cfg_copy = copy.deepcopy(self.config)
-        config_keys = list(cfg_copy.keys())
+        config_keys = list(self.config.keys())
         if "__Testing__" in config_keys:
             config_keys.remove("__Testing__")
 
         for key in config_keys:
-            if not isinstance(cfg_copy.get(key), dict):
+            if not isinstance(self.config.get(key), dict):
                 errors.append(
                     f"configuration file top level key {key} must be a dictionary"
                 )
@@ -329,6 +593,8 @@ class Config:
         return config_keys
 
     def _valid_dataset_group(self, config_key, resource, config_data, errors):
+        from shared.DatasetGroup.dataset_group import DatasetGroup
+
         try:
             DatasetGroup.validate_config(DatasetGroupName="placeholder", **config_data)
         except ParamValidationError as excinfo:
@@ -337,11 +603,30 @@ class Config:
             )
 
     def _valid_datasets(self, config_key, resource, config_data, errors):
+        from shared.Dataset.dataset import Dataset
+        from shared.Dataset.dataset_resampler import AGGREGATIONS
+
         if not isinstance(config_data, list):
             errors.append(f"Datasets for {config_key} must be a list")
 
         for dataset_config in config_data:
-            dataset_config.pop("TimestampFormat", None)
+            import_format = dataset_config.get("ImportFormat", "CSV")
+            if import_format not in ["CSV", "PARQUET"]:
+                errors.append(
+                    f"configuration issue for {config_key}.{resource}: ImportFormat must be one of CSV, PARQUET"
+                )
+            aggregation = dataset_config.get("Aggregation", {})
+            if not isinstance(aggregation, dict) or any(
+                value not in AGGREGATIONS for value in aggregation.values()
+            ):
+                errors.append(
+                    f"configuration issue for {config_key}.{resource}: Aggregation must map columns to one of {', '.join(AGGREGATIONS)}"
+                )
+            dataset_config = {
+                k: v
+                for k, v in dataset_config.items()
+                if k not in ["TimestampFormat", "ImportFormat", "Aggregation"]
+            }
             try:
                 Dataset.validate_config(DatasetName="placeholder", **dataset_config)
             except ParamValidationError as excinfo:
@@ -350,7 +635,9 @@ class Config:
                 )
 
     def _valid_predictor(self, config_key, resource, config_data, errors):
-        config_data.pop("MaxAge", None)
+        from shared.Predictor.predictor import Predictor
+
+        config_data = {k: v for k, v in config_data.items() if k != "MaxAge"}
         try:
             Predictor.validate_config(
                 PredictorName="placeholder",
@@ -363,6 +650,8 @@ class Config:
             )
 
     def _valid_forecast(self, config_key, resource, config_data, errors):
+        from shared.Forecast.forecast import Forecast
+
         try:
             Forecast.validate_config(
                 ForecastName="placeholder", PredictorArn="placeholder", **config_data
@@ -373,8 +662,7 @@ class Config:
             )
 
     def _valid_subkeys(self, config_key, errors):
-        cfg_copy = copy.deepcopy(self.config)
-        resources = cfg_copy.get(config_key).keys()
+        resources = self.config.get(config_key).keys()
 
         for required in ["DatasetGroup", "Datasets", "Predictor", "Forecast"]:
             if required not in resources:
@@ -383,7 +671,7 @@ class Config:
                 )
 
         for resource in resources:
-            config_data = cfg_copy.get(config_key).get(resource)
+            config_data = self.config.get(config_key).get(resource)
             if resource == "DatasetGroup":
                 self._valid_dataset_group(config_key, resource, config_data, errors)
             elif resource == "Datasets":
@@ -397,11 +685,50 @@ class Config:
                     f"{config_key} resource {resource} is not supported (must be one of 'DatasetGroup', 'Datasets', 'Predictor', 'Forecast')"
                 )
 
+    def _valid_section(self, config_key):
+        """
+        Validate a top level config section. Results are cached by the content hash of the section, so only new or
+        changed sections are validated.
+        :param config_key: The top level config key (e.g. Default or a dataset file prefix)
+        :return: List of validation errors for the section
+        """
+        from shared.validation import get_forecast_validator
+
+        validator = get_forecast_validator()
+        cache = validator.cache
+        if not cache:
+            errors = []
+            self._valid_subkeys(config_key, errors)
+            return errors
+
+        fingerprint = cache.fingerprint(
+            "validate_config",
+            {config_key: self.config.get(config_key)},
+            validator.model_version,
+        )
+        report = cache.get(fingerprint)
+        if report is not None:
+            return json.loads(report) if report else []
+
+        errors = []
+        self._valid_subkeys(config_key, errors)
+        cache.put(fingerprint, json.dumps(errors) if errors else "")
+        return errors
+
     def validate(self):
+        # the validation errors of a cached configuration file are cached with it
+        if self._cache_entry and self._cache_entry.errors is not None:
+            return list(self._cache_entry.errors)
+
         errors = []
 
         config_keys = self._valid_toplevel_keys(errors)
         for config_key in config_keys:
-            self._valid_subkeys(config_key, errors)
+            if isinstance(self.config.get(config_key), dict):
+                errors.extend(self._valid_section(config_key))
+
+        if self._cache_entry:
+            self._cache_entry.errors = list(errors)
+            get_config_cache().put(*self._cache_key, self._cache_entry)
 
         return errors
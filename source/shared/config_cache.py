@@ -0,0 +1,278 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import hashlib
+import json
+import os
+from threading import Lock
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_DIR = "/tmp"
+DEFAULT_SNAPSHOT_PREFIX = "config-snapshots"
+COMPILED_SUFFIX = ".json"  # compiled configuration files are stored next to their YAML source as <key>.json
+COMPILED_VERSION = 1  # increment when the compiled configuration format changes
+
+# declaring these global allows warm AWS Lambda containers to reuse parsed configuration
+config_cache_global = None
+config_snapshots_global = None
+config_cache_lock = Lock()
+
+
+class ConfigCacheEntry:
+    """A parsed configuration file, the ETag of the object it was parsed from and (once known) its validation errors"""
+
+    def __init__(self, etag, config, errors=None):
+        self.etag = etag
+        self.config = config
+        self.errors = errors
+
+    def as_dict(self):
+        return {"ETag": self.etag, "Config": self.config, "Errors": self.errors}
+
+
+class ConfigCache:
+    """
+    Caches parsed configuration files by S3 bucket and key. Entries are kept in memory and written to a local file (in
+    AWS Lambda, under /tmp) so that they survive for the lifetime of the container. An entry is only used while its
+    ETag matches the object in S3.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        self._lock = Lock()
+
+    def _file(self, bucket, key):
+        if not self.path:
+            return None
+        name = hashlib.sha256(f"{bucket}/{key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.path, f"forecast-config-{name}.json")
+
+    def get(self, bucket, key) -> ConfigCacheEntry:
+        """
+        Get the cached configuration for an S3 object
+        :param bucket: the S3 bucket
+        :param key: the S3 key
+        :return: the cache entry, or None if the configuration is not cached
+        """
+        with self._lock:
+            entry = self._entries.get((bucket, key))
+            if entry:
+                return entry
+
+            path = self._file(bucket, key)
+            if not path or not os.path.exists(path):
+                return None
+
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+                entry = ConfigCacheEntry(data["ETag"], data["Config"], data["Errors"])
+            except (OSError, ValueError, KeyError) as excinfo:
+                logger.warning("could not load config cache: %s" % str(excinfo))
+                return None
+
+            self._entries[(bucket, key)] = entry
+            return entry
+
+    def put(self, bucket, key, entry: ConfigCacheEntry):
+        """
+        Cache the configuration for an S3 object
+        :param bucket: the S3 bucket
+        :param key: the S3 key
+        :param entry: the cache entry
+        :return: None
+        """
+        with self._lock:
+            self._entries[(bucket, key)] = entry
+            self._write(bucket, key, entry)
+
+    def invalidate(self, bucket, key):
+        """
+        Discard the cached configuration for an S3 object
+        :param bucket: the S3 bucket
+        :param key: the S3 key
+        :return: None
+        """
+        with self._lock:
+            self._entries.pop((bucket, key), None)
+            path = self._file(bucket, key)
+            if path and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as excinfo:
+                    logger.warning("could not remove config cache: %s" % str(excinfo))
+
+    def _write(self, bucket, key, entry: ConfigCacheEntry):
+        path = self._file(bucket, key)
+        if not path:
+            return
+
+        try:
+            temp_path = f"{path}.{os.getpid()}"
+            with open(temp_path, "w") as f:
+                json.dump(entry.as_dict(), f)
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError) as excinfo:
+            logger.warning("could not write config cache: %s" % str(excinfo))
+
+
+class CompiledConfig:
+    """
+    A compiled configuration file: the parsed YAML of a configuration file, stored as JSON next to its source so that
+    cold containers can load it without parsing YAML. A compiled file is stamped with its format version and the ETag
+    of the YAML it was compiled from, and is only used while both match.
+    """
+
+    @staticmethod
+    def key(source_key) -> str:
+        """
+        Get the key of the compiled configuration file for a YAML configuration file
+        :param source_key: the S3 key of the YAML configuration file
+        :return: the S3 key of the compiled configuration file
+        """
+        return f"{source_key}{COMPILED_SUFFIX}"
+
+    @staticmethod
+    def serialize(etag, config: dict) -> bytes:
+        """
+        Serialize a parsed configuration file. Values that JSON cannot represent (e.g. YAML dates) are stored as strings
+        :param etag: the ETag of the YAML configuration file
+        :param config: the parsed configuration
+        :return: the compiled configuration file contents
+        """
+        compiled = {"Version": COMPILED_VERSION, "SourceETag": etag, "Config": config}
+        return json.dumps(compiled, sort_keys=True, default=str).encode("utf-8")
+
+    @staticmethod
+    def deserialize(body: bytes, etag) -> dict:
+        """
+        Load a compiled configuration file
+        :param body: the compiled configuration file contents
+        :param etag: the current ETag of the YAML configuration file
+        :return: the parsed configuration, or None if the compiled file is stale or not valid
+        """
+        try:
+            compiled = json.loads(body.decode("utf-8"))
+        except ValueError as excinfo:
+            logger.warning("could not load compiled config: %s" % str(excinfo))
+            return None
+
+        if not isinstance(compiled, dict):
+            return None
+        if compiled.get("Version") != COMPILED_VERSION:
+            return None
+        if compiled.get("SourceETag") != etag:
+            return None
+        if not isinstance(compiled.get("Config"), dict):
+            return None
+        return compiled["Config"]
+
+
+def get_config_cache() -> ConfigCache:
+    """Get the global configuration cache"""
+    global config_cache_global
+    if not config_cache_global:
+        with config_cache_lock:
+            if not config_cache_global:
+                config_cache_global = ConfigCache(
+                    path=os.environ.get("CONFIG_CACHE_PATH", DEFAULT_CACHE_DIR)
+                )
+
+    return config_cache_global
+
+
+class ConfigSnapshots:
+    """
+    Stores configuration snapshots in S3 under the hash of their content, so that the AWS Step Functions state machine
+    can pass a reference to the configuration instead of the configuration itself. Snapshots are immutable, so they
+    are fetched (and written) at most once per container.
+    """
+
+    def __init__(self, prefix=DEFAULT_SNAPSHOT_PREFIX):
+        self.prefix = prefix
+        self._snapshots = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def serialize(config: dict) -> bytes:
+        """
+        Serialize a configuration canonically, so that equal configurations have equal snapshots
+        :param config: the configuration
+        :return: the serialized configuration
+        """
+        return json.dumps(config, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+    def put(self, cli, bucket, config: dict) -> str:
+        """
+        Store a configuration snapshot in S3
+        :param cli: the S3 client
+        :param bucket: the S3 bucket to store the snapshot in
+        :param config: the configuration
+        :return: the snapshot reference (an S3 URI)
+        """
+        body = self.serialize(config)
+        key = f"{self.prefix}/{hashlib.sha256(body).hexdigest()}.json"
+        ref = f"s3://{bucket}/{key}"
+
+        with self._lock:
+            if ref not in self._snapshots:
+                cli.put_object(
+                    Bucket=bucket, Key=key, Body=body, ContentType="application/json"
+                )
+                self._snapshots[ref] = config
+        return ref
+
+    def get(self, cli, ref) -> dict:
+        """
+        Get a configuration snapshot
+        :param cli: the S3 client
+        :param ref: the snapshot reference (an S3 URI)
+        :return: the configuration. Raises ValueError if the snapshot does not match its reference
+        """
+        with self._lock:
+            config = self._snapshots.get(ref)
+        if config is not None:
+            return config
+
+        if not ref.startswith("s3://"):
+            raise ValueError(f"{ref} is not a valid configuration snapshot reference")
+        bucket, _, key = ref[len("s3://") :].partition("/")
+        body = cli.get_object(Bucket=bucket, Key=key).get("Body").read()
+
+        digest = os.path.splitext(os.path.basename(key))[0]
+        if hashlib.sha256(body).hexdigest() != digest:
+            raise ValueError(f"configuration snapshot {ref} does not match its content")
+
+        config = json.loads(body.decode("utf-8"))
+        with self._lock:
+            self._snapshots[ref] = config
+        return config
+
+
+def get_config_snapshots() -> ConfigSnapshots:
+    """Get the global configuration snapshot store"""
+    global config_snapshots_global
+    if not config_snapshots_global:
+        with config_cache_lock:
+            if not config_snapshots_global:
+                config_snapshots_global = ConfigSnapshots(
+                    prefix=os.environ.get(
+                        "CONFIG_SNAPSHOT_PREFIX", DEFAULT_SNAPSHOT_PREFIX
+                    )
+                )
+
+    return config_snapshots_global
@@ -11,22 +11,59 @@
 #  and limitations under the License.                                                                                 #
 # #####################################################################################################################
 
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import wraps
 from os import environ
+from threading import Lock
 
-import boto3
-from botocore.stub import Stubber
+import botocore.session
+from botocore.config import Config as ClientConfig
 
+from shared.instrumentation import api_call_recorder
 from shared.logging import get_logger
+from shared.rate_limiter import DynamoDBTokenBucket, TokenBucket
 
 logger = get_logger(__name__)
 
-# declaring these global makes initialization/ performance a bit better if generating many forecasts
-helpers_sts_client = None
-helpers_forecast_client = None
-helpers_sns_client = None
-helpers_s3_client = None
-helpers_sfn_client = None
+# client defaults - each can be overridden by an environment variable of the same name
+CLIENT_DEFAULTS = {
+    "CLIENT_RETRY_MODE": "adaptive",
+    "CLIENT_MAX_ATTEMPTS": 10,
+    "CLIENT_MAX_POOL_CONNECTIONS": 20,
+    "CLIENT_CONNECT_TIMEOUT": 5,
+    "CLIENT_READ_TIMEOUT": 30,
+    "CLIENT_TCP_KEEPALIVE": True,
+    "CLIENT_WARMUP": "",
+    "CLIENT_MAX_DESCRIBE_WORKERS": 8,
+}
+
+# polling schedules by step function step: (shortest, longest) delay in seconds between status checks. Between these
+# bounds, the delay grows with the time the resource has been pending
+POLLING_SCHEDULES = {
+    "createdatasetgroup": (5, 30),
+    "createdataset": (5, 30),
+    "createdatasetimportjob": (60, 600),
+    "createpredictor": (300, 1800),
+    "createforecast": (120, 900),
+}
+POLLING_DEFAULT_SCHEDULE = (5, 300)
+
+# polling limits by step function step: the longest time in seconds a resource may stay pending before the step fails
+POLLING_TIMEOUTS = {
+    "createdatasetgroup": 60 * 60,
+    "createdataset": 60 * 60,
+    "createdatasetimportjob": 24 * 60 * 60,
+    "createpredictor": 7 * 24 * 60 * 60,
+    "createforecast": 2 * 24 * 60 * 60,
+}
+POLLING_DEFAULT_TIMEOUT = 24 * 60 * 60
+POLLING_MAX_POLLS = 1000  # status checks of a pending resource before the step fails, whatever the elapsed time
+POLLING_BACKOFF = (
+    0.25  # fraction of the time spent pending to wait before the next status check
+)
 
 
 class ResourcePending(Exception):
@@ -41,25 +78,92 @@ class ResourceInvalid(Exception):
     pass
 
 
+class ResourceTimedOut(Exception):
+    pass
+
+
 class EnvironmentVariableError(Exception):
     pass
 
 
+class DescribeManyError(Exception):
+    """Raised by ForecastClient.describe_many when one or more of the describe calls failed"""
+
+    def __init__(self, operation, results, errors):
+        self.operation = operation
+        self.results = results
+        self.errors = errors
+        details = ", ".join(f"{arn}: {error}" for arn, error in errors.items())
+        super().__init__(
+            f"{operation} failed for {len(errors)} of {len(results) + len(errors)} resources ({details})"
+        )
+
+
+def pending_result(step, status, output, event, now=None) -> dict:
+    """
+    Build the result of a step function step whose resource is still pending. The state machine waits for WaitSeconds
+    before running the step again, and passes this result back to the step in its event.
+    :param step: the step name (e.g. createpredictor)
+    :param status: the resource status
+    :param output: the step output (typically the resource ARN)
+    :param event: the step event, which may contain the pending result of the previous status check
+    :param now: the current time (seconds since the epoch)
+    :return: dict of the pending result. Raises ResourceTimedOut if the resource has been pending for longer than the
+    polling timeout of the step, or has been checked POLLING_MAX_POLLS times
+    """
+    now = int(now if now is not None else time.time())
+
+    previous = {}
+    if isinstance(event, dict):
+        for value in event.values():
+            if (
+                isinstance(value, dict)
+                and value.get("Pending")
+                and value.get("Step") == step
+            ):
+                previous = value
+                break
+
+    started = previous.get("StartedAt", now)
+    polls = previous.get("Polls", 0) + 1
+    timeout = POLLING_TIMEOUTS.get(step, POLLING_DEFAULT_TIMEOUT)
+    if now - started > timeout or polls > POLLING_MAX_POLLS:
+        raise ResourceTimedOut(
+            f"{step}: {output} is still {status} after {now - started} seconds and {polls - 1} status checks"
+        )
+
+    shortest, longest = POLLING_SCHEDULES.get(step, POLLING_DEFAULT_SCHEDULE)
+    wait = int(min(longest, max(shortest, (now - started) * POLLING_BACKOFF)))
+
+    return {
+        "Pending": True,
+        "Step": step,
+        "Status": str(status),
+        "Output": output,
+        "StartedAt": started,
+        "Polls": polls,
+        "WaitSeconds": wait,
+    }
+
+
 def step_function_step(f):
     """
     Used to wrap AWS Lambda Functions that produce an AWS Forecast resource status.
     :param f: the function to wrap
-    :return: the wrapped function
+    :return: the wrapped function. Returns the function output if the resource is finalized, or a pending result
+    (see `pending_result`) with the recommended delay before the next status check if the resource is updating.
     """
 
     @wraps(f)
     def wrapper(event, context):
-        (status, output) = f(event, context)
+        account_resolver.from_context(context)
+        with api_call_recorder.scope(f.__name__), resource_state_cache.scope():
+            status, output = f(event, context)
 
         if status.failed:
             raise ResourceFailed
         elif status.updating:
-            raise ResourcePending
+            return pending_result(f.__name__, status, output, event)
         elif status.finalized:
             return output
         else:
@@ -80,62 +184,205 @@ def get_aws_region():
     return region
 
 
+class ClientFactory:
+    """
+    Creates boto3 clients from a single shared session, using a tuned botocore client configuration. Clients are
+    created from a botocore session directly - this avoids importing boto3 (and s3transfer) on AWS Lambda cold start
+    """
+
+    def __init__(self):
+        self._session = None
+        self._clients = {}
+        self._lock = Lock()
+        self._rate_limiter = None
+
+    @staticmethod
+    def setting(name):
+        """
+        Get a client setting from its environment variable, or its default from CLIENT_DEFAULTS
+        :param name: the setting name (e.g. CLIENT_RETRY_MODE)
+        :return: the setting, converted to the type of its default
+        """
+        default = CLIENT_DEFAULTS[name]
+        value = environ.get(name)
+        if value is None:
+            return default
+        if isinstance(default, bool):
+            return value.lower() in ["true", "yes", "1"]
+        return type(default)(value)
+
+    @property
+    def config(self) -> ClientConfig:
+        """
+        Get the botocore client configuration used for all clients
+        :return: the client configuration
+        """
+        return ClientConfig(
+            retries={
+                "mode": self.setting("CLIENT_RETRY_MODE"),
+                "total_max_attempts": self.setting("CLIENT_MAX_ATTEMPTS"),
+            },
+            max_pool_connections=self.setting("CLIENT_MAX_POOL_CONNECTIONS"),
+            connect_timeout=self.setting("CLIENT_CONNECT_TIMEOUT"),
+            read_timeout=self.setting("CLIENT_READ_TIMEOUT"),
+            tcp_keepalive=self.setting("CLIENT_TCP_KEEPALIVE"),
+        )
+
+    @property
+    def rate_limiter(self) -> TokenBucket:
+        """
+        Get the rate limiter for Amazon Forecast control plane calls. The token buckets are shared by all concurrent
+        invocations through the DynamoDB table named by RATE_LIMIT_TABLE, or held in memory if it is not set.
+        :return: the rate limiter
+        """
+        if not self._rate_limiter:
+            table_name = environ.get("RATE_LIMIT_TABLE")
+            if table_name:
+                self._rate_limiter = DynamoDBTokenBucket(
+                    table_name, lambda: self.client("dynamodb")
+                )
+            else:
+                self._rate_limiter = TokenBucket()
+        return self._rate_limiter
+
+    def client(self, service_name):
+        """
+        Get the global boto3 client for a service, creating it (and the shared session) if required
+        :param service_name: the service name (e.g. forecast)
+        :return: the boto3 client
+        """
+        cli = self._clients.get(service_name)
+        if cli:
+            return cli
+
+        with self._lock:
+            if service_name not in self._clients:
+                region = get_aws_region()
+                if not self._session:
+                    self._session = botocore.session.get_session()
+
+                logger.debug(
+                    "Initializing boto3 client for %s in %s" % (service_name, region)
+                )
+                cli = self._session.create_client(
+                    service_name, region_name=region, config=self.config
+                )
+                api_call_recorder.register(cli)
+                if service_name == "forecast":
+                    self.rate_limiter.register(cli)
+                self._clients[service_name] = cli
+
+        return self._clients[service_name]
+
+    def warm(self, *service_names):
+        """
+        Create clients ahead of time (e.g. during the AWS Lambda init phase) to take model loading and endpoint
+        resolution off the critical path of the handler. No service API calls are made.
+        :param service_names: the service names to create clients for
+        :return: None
+        """
+        for service_name in service_names:
+            try:
+                self.client(service_name.strip())
+            except EnvironmentVariableError as excinfo:
+                logger.warning("could not warm %s client: %s" % (service_name, excinfo))
+                continue
+
+
+client_factory = ClientFactory()
+
+# e.g. CLIENT_WARMUP=forecast,s3 - set on each AWS Lambda function by the solution template
+client_factory.warm(
+    *[name for name in client_factory.setting("CLIENT_WARMUP").split(",") if name]
+)
+
+
+def get_sts_client():
+    """Get the global sts boto3 client"""
+    return client_factory.client("sts")
+
+
+class AccountResolver:
+    """Resolves the caller's AWS account ID and region, preferring the AWS Lambda context to AWS STS"""
+
+    def __init__(self, account_id=None, region=None):
+        self._account_id = account_id
+        self._region = region
+        self._lock = Lock()
+
+    def from_context(self, context):
+        """
+        Resolve the account ID and region from the ARN of the invoked AWS Lambda function
+        :param context: The AWS Lambda context object (ignored if it has no invoked_function_arn)
+        :return: None
+        """
+        arn = getattr(context, "invoked_function_arn", None)
+        if not isinstance(arn, str):
+            return
+
+        # arn:partition:lambda:region:account-id:function:function-name[:alias]
+        parts = arn.split(":")
+        if len(parts) < 6 or not parts[3] or not parts[4]:
+            logger.warning("could not resolve account from function ARN %s" % arn)
+            return
+
+        self._region = parts[3]
+        self._account_id = parts[4]
+
+    @property
+    def account_id(self) -> str:
+        """
+        Get the caller's AWS account ID. AWS STS is called at most once if the account ID was not otherwise resolved
+        :return: The AWS account ID
+        """
+        if not self._account_id:
+            with self._lock:
+                if not self._account_id:
+                    logger.debug("Resolving account ID with sts")
+                    identity = get_sts_client().get_caller_identity()
+                    self._account_id = identity.get("Account")
+
+        return self._account_id
+
+    @property
+    def region(self) -> str:
+        """
+        Get the caller's AWS region
+        :return: the AWS region name (e.g. us-east-1)
+        """
+        return self._region or get_aws_region()
+
+
+# replace this (e.g. with AccountResolver(account_id=..., region=...)) to inject the account in tests
+account_resolver = AccountResolver()
+
+
 def get_account_id():
     """
     Get the caller's AWS account ID
     :return: The AWS account ID
     """
-    global helpers_sts_client
-    if not helpers_sts_client:
-        region = get_aws_region()
-        logger.debug("Initializing boto3 client for sts in %s" % region)
-        helpers_sts_client = boto3.client("sts", region_name=get_aws_region())
-
-    return helpers_sts_client.get_caller_identity().get("Account")
+    return account_resolver.account_id
 
 
 def get_forecast_client():
     """Get the global forecast boto3 client"""
-    global helpers_forecast_client
-    if not helpers_forecast_client:
-        region = get_aws_region()
-        logger.debug("Initializing boto3 client for forecast in %s" % region)
-        helpers_forecast_client = boto3.client("forecast", region_name=get_aws_region())
-
-    return helpers_forecast_client
+    return client_factory.client("forecast")
 
 
 def get_sns_client():
     """Get the global sns boto3 client"""
-    global helpers_sns_client
-    if not helpers_sns_client:
-        region = get_aws_region()
-        logger.debug("Initializing boto3 client for sns in %s" % region)
-        helpers_sns_client = boto3.client("sns", region_name=get_aws_region())
-
-    return helpers_sns_client
+    return client_factory.client("sns")
 
 
 def get_s3_client():
     """Get the global s3 boto3 client"""
-    global helpers_s3_client
-    if not helpers_s3_client:
-        region = get_aws_region()
-        logger.debug("Initializing boto3 client for s3 in %s" % region)
-        helpers_s3_client = boto3.client("s3", region_name=get_aws_region())
-
-    return helpers_s3_client
+    return client_factory.client("s3")
 
 
 def get_sfn_client():
     """Get the global step functions boto3 client"""
-    global helpers_sfn_client
-    if not helpers_sfn_client:
-        region = get_aws_region()
-        logger.debug("Initializing boto3 client for stepfunctions in %s" % region)
-        helpers_sfn_client = boto3.client("stepfunctions", region_name=get_aws_region())
-
-    return helpers_sfn_client
+    return client_factory.client("stepfunctions")
 
 
 class InputValidator:
@@ -145,14 +392,134 @@ class InputValidator:
 
     def validate(self):
         """
-        Validate an Amazon Forecast resource using the botocore stubber
+        Validate an Amazon Forecast resource against the botocore service model
         :return: None. Raises ParamValidationError if the InputValidator fails to validate
         """
-        cli = get_forecast_client()
-        func = getattr(cli, self.method)
-        with Stubber(cli) as stubber:
-            stubber.add_response(self.method, {}, self.expected_params)
-            func(**self.expected_params)
+        from shared.validation import get_forecast_validator
+
+        get_forecast_validator().validate(self.method, **self.expected_params)
+
+
+class ResourceStateCache:
+    """Memoizes Amazon Forecast describe/ list results for the duration of a single AWS Lambda invocation"""
+
+    def __init__(self):
+        self.enabled = False
+        self._results = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def key(operation, params):
+        """
+        Get the cache key for a service operation and its parameters
+        :param operation: the operation name (e.g. describe_dataset)
+        :param params: the parameters passed to the operation
+        :return: the cache key
+        """
+        return operation, json.dumps(params, sort_keys=True, default=str)
+
+    def get(self, operation, params, call):
+        """
+        Get the memoized result of an operation, calling the service if it has not yet been called
+        :param operation: the operation name (e.g. describe_dataset)
+        :param params: the parameters passed to the operation
+        :param call: the function used to call the service on a cache miss
+        :return: the (possibly memoized) result of the operation
+        """
+        key = self.key(operation, params)
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+
+        # exceptions (e.g. ResourceNotFoundException) are not memoized
+        result = call()
+        with self._lock:
+            self._results[key] = result
+        return result
+
+    def refresh(self):
+        """
+        Discard all memoized results
+        :return: None
+        """
+        with self._lock:
+            self._results.clear()
+
+    @contextmanager
+    def scope(self):
+        """
+        Enable the cache for the duration of the context (typically one AWS Lambda invocation)
+        :return: None
+        """
+        self.refresh()
+        self.enabled = True
+        try:
+            yield self
+        finally:
+            self.enabled = False
+            self.refresh()
+
+
+resource_state_cache = ResourceStateCache()
+
+
+class CachedPaginator:
+    """Wraps a botocore paginator to memoize all pages of a paginated list operation"""
+
+    def __init__(self, paginator, operation, cache: ResourceStateCache):
+        self._paginator = paginator
+        self._operation = operation
+        self._cache = cache
+
+    def paginate(self, **kwargs):
+        """
+        Paginate through the operation results
+        :param kwargs: the parameters passed to the operation
+        :return: List of all result pages
+        """
+        return self._cache.get(
+            f"paginate_{self._operation}",
+            kwargs,
+            lambda: list(self._paginator.paginate(**kwargs)),
+        )
+
+
+class CachedClient:
+    """Wraps a boto3 forecast client to memoize describe/ list calls and invalidate them on create/ update calls"""
+
+    memoized = ("describe_", "list_")
+    invalidating = ("create_", "update_", "delete_")
+
+    def __init__(self, client, cache: ResourceStateCache):
+        self._client = client
+        self._cache = cache
+
+    def get_paginator(self, operation_name):
+        return CachedPaginator(
+            self._client.get_paginator(operation_name), operation_name, self._cache
+        )
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+
+        if name.startswith(self.memoized):
+
+            def memoized(**kwargs):
+                return self._cache.get(name, kwargs, lambda: attr(**kwargs))
+
+            return memoized
+
+        if name.startswith(self.invalidating):
+
+            def invalidating(**kwargs):
+                try:
+                    return attr(**kwargs)
+                finally:
+                    self._cache.refresh()
+
+            return invalidating
+
+        return attr
 
 
 def camel_to_snake(s):
@@ -168,14 +535,84 @@ class ForecastClient:
     """Validate a resource from Amazon Forecast against its resource model"""
 
     def __init__(self, resource, **resource_creation_kwargs):
-        self.account_id = get_account_id()
-        self.region = get_aws_region()
+        self.account_id = account_resolver.account_id
+        self.region = account_resolver.region
         self.cli = get_forecast_client()
         self.resource = resource
         self.validator = InputValidator(
             f"create_{self.resource}", **resource_creation_kwargs
         )
 
+    @property
+    def cli(self):
+        """
+        Get the forecast client for this resource. Describe/ list calls are memoized while the resource state
+        cache is enabled (e.g. within a `step_function_step`)
+        :return: the forecast client
+        """
+        if resource_state_cache.enabled:
+            return CachedClient(self._cli, resource_state_cache)
+        return self._cli
+
+    @cli.setter
+    def cli(self, client):
+        self._cli = client
+
+    def describe_many(self, operation, arns, arn_key=None):
+        """
+        Describe several resources concurrently on a bounded thread pool. Duplicate ARNs are described once.
+        :param operation: the describe operation name (e.g. describe_dataset)
+        :param arns: the resource ARNs to describe
+        :param arn_key: the ARN parameter name (by default derived from the operation, e.g. DatasetArn)
+        :return: List of describe results, one per unique ARN, in the order the ARNs were first given. Raises
+        DescribeManyError (with the results and the per-ARN errors) after all calls complete if any of them failed
+        """
+        if not arn_key:
+            resource = operation[len("describe_") :]
+            arn_key = "".join(word.capitalize() for word in resource.split("_")) + "Arn"
+
+        arns = list(dict.fromkeys(arns))
+        if not arns:
+            return []
+
+        cli = self.cli
+        call = getattr(cli, operation)
+
+        def describe(arn):
+            try:
+                return call(**{arn_key: arn}), None
+            except Exception as excinfo:
+                return None, excinfo
+
+        max_workers = min(
+            len(arns), client_factory.setting("CLIENT_MAX_DESCRIBE_WORKERS")
+        )
+        if max_workers <= 1:
+            outcomes = [describe(arn) for arn in arns]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                outcomes = list(executor.map(describe, arns))
+
+        results = {}
+        errors = {}
+        for arn, (result, error) in zip(arns, outcomes):
+            if error:
+                errors[arn] = error
+            else:
+                results[arn] = result
+
+        if errors:
+            raise DescribeManyError(operation, results, errors)
+
+        return [results[arn] for arn in arns]
+
+    def refresh(self):
+        """
+        Discard memoized describe/ list results so that the next status lookup calls the service
+        :return: None
+        """
+        resource_state_cache.refresh()
+
     @classmethod
     def validate_config(cls, **resource_creation_kwargs):
         """
@@ -0,0 +1,229 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import json
+import time
+from contextlib import contextmanager
+from functools import wraps
+from os import environ
+from threading import Lock
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_NAMESPACE = "ForecastWorkflowAutomation"
+MAX_EMF_METRICS = 100  # CloudWatch embedded metric format limit per metric directive
+THROTTLING_ERRORS = [
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "SlowDown",
+]
+
+
+class ApiCallStats:
+    """Holds the API call statistics for a single service operation"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttles = 0
+        self.latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "Calls": self.calls,
+            "Errors": self.errors,
+            "Retries": self.retries,
+            "Throttles": self.throttles,
+            "Latency": round(self.latency_ms, 3),
+            "MaxLatency": round(self.max_latency_ms, 3),
+            "RequestBytes": self.request_bytes,
+            "ResponseBytes": self.response_bytes,
+        }
+
+
+class ApiCallRecorder:
+    """Records boto3 API calls (via botocore event hooks) and emits them as CloudWatch embedded metric format"""
+
+    def __init__(self):
+        self.enabled = False
+        self.operations = {}
+        self._lock = Lock()
+
+    def register(self, client):
+        """
+        Register the recorder's event hooks on a boto3 client
+        :param client: the boto3 client
+        :return: None
+        """
+        events = client.meta.events
+        events.register_first(
+            "before-call.*.*", self._before_call, unique_id="instrumentation-before"
+        )
+        events.register(
+            "after-call.*.*", self._after_call, unique_id="instrumentation-after"
+        )
+        events.register(
+            "needs-retry.*.*", self._needs_retry, unique_id="instrumentation-retry"
+        )
+
+    @staticmethod
+    def operation_name(operation_model) -> str:
+        """
+        Get the name an operation is recorded under
+        :param operation_model: the botocore operation model
+        :return: the operation name (e.g. forecast.DescribeDataset)
+        """
+        return f"{operation_model.service_model.service_name}.{operation_model.name}"
+
+    def _stats(self, operation_model) -> ApiCallStats:
+        return self.operations.setdefault(
+            self.operation_name(operation_model), ApiCallStats()
+        )
+
+    def _before_call(self, model, params, context, **kwargs):
+        if not self.enabled:
+            return
+
+        context["instrumentation_start"] = time.perf_counter()
+
+        body = params.get("body")
+        if isinstance(body, (bytes, str)):
+            context["instrumentation_request_bytes"] = len(body)
+
+    def _after_call(self, http_response, parsed, model, context, **kwargs):
+        start = context.get("instrumentation_start")
+        if not self.enabled or start is None:
+            return
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        response_bytes = http_response.headers.get("content-length", 0)
+        metadata = parsed.get("ResponseMetadata", {})
+
+        with self._lock:
+            stats = self._stats(model)
+            stats.calls += 1
+            stats.latency_ms += latency_ms
+            stats.max_latency_ms = max(stats.max_latency_ms, latency_ms)
+            stats.retries += metadata.get("RetryAttempts", 0)
+            stats.request_bytes += context.get("instrumentation_request_bytes", 0)
+            stats.response_bytes += int(response_bytes)
+            if http_response.status_code >= 300:
+                stats.errors += 1
+
+    def _needs_retry(self, response, operation, **kwargs):
+        # this is called once per attempt - record throttled attempts, but never request a retry ourselves
+        if not self.enabled or not response:
+            return None
+
+        _, parsed = response
+        if parsed.get("Error", {}).get("Code") in THROTTLING_ERRORS:
+            with self._lock:
+                self._stats(operation).throttles += 1
+
+        return None
+
+    def reset(self):
+        """
+        Discard all recorded API calls
+        :return: None
+        """
+        with self._lock:
+            self.operations = {}
+
+    def emf(self, handler_name) -> dict:
+        """
+        Get the recorded API calls in CloudWatch embedded metric format
+        :param handler_name: the name of the handler the API calls were made by
+        :return: the embedded metric format document
+        """
+        with self._lock:
+            operations = {
+                name: stats.as_dict() for name, stats in self.operations.items()
+            }
+
+        document = {"Handler": handler_name, "ApiCalls": operations}
+        metrics = []
+
+        def metric(name, unit, value):
+            if len(metrics) < MAX_EMF_METRICS:
+                metrics.append({"Name": name, "Unit": unit})
+                document[name] = value
+
+        metric("Calls", "Count", sum(op["Calls"] for op in operations.values()))
+        metric("Throttles", "Count", sum(op["Throttles"] for op in operations.values()))
+        metric("Retries", "Count", sum(op["Retries"] for op in operations.values()))
+        metric(
+            "Latency", "Milliseconds", sum(op["Latency"] for op in operations.values())
+        )
+        for name, op in sorted(operations.items()):
+            metric(f"{name}.Calls", "Count", op["Calls"])
+            metric(f"{name}.Throttles", "Count", op["Throttles"])
+            metric(f"{name}.Latency", "Milliseconds", op["Latency"])
+
+        document["_aws"] = {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": environ.get("METRICS_NAMESPACE", DEFAULT_NAMESPACE),
+                    "Dimensions": [["Handler"]],
+                    "Metrics": metrics,
+                }
+            ],
+        }
+        return document
+
+    @contextmanager
+    def scope(self, handler_name):
+        """
+        Record API calls for the duration of the context, then emit them as one embedded metric format log line
+        :param handler_name: the name of the handler making the API calls
+        :return: None
+        """
+        self.reset()
+        self.enabled = True
+        try:
+            yield self
+        finally:
+            self.enabled = False
+            print(json.dumps(self.emf(handler_name)), flush=True)
+            self.reset()
+
+
+api_call_recorder = ApiCallRecorder()
+
+
+def instrumented(f):
+    """
+    Used to wrap AWS Lambda Functions to record their API calls and emit them as embedded metric format
+    :param f: the function to wrap
+    :return: the wrapped function
+    """
+
+    @wraps(f)
+    def wrapper(event, context):
+        with api_call_recorder.scope(f.__name__):
+            return f(event, context)
+
+    return wrapper
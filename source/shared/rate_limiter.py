@@ -0,0 +1,204 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import json
+import time
+from os import environ
+from threading import Lock
+
+from botocore import xform_name
+from botocore.exceptions import BotoCoreError, ClientError
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+# budgets are per operation (client method name), in requests per second with a maximum burst
+DEFAULT_BUDGET = {"rate": 10.0, "burst": 20.0}
+DEFAULT_MAX_WAIT = 10.0  # seconds to wait for a token before sending the request anyway
+MIN_RETRY_BACKOFF = 1.0  # seconds to limit in memory after the shared table fails, doubled on each failure
+MAX_RETRY_BACKOFF = 60.0
+
+
+class TokenBucket:
+    """A per-operation token bucket rate limiter, held in memory (limits calls from this process only)"""
+
+    def __init__(self, budgets=None, max_wait=None, clock=time.time, sleep=time.sleep):
+        if budgets is None:
+            budgets = json.loads(environ.get("RATE_LIMIT_BUDGETS", "{}"))
+        if max_wait is None:
+            max_wait = float(environ.get("RATE_LIMIT_MAX_WAIT", DEFAULT_MAX_WAIT))
+
+        self.budgets = budgets
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+        self._buckets = {}
+        self._lock = Lock()
+
+    def budget(self, operation):
+        """
+        Get the budget for an operation
+        :param operation: the client method name (e.g. list_predictors)
+        :return: the rate (requests per second) and burst (bucket size) for the operation
+        """
+        budget = {**DEFAULT_BUDGET, **self.budgets.get(operation, {})}
+        return float(budget["rate"]), float(budget["burst"])
+
+    def acquire(self, operation) -> bool:
+        """
+        Take a token for an operation, waiting for one to become available (up to max_wait seconds)
+        :param operation: the client method name (e.g. list_predictors)
+        :return: True if a token was taken, False if the wait for a token timed out
+        """
+        rate, burst = self.budget(operation)
+        deadline = self.clock() + self.max_wait
+
+        while True:
+            wait = self._take(operation, rate, burst)
+            if wait == 0:
+                return True
+
+            if self.clock() + wait > deadline:
+                logger.warning("rate limit wait for %s timed out" % operation)
+                return False
+
+            logger.debug("rate limited %s for %.3fs" % (operation, wait))
+            self.sleep(wait)
+
+    def _take(self, operation, rate, burst) -> float:
+        """
+        Try to take a token for an operation
+        :return: 0 if a token was taken, otherwise the number of seconds to wait before trying again
+        """
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(operation, (burst, now))
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+
+            if tokens < 1:
+                self._buckets[operation] = (tokens, now)
+                return (1 - tokens) / rate
+
+            self._buckets[operation] = (tokens - 1, now)
+            return 0
+
+    def _before_send(self, event_name, **kwargs):
+        # before-send is emitted once per attempt, so retries are rate limited as well
+        self.acquire(xform_name(event_name.split(".")[-1]))
+
+    def register(self, client):
+        """
+        Rate limit all requests sent by a boto3 client
+        :param client: the boto3 client
+        :return: None
+        """
+        client.meta.events.register(
+            "before-send.*.*", self._before_send, unique_id="rate-limiter"
+        )
+
+
+class DynamoDBTokenBucket(TokenBucket):
+    """
+    A per-operation token bucket rate limiter shared by all processes (e.g. concurrent AWS Lambda invocations)
+    through an Amazon DynamoDB table with partition key `operation`. Falls back to an in-memory token bucket while
+    the table can't be used (e.g. it is throttled), and tries the table again after a backoff that doubles with each
+    consecutive failure.
+    """
+
+    def __init__(self, table_name, get_client, **kwargs):
+        super().__init__(**kwargs)
+        self.table_name = table_name
+        self.get_client = get_client
+        self.retry_at = None
+        self._backoff = MIN_RETRY_BACKOFF
+
+    @property
+    def fallback(self) -> bool:
+        """True while requests are limited in memory, until the table is tried again"""
+        return self.retry_at is not None and self.clock() < self.retry_at
+
+    def _take(self, operation, rate, burst) -> float:
+        if self.fallback:
+            return super()._take(operation, rate, burst)
+
+        try:
+            wait = self._take_shared(operation, rate, burst)
+        except (BotoCoreError, ClientError) as excinfo:
+            logger.warning(
+                "rate limiter table %s is unavailable, limiting in memory for %.0fs: %s"
+                % (self.table_name, self._backoff, str(excinfo))
+            )
+            self.retry_at = self.clock() + self._backoff
+            self._backoff = min(self._backoff * 2, MAX_RETRY_BACKOFF)
+            return super()._take(operation, rate, burst)
+
+        self.retry_at = None
+        self._backoff = MIN_RETRY_BACKOFF
+        return wait
+
+    def _take_shared(self, operation, rate, burst) -> float:
+        now = self.clock()
+        key = {"operation": {"S": operation}}
+
+        cli = self.get_client()
+        item = cli.get_item(
+            TableName=self.table_name, Key=key, ConsistentRead=True
+        ).get("Item")
+
+        if item:
+            updated = item["updated"]["N"]
+            tokens = float(item["tokens"]["N"])
+            tokens = min(burst, tokens + max(0.0, now - float(updated)) * rate)
+        else:
+            updated = None
+            tokens = burst
+
+        if tokens < 1:
+            return (1 - tokens) / rate
+
+        # optimistic concurrency: only take the token if no other process has taken one since we read the bucket
+        try:
+            if updated is None:
+                cli.put_item(
+                    TableName=self.table_name,
+                    Item={
+                        **key,
+                        "tokens": {"N": repr(tokens - 1)},
+                        "updated": {"N": repr(now)},
+                    },
+                    ConditionExpression="attribute_not_exists(#operation)",
+                    ExpressionAttributeNames={"#operation": "operation"},
+                )
+            else:
+                cli.update_item(
+                    TableName=self.table_name,
+                    Key=key,
+                    UpdateExpression="SET #tokens = :tokens, #updated = :now",
+                    ConditionExpression="#updated = :updated",
+                    ExpressionAttributeNames={
+                        "#tokens": "tokens",
+                        "#updated": "updated",
+                    },
+                    ExpressionAttributeValues={
+                        ":tokens": {"N": repr(tokens - 1)},
+                        ":now": {"N": repr(now)},
+                        ":updated": {"N": updated},
+                    },
+                )
+        except ClientError as excinfo:
+            if excinfo.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return 0.001  # lost the race for this token, try again
+
+        return 0
@@ -0,0 +1,119 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import io
+
+from botocore.exceptions import ClientError
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024  # bytes per multipart upload part (at least 5 MiB)
+
+# the metadata of an object derived from a dataset file (e.g. its Parquet conversion) that records the ETag of the
+# dataset file it was derived from
+SOURCE_ETAG_METADATA = "source-etag"
+
+
+def derived_metadata(cli, bucket, key) -> dict:
+    """
+    Get the metadata of an S3 object derived from a dataset file
+    :param cli: the S3 client
+    :param bucket: the S3 bucket
+    :param key: the S3 key of the derived object
+    :return: the object metadata, or an empty dict if the object does not exist
+    """
+    try:
+        head = cli.head_object(Bucket=bucket, Key=key)
+    except ClientError as excinfo:
+        if excinfo.response["Error"]["Code"] != "404":
+            raise
+        return {}
+    return head.get("Metadata", {})
+
+
+def source_etag(cli, bucket, key):
+    """
+    Get the ETag of the dataset file an S3 object was derived from
+    :param cli: the S3 client
+    :param bucket: the S3 bucket
+    :param key: the S3 key of the derived object
+    :return: the ETag recorded in the object metadata, or None if the object does not exist (or has no source)
+    """
+    return derived_metadata(cli, bucket, key).get(SOURCE_ETAG_METADATA)
+
+
+class MultipartUpload(io.RawIOBase):
+    """A writable file that streams to an S3 object with a multipart upload, buffering at most one part in memory"""
+
+    def __init__(self, cli, bucket, key, part_size=DEFAULT_PART_SIZE, metadata=None):
+        super().__init__()
+        self.cli = cli
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.upload_id = cli.create_multipart_upload(
+            Bucket=bucket, Key=key, Metadata=metadata or {}
+        )["UploadId"]
+        self.parts = []
+        self.size = 0
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer.extend(data)
+        self.size += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+        return len(data)
+
+    def _upload_part(self, data: bytes):
+        number = len(self.parts) + 1
+        response = self.cli.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=number,
+            Body=data,
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": number})
+
+    def close(self):
+        """Complete the upload"""
+        if self.closed:
+            return
+        if self._buffer or not self.parts:
+            self._upload_part(bytes(self._buffer))
+            self._buffer.clear()
+        self.cli.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts},
+        )
+        super().close()
+
+    def abort(self):
+        """Abort the upload"""
+        if self.closed:
+            return
+        self.cli.abort_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+        )
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
@@ -13,9 +13,7 @@
 
 from uuid import uuid4
 
-from packaging import version
-
-from shared.Dataset.dataset_file import DatasetFile
+from shared.Dataset.dataset_file import DatasetFile, MULTIPART_MARKER
 from shared.s3.exceptions import (
     RecordNotFound,
     RecordNotSupported,
@@ -38,7 +36,7 @@ class Event:
 
         # Make sure this event version is supported
         event_version = record.get("eventVersion")
-        if version.parse(event_version).major != S3_EVENT_STRUCTURE_MAJOR:
+        if str(event_version).split(".")[0] != str(S3_EVENT_STRUCTURE_MAJOR):
             raise RecordNotSupported(
                 f"The event version {event_version} is not supported by this solution."
             )
@@ -53,11 +51,24 @@ class Event:
         if not key:
             raise KeyNotFound
 
+        # The marker of a multipart dataset triggers the processing of its folder
+        key = DatasetFile.dataset_key(key)
+
         # The name of the event is the stem of the file without extensions
         file = DatasetFile(key=key, bucket=bucket)
 
         return bucket, key, file
 
+    @property
+    def shard(self) -> bool:
+        """True if the event is for a shard of a multipart dataset (the dataset is processed when its marker is written)"""
+        return DatasetFile.is_shard(self.key)
+
+    @property
+    def stray_marker(self) -> bool:
+        """True if the event is for a _SUCCESS object that is not the marker of a multipart dataset"""
+        return self.key.endswith(MULTIPART_MARKER)
+
     @property
     def event_id(self) -> str:
         return f"{self.file.prefix}_{str(self.file.data_type).lower()}_{self.uuid}"[
@@ -0,0 +1,236 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+
+import botocore
+import botocore.session
+from botocore import xform_name
+from botocore.exceptions import ParamValidationError
+from botocore.validate import ParamValidator
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_PATH = "/tmp/forecast-validation-cache.jsonl"
+# config validation caches a result per top-level config section, so a config with thousands of prefixes needs more
+# entries than the 4096 that parameter validation alone needs: at 4096 entries the sections of a 5000 prefix config
+# evict each other and are all validated again every time. Each entry holds about 280 bytes, so a full cache is about
+# 4.5 MiB in memory and 1.9 MiB in its /tmp file (up to twice that before the file is compacted).
+DEFAULT_CACHE_SIZE = 16384
+
+# declaring this global makes initialization/ performance a bit better if validating many resources
+validation_forecast_validator = None
+validation_lock = Lock()
+
+
+class ValidationCache:
+    """
+    A bounded LRU cache of validation results keyed by parameter fingerprint. Results are also appended to a local
+    file (in AWS Lambda, under /tmp) so that they survive for the lifetime of the container.
+    """
+
+    def __init__(self, path=None, max_size=DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self._results = OrderedDict()
+        self._lock = Lock()
+        self._lines = 0
+        self._load()
+
+    @staticmethod
+    def fingerprint(operation, params, model_version) -> str:
+        """
+        Get a stable fingerprint of an operation and its parameters
+        :param operation: the operation name (e.g. create_dataset_group)
+        :param params: the operation parameters
+        :param model_version: the version of the model the parameters are validated against
+        :return: the fingerprint (sha256 hex digest)
+        """
+        canonical = json.dumps(
+            [operation, params, model_version],
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, fingerprint):
+        """
+        Get a cached validation result
+        :param fingerprint: the parameter fingerprint
+        :return: None if not cached, otherwise the validation error report ("" if the parameters were valid)
+        """
+        with self._lock:
+            report = self._results.get(fingerprint)
+            if report is not None:
+                self._results.move_to_end(fingerprint)
+            return report
+
+    def put(self, fingerprint, report):
+        """
+        Cache a validation result
+        :param fingerprint: the parameter fingerprint
+        :param report: the validation error report ("" if the parameters were valid)
+        :return: None
+        """
+        with self._lock:
+            self._store(fingerprint, report)
+            self._append(fingerprint, report)
+
+    def _store(self, fingerprint, report):
+        self._results[fingerprint] = report
+        self._results.move_to_end(fingerprint)
+        while len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    fingerprint, report = json.loads(line)
+                    self._store(fingerprint, report)
+                    self._lines += 1
+        except (OSError, ValueError) as excinfo:
+            logger.warning("could not load validation cache: %s" % str(excinfo))
+            self._results.clear()
+            self._compact()
+
+    def _append(self, fingerprint, report):
+        if not self.path:
+            return
+
+        # the file is append-only; rewrite it with just the live entries once it grows too large
+        if self._lines >= 2 * self.max_size:
+            self._compact()
+            return
+
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps([fingerprint, report]) + "\n")
+            self._lines += 1
+        except OSError as excinfo:
+            logger.warning("could not write validation cache: %s" % str(excinfo))
+            self.path = None
+
+    def _compact(self):
+        if not self.path:
+            return
+
+        try:
+            temp_path = f"{self.path}.{os.getpid()}"
+            with open(temp_path, "w") as f:
+                for fingerprint, report in self._results.items():
+                    f.write(json.dumps([fingerprint, report]) + "\n")
+            os.replace(temp_path, self.path)
+            self._lines = len(self._results)
+        except OSError as excinfo:
+            logger.warning("could not write validation cache: %s" % str(excinfo))
+            self.path = None
+
+
+class ModelValidator:
+    """Validates operation parameters against a botocore service model without calling (or stubbing) a client"""
+
+    def __init__(self, service_name, prefix="create_", cache: ValidationCache = None):
+        self.service_name = service_name
+        self.service_model = botocore.session.get_session().get_service_model(
+            service_name
+        )
+        self.api_version = self.service_model.api_version
+        self.model_version = f"{botocore.__version__}/{self.api_version}"
+        self.cache = cache
+        self.shapes = {}
+
+        for operation_name in self.service_model.operation_names:
+            method = xform_name(operation_name)
+            if not method.startswith(prefix):
+                continue
+
+            shape = self.service_model.operation_model(operation_name).input_shape
+            self._resolve(shape, set())
+            self.shapes[method] = shape
+
+    def _resolve(self, shape, seen):
+        """
+        Resolve all nested shapes of shape up front (botocore resolves these lazily on first access)
+        :param shape: the shape to resolve
+        :param seen: the names of shapes already resolved (shapes may be recursive)
+        :return: None
+        """
+        if shape is None or shape.name in seen:
+            return
+        seen.add(shape.name)
+
+        if shape.type_name == "structure":
+            for member in shape.members.values():
+                self._resolve(member, seen)
+        elif shape.type_name == "list":
+            self._resolve(shape.member, seen)
+        elif shape.type_name == "map":
+            self._resolve(shape.key, seen)
+            self._resolve(shape.value, seen)
+
+    def validate(self, method, **params):
+        """
+        Validate the parameters of a service operation
+        :param method: the client method name of the operation (e.g. create_dataset_group)
+        :param params: the parameters to validate
+        :return: None. Raises ParamValidationError if the parameters fail to validate
+        """
+        shape = self.shapes.get(method)
+        if not shape:
+            raise ValueError(
+                f"{method} is not a supported {self.service_name} operation"
+            )
+
+        fingerprint = None
+        report = None
+        if self.cache:
+            fingerprint = self.cache.fingerprint(method, params, self.model_version)
+            report = self.cache.get(fingerprint)
+
+        if report is None:
+            report = ParamValidator().validate(params, shape)
+            report = report.generate_report() if report.has_errors() else ""
+            if self.cache:
+                self.cache.put(fingerprint, report)
+
+        if report:
+            raise ParamValidationError(report=report)
+
+
+def get_forecast_validator():
+    """Get the global forecast model validator"""
+    global validation_forecast_validator
+    if not validation_forecast_validator:
+        with validation_lock:
+            if not validation_forecast_validator:
+                logger.debug("Initializing model validator for forecast")
+                cache = ValidationCache(
+                    path=os.environ.get("VALIDATION_CACHE_PATH", DEFAULT_CACHE_PATH),
+                    max_size=int(
+                        os.environ.get("VALIDATION_CACHE_SIZE", DEFAULT_CACHE_SIZE)
+                    ),
+                )
+                validation_forecast_validator = ModelValidator("forecast", cache=cache)
+
+    return validation_forecast_validator
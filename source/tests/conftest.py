@@ -18,9 +18,29 @@ import pytest
 import yaml
 from moto import mock_s3
 
+import shared.config_cache
+import shared.validation
+
 CONFIG_FILE = "config_and_overrides.yaml"
 
 
+@pytest.fixture(autouse=True)
+def config_cache(tmp_path, monkeypatch):
+    """Isolate the configuration cache of each test"""
+    cache = shared.config_cache.ConfigCache(path=str(tmp_path))
+    monkeypatch.setattr(shared.config_cache, "config_cache_global", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def validation_cache(tmp_path, monkeypatch):
+    """Isolate the validation cache of each test"""
+    path = tmp_path / "validation-cache.jsonl"
+    monkeypatch.setenv("VALIDATION_CACHE_PATH", str(path))
+    monkeypatch.setattr(shared.validation, "validation_forecast_validator", None)
+    return path
+
+
 @pytest.fixture(autouse=True)
 def aws_credentials():
     """Mocked AWS Credentials"""
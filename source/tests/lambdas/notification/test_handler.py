@@ -16,6 +16,7 @@ import os
 from unittest.mock import patch
 
 import pytest
+from botocore.exceptions import ClientError
 
 import lambdas.notification.handler as handler
 from shared.config import ConfigNotFound, Config
@@ -119,3 +120,84 @@ def test_config_file_problem(s3_event, mocker, caplog):
         json.loads(kwargs.get("input")).get("serviceError").get("Error")
         == "ConfigError"
     )
+
+
+def test_config_by_reference(s3_event, mocker, monkeypatch):
+    monkeypatch.setenv("CONFIG_BY_REFERENCE", "true")
+
+    config = mocker.MagicMock()
+    config.validate.return_value = []
+    config.snapshot.return_value = "s3://test-bucket/config-snapshots/abc.json"
+    config_mock = mocker.MagicMock()
+    config_mock.from_s3.return_value = config
+    mocker.patch("lambdas.notification.handler.Config", config_mock)
+
+    client_mock = mocker.MagicMock()
+    mocker.patch("lambdas.notification.handler.get_sfn_client", client_mock)
+
+    handler.notification(s3_event, None)
+
+    args, kwargs = client_mock().start_execution.call_args
+    state_input = json.loads(kwargs.get("input"))
+    assert state_input.get("config_ref") == "s3://test-bucket/config-snapshots/abc.json"
+    assert "config" not in state_input
+    config.snapshot.assert_called_once_with("test-bucket")
+
+
+def test_config_by_reference_snapshot_failed(s3_event, mocker, monkeypatch):
+    monkeypatch.setenv("CONFIG_BY_REFERENCE", "true")
+
+    config = mocker.MagicMock()
+    config.validate.return_value = []
+    config.config = {"Default": {}}
+    config.snapshot.side_effect = ClientError(
+        {"Error": {"Code": "AccessDenied"}}, "PutObject"
+    )
+    config_mock = mocker.MagicMock()
+    config_mock.from_s3.return_value = config
+    mocker.patch("lambdas.notification.handler.Config", config_mock)
+
+    client_mock = mocker.MagicMock()
+    mocker.patch("lambdas.notification.handler.get_sfn_client", client_mock)
+
+    handler.notification(s3_event, None)
+
+    # the execution still starts, with the config inline
+    args, kwargs = client_mock().start_execution.call_args
+    state_input = json.loads(kwargs.get("input"))
+    assert state_input.get("config") == {"Default": {}}
+    assert "config_ref" not in state_input
+    assert "serviceError" not in state_input
+
+
+@pytest.mark.parametrize(
+    "key", ["train/demand/part-0000.csv", "train/demand/data_0.csv", "train/_SUCCESS"]
+)
+def test_notification_ignored(s3_event, mocker, key):
+    s3_event["Records"][0]["s3"]["object"]["key"] = key
+    client_mock = mocker.MagicMock()
+    mocker.patch("lambdas.notification.handler.get_sfn_client", client_mock)
+
+    handler.notification(s3_event, None)
+    client_mock().start_execution.assert_not_called()
+
+
+def test_notification_nested(s3_event, mocker):
+    # a .csv file nested below the folder of a multipart dataset is not a shard
+    s3_event["Records"][0]["s3"]["object"]["key"] = "train/demand/2020/data.csv"
+    config = mocker.MagicMock()
+    config.validate.return_value = []
+    config.config = {"Default": {}}
+    config_mock = mocker.MagicMock()
+    config_mock.from_s3.return_value = config
+    mocker.patch("lambdas.notification.handler.Config", config_mock)
+
+    client_mock = mocker.MagicMock()
+    mocker.patch("lambdas.notification.handler.get_sfn_client", client_mock)
+
+    handler.notification(s3_event, None)
+
+    args, kwargs = client_mock().start_execution.call_args
+    assert "data_target_time_series_" in kwargs.get("name")
+    state_input = json.loads(kwargs.get("input"))
+    assert state_input["dataset_file"] == "train/demand/2020/data.csv"
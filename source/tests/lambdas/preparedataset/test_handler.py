@@ -0,0 +1,172 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import pytest
+
+from lambdas.preparedataset.handler import (
+    convertdataset,
+    profiledataset,
+    resampledataset,
+    validate_dataset,
+    validatedataset,
+)
+from shared.Dataset.dataset_file import DatasetFile
+from shared.Dataset.dataset_validator import DatasetValidationError
+from shared.config import Config
+from shared.status import Status
+
+
+@pytest.fixture
+def event(sfn_configuration_data):
+    return {**sfn_configuration_data, "bucket": "testbucket"}
+
+
+@pytest.fixture
+def config(configuration_data):
+    config = Config()
+    config.config = configuration_data
+    return config
+
+
+@pytest.mark.parametrize("max_bytes,profiled", [("0", False), ("1024", True)])
+def test_profiledataset(s3, event, monkeypatch, max_bytes, profiled):
+    monkeypatch.setenv("DATASET_PROFILE_MAX_BYTES", max_bytes)
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(
+        Bucket="testbucket",
+        Key="train/demand.csv",
+        Body=b"item_1,2020-01-01,1\nitem_2,2020-01-01,2\nitem_1,2020-01-02,3\n",
+    )
+
+    profile = profiledataset(event, None)
+    if profiled:
+        assert profile["Rows"] == 3
+        assert profile["Items"] == 2
+        assert "Columns" not in profile
+    else:
+        assert profile is None
+
+
+def test_profiledataset_missing(s3, event, monkeypatch):
+    monkeypatch.setenv("DATASET_PROFILE_MAX_BYTES", "1024")
+    s3.create_bucket(Bucket="testbucket")
+
+    # profiling problems do not fail the step
+    assert profiledataset(event, None) is None
+
+
+def test_validate_dataset(s3, config, monkeypatch):
+    monkeypatch.setenv("DATASET_VALIDATION_MAX_BYTES", "1024")
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(
+        Bucket="testbucket",
+        Key="train/RetailDemandTRM.csv",
+        Body=b"item_1,2020-01-01,1\nitem_1,2020-01-02 12:00:00,2\n",
+    )
+    dataset_file = DatasetFile("train/RetailDemandTRM.csv", "testbucket")
+
+    with pytest.raises(DatasetValidationError, match="row 2: timestamp value"):
+        validate_dataset(config, dataset_file)
+
+    # larger datasets are not validated
+    monkeypatch.setenv("DATASET_VALIDATION_MAX_BYTES", "16")
+    assert validate_dataset(config, dataset_file) is None
+
+
+@pytest.mark.parametrize(
+    "status,validated", [(Status.DOES_NOT_EXIST, True), (Status.ACTIVE, False)]
+)
+def test_validatedataset(s3, event, mocker, monkeypatch, status, validated):
+    monkeypatch.setenv("DATASET_VALIDATION_MAX_BYTES", "1024")
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(
+        Bucket="testbucket",
+        Key="train/demand.csv",
+        Body=b"item_1,2020-01-01,1\nitem_2,2020-01-01,2\n",
+    )
+    dataset_import = mocker.patch.object(Config, "dataset_import_job").return_value
+    dataset_import.status = status
+
+    report = validatedataset(event, None)
+    if validated:
+        assert report["Rows"] == 2
+        assert "Errors" not in report
+    else:
+        assert report is None
+
+
+@pytest.mark.parametrize(
+    "resample,status,max_bytes,resampled",
+    [
+        (False, Status.DOES_NOT_EXIST, "0", False),
+        (True, Status.ACTIVE, "0", False),
+        (True, Status.DOES_NOT_EXIST, "0", True),
+        (True, Status.DOES_NOT_EXIST, "1024", True),
+    ],
+)
+def test_resampledataset(
+    s3, event, mocker, monkeypatch, resample, status, max_bytes, resampled
+):
+    monkeypatch.setenv("DATASET_RESAMPLE_MAX_BYTES", max_bytes)
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(
+        Bucket="testbucket", Key="train/demand.csv", Body=b"item_1,2020-01-01,1\n"
+    )
+    dataset_import = mocker.patch.object(Config, "dataset_import_job").return_value
+    dataset_import.resample = resample
+    dataset_import.status = status
+    resampler = mocker.patch("lambdas.preparedataset.handler.DatasetResampler")
+    resampler.return_value.resample.return_value = "resampled/train/demand.csv"
+
+    key = resampledataset(event, None)
+    assert key == ("resampled/train/demand.csv" if resampled else None)
+    assert resampler.called == resampled
+
+
+def test_resampledataset_too_large(s3, event, mocker, monkeypatch):
+    monkeypatch.setenv("DATASET_RESAMPLE_MAX_BYTES", "16")
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(
+        Bucket="testbucket", Key="train/demand.csv", Body=b"item_1,2020-01-01,1\n" * 2
+    )
+    dataset_import = mocker.patch.object(Config, "dataset_import_job").return_value
+    dataset_import.resample = True
+    dataset_import.status = Status.DOES_NOT_EXIST
+
+    with pytest.raises(ValueError, match="too large to resample"):
+        resampledataset(event, None)
+
+
+@pytest.mark.parametrize(
+    "import_format,status,converted",
+    [
+        ("CSV", Status.DOES_NOT_EXIST, False),
+        ("PARQUET", Status.ACTIVE, False),
+        ("PARQUET", Status.DOES_NOT_EXIST, True),
+    ],
+)
+def test_convertdataset(s3, event, mocker, import_format, status, converted):
+    dataset_import = mocker.patch.object(Config, "dataset_import_job").return_value
+    dataset_import.import_format = import_format
+    dataset_import.status = status
+    converter = mocker.patch("lambdas.preparedataset.handler.ParquetConverter")
+    converter.return_value.convert.return_value = "converted/train/demand.parquet"
+
+    key = convertdataset(event, None)
+    assert key == ("converted/train/demand.parquet" if converted else None)
+    if converted:
+        converter.return_value.convert.assert_called_once_with(
+            dataset_import.import_file
+        )
+    else:
+        converter.assert_not_called()
@@ -17,7 +17,7 @@ import boto3
 import pytest
 from moto import mock_sns
 
-from lambdas.sns.handler import sns, sns_conditional
+from lambdas.sns.handler import build_message, sns, sns_conditional
 
 fail_state_error_message = json.loads(
     """
@@ -101,3 +101,22 @@ def test_sns_conditional_error(fail_service_error, mocker):
     patched_client = mocker.patch("lambdas.sns.handler.get_sns_client")
     sns_conditional(fail_service_error_message, None)
     assert patched_client().publish.called
+
+
+def test_sns_message_profile(success_event):
+    event = dict(success_event)
+    event["dataset_profile"] = {
+        "Rows": 100,
+        "Items": 10,
+        "ItemsEstimated": False,
+        "StartTimestamp": "2020-01-01",
+        "EndTimestamp": "2020-01-10",
+        "Frequency": "D",
+    }
+
+    message = build_message(event)
+    assert message.startswith("Forecast for some_forecast_name is ready!")
+    assert (
+        "Dataset some_forecast_name.csv: 100 rows, 10 items, from 2020-01-01 to 2020-01-10 (frequency D)"
+        in message
+    )
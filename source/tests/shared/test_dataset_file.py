@@ -11,10 +11,13 @@
 #  and limitations under the License.                                                                                 #
 # #####################################################################################################################
 
+import json
+
 import pytest
 
 from shared.Dataset.dataset_file import DatasetFile
 from shared.Dataset.dataset_type import DatasetType
+from shared.Dataset.line_counter import LineCounter
 
 
 @pytest.fixture(scope="module")
@@ -72,3 +75,124 @@ def test_dataset_name_related(dataset_related, bucket):
     assert dsf.name == "some_filename_related"
     assert dsf.prefix == "some_filename"
     assert dsf.data_type == DatasetType.RELATED_TIME_SERIES
+
+
+@pytest.mark.parametrize(
+    "key,name,data_type",
+    [
+        ("train/demand/", "demand", DatasetType.TARGET_TIME_SERIES),
+        ("train/demand.related/", "demand_related", DatasetType.RELATED_TIME_SERIES),
+        ("train/demand.metadata/", "demand_metadata", DatasetType.ITEM_METADATA),
+    ],
+)
+def test_multipart_file(key, name, data_type, bucket):
+    dsf = DatasetFile(key, bucket)
+    assert dsf.multipart
+    assert dsf.prefix == "demand"
+    assert dsf.name == name
+    assert dsf.data_type == data_type
+
+
+def test_multipart_keys():
+    assert DatasetFile.dataset_key("train/demand_SUCCESS") == "train/demand/"
+    assert DatasetFile.dataset_key("train/demand.csv") == "train/demand.csv"
+    assert DatasetFile.dataset_key("train/_SUCCESS") == "train/_SUCCESS"
+    assert DatasetFile.dataset_key("train/demand/_SUCCESS") == "train/demand/_SUCCESS"
+    assert DatasetFile.is_shard("train/demand/part-0000.csv")
+    assert DatasetFile.is_shard("train/demand/data_0.csv")
+    assert not DatasetFile.is_shard("train/part-0000.csv")
+    assert not DatasetFile.is_shard("train/demand.csv")
+    assert not DatasetFile.is_shard("train/demand/2020/part-0000.csv")
+    assert DatasetFile.is_shard("some/s3/path/train/demand/part-0000.csv")
+
+
+def put_shards(s3, shards, marker=b""):
+    s3.create_bucket(Bucket="testbucket")
+    for name, body in shards.items():
+        s3.put_object(Bucket="testbucket", Key=f"train/demand/{name}", Body=body)
+    s3.put_object(Bucket="testbucket", Key="train/demand_SUCCESS", Body=marker)
+
+
+def test_multipart_size(s3, mocker):
+    put_shards(
+        s3,
+        {
+            "part-0000.csv": b"item_1,2020-01-01,1\nitem_1,2020-01-02,2\n",
+            "part-0001.csv": b"item_2,2020-01-01,1\n\n",
+            "part-0002.csv": b"",
+        },
+    )
+
+    dsf = DatasetFile("train/demand/", "testbucket")
+    assert [shard["Key"] for shard in dsf.shards] == [
+        "train/demand/part-0000.csv",
+        "train/demand/part-0001.csv",
+        "train/demand/part-0002.csv",
+    ]
+    assert dsf.size == 3
+    assert dsf.fingerprint.startswith("multipart-")
+    assert s3.head_object(Bucket="testbucket", Key="train/demand.manifest.json")
+
+    # only the changed shard is counted again
+    s3.put_object(
+        Bucket="testbucket",
+        Key="train/demand/part-0002.csv",
+        Body=b"item_3,2020-01-01,1\n",
+    )
+    count = mocker.spy(LineCounter, "count_objects")
+    changed = DatasetFile("train/demand/", "testbucket")
+    assert changed.size == 4
+    assert changed.fingerprint != dsf.fingerprint
+    assert [key for key, _, _ in count.call_args[0][2]] == [
+        "train/demand/part-0002.csv"
+    ]
+
+
+def test_multipart_missing_shards(s3):
+    put_shards(
+        s3,
+        {"part-0000.csv": b"item_1,2020-01-01,1\n"},
+        marker=json.dumps({"Files": ["part-0000.csv", "part-0001.csv"]}).encode(
+            "utf-8"
+        ),
+    )
+
+    with pytest.raises(ValueError, match="part-0001.csv"):
+        DatasetFile("train/demand/", "testbucket").size
+
+
+@pytest.mark.parametrize("other", ["_SUCCESS", "nested/part-0000.csv", "README.md"])
+def test_multipart_other_objects(s3, other):
+    put_shards(s3, {"part-0000.csv": b"item_1,2020-01-01,1\n"})
+    s3.put_object(Bucket="testbucket", Key=f"train/demand/{other}", Body=b"")
+
+    with pytest.raises(ValueError, match="must only hold .csv shards"):
+        DatasetFile("train/demand/", "testbucket").size
+
+
+def test_multipart_profile(s3):
+    put_shards(
+        s3,
+        {
+            "part-0000.csv": b"item_1,2020-01-01,1\nitem_1,2020-01-02,2\n",
+            "part-0001.csv": b"item_2,2020-01-01,1\n",
+        },
+    )
+    schema = {
+        "Attributes": [
+            {"AttributeName": "item_id", "AttributeType": "string"},
+            {"AttributeName": "timestamp", "AttributeType": "timestamp"},
+            {"AttributeName": "demand", "AttributeType": "float"},
+        ]
+    }
+
+    profile = DatasetFile("train/demand/", "testbucket").profile(schema)
+    assert profile["Rows"] == 3
+    assert profile["Items"] == 2
+
+    # the profile computes the same manifest as counting the shards
+    profiled = DatasetFile("train/demand/", "testbucket").manifest
+    s3.delete_object(Bucket="testbucket", Key="train/demand.manifest.json")
+    counted = DatasetFile("train/demand/", "testbucket").manifest
+    assert profiled.fingerprint == counted.fingerprint
+    assert profiled.shards == counted.shards
@@ -64,6 +64,7 @@ def test_dataset_import_job_status_lifecycle(configuration_data, forecast_stub,
         "describe_dataset_import_job",
         {"Status": "ACTIVE", "FieldStatistics": {"item_id": {"Count": size}}},
     )
+    forecast_stub.add_response("list_tags_for_resource", {"Tags": []})
     forecast_stub.add_response(
         "list_dataset_import_jobs",
         {
@@ -87,6 +88,7 @@ def test_dataset_import_job_status_lifecycle(configuration_data, forecast_stub,
         "describe_dataset_import_job",
         {"Status": "ACTIVE", "FieldStatistics": {"item_id": {"Count": size + 1}}},
     )
+    forecast_stub.add_response("list_tags_for_resource", {"Tags": []})
 
     dataset_import_job.cli = forecast_stub.client
     mocker.patch(
@@ -97,13 +99,125 @@ def test_dataset_import_job_status_lifecycle(configuration_data, forecast_stub,
 
     assert dataset_import_job.status == Status.DOES_NOT_EXIST
 
-    # simulate finding an active dataset
+    # simulate finding an active dataset (imported before fingerprints were recorded)
     assert dataset_import_job.status == Status.ACTIVE
 
     # simulate a new dataset (with more lines) uploaded
     assert dataset_import_job.status == Status.DOES_NOT_EXIST
 
 
+@mock_sts
+def test_dataset_import_job_status_fingerprint(
+    configuration_data, forecast_stub, mocker
+):
+    config = Config()
+    config.config = configuration_data
+
+    dataset_file = DatasetFile("RetailDemandTRM.csv", "some_bucket")
+    dataset_import_job = config.dataset_import_job(dataset_file)
+    mocker.patch(
+        "shared.Dataset.dataset_file.DatasetFile.head",
+        new_callable=mocker.PropertyMock,
+        return_value={"ETag": '"0123456789abcdef"'},
+    )
+    fingerprint = dataset_import_job.fingerprint
+    assert fingerprint.startswith("0123456789abcdef:")
+    history = {
+        "DatasetImportJobs": [
+            {
+                "LastModificationTime": datetime(2015, 1, 1),
+                "DatasetImportJobArn": "arn:2015-1-1",
+            }
+        ]
+    }
+    for imported in [fingerprint, fingerprint.replace("0123", "3210")]:
+        forecast_stub.add_response("list_dataset_import_jobs", history)
+        forecast_stub.add_response(
+            "describe_dataset_import_job",
+            {"Status": "ACTIVE", "FieldStatistics": {"item_id": {"Count": 1}}},
+        )
+        forecast_stub.add_response(
+            "list_tags_for_resource",
+            {"Tags": [{"Key": "SourceFingerprint", "Value": imported}]},
+            {"ResourceArn": "arn:2015-1-1"},
+        )
+
+    dataset_import_job.cli = forecast_stub.client
+    size = mocker.patch(
+        "shared.Dataset.dataset_file.DatasetFile.size",
+        new_callable=mocker.PropertyMock,
+    )
+
+    # the dataset file was imported with the same content
+    assert dataset_import_job.status == Status.ACTIVE
+
+    # the dataset file changed since it was imported
+    assert dataset_import_job.status == Status.DOES_NOT_EXIST
+
+    # the dataset file is not read to decide if it changed
+    size.assert_not_called()
+
+
+@mock_sts
+def test_dataset_import_job_create_fingerprint(
+    configuration_data, forecast_stub, mocker
+):
+    config = Config()
+    config.config = configuration_data
+
+    dataset_file = DatasetFile("RetailDemandTRM.csv", "some_bucket")
+    dataset_import_job = config.dataset_import_job(dataset_file)
+    mocker.patch(
+        "shared.Dataset.dataset_file.DatasetFile.head",
+        new_callable=mocker.PropertyMock,
+        return_value={"ETag": '"0123456789abcdef"'},
+    )
+    forecast_stub.add_response(
+        "create_dataset_import_job",
+        {"DatasetImportJobArn": "arn:2015-1-1"},
+        {
+            **dataset_import_job._import_job_params,
+            "DatasetImportJobName": mocker.ANY,
+            "Tags": [
+                {"Key": "SourceFingerprint", "Value": dataset_import_job.fingerprint}
+            ],
+        },
+    )
+
+    dataset_import_job.cli = forecast_stub.client
+    dataset_import_job.create()
+    forecast_stub.assert_no_pending_responses()
+
+
+@mock_sts
+def test_dataset_import_job_fingerprint_settings(configuration_data, mocker):
+    mocker.patch(
+        "shared.Dataset.dataset_file.DatasetFile.head",
+        new_callable=mocker.PropertyMock,
+        return_value={"ETag": '"0123456789abcdef"'},
+    )
+    config = Config()
+    config.config = configuration_data
+    datasets = configuration_data["RetailDemandTRM"]["Datasets"]
+    dataset_file = DatasetFile("train/RetailDemandTRM.csv", "some_bucket")
+
+    # the same source imported with other settings has another fingerprint
+    fingerprints = [config.dataset_import_job(dataset_file).fingerprint]
+    for setting, value in [
+        ("Aggregation", {"demand": "sum"}),
+        ("Aggregation", {"demand": "mean"}),
+        ("ImportFormat", "PARQUET"),
+    ]:
+        for dataset in datasets:
+            dataset[setting] = value
+        config.config = configuration_data
+        fingerprints.append(config.dataset_import_job(dataset_file).fingerprint)
+
+    assert all(f.startswith("0123456789abcdef:") for f in fingerprints)
+    assert len(set(fingerprints)) == len(fingerprints)
+    assert fingerprints[-1] == config.dataset_import_job(dataset_file).fingerprint
+
+
 @mock_sts
 def test_dataset_import_job_arn(configuration_data, forecast_stub, mocker):
     config = Config()
@@ -138,3 +252,48 @@ def test_dataset_import_job_arn(configuration_data, forecast_stub, mocker):
         dataset_import_job.arn
         == f"arn:aws:forecast:abcdefghijkl:us-east-1:dataset-import-job/RetailDemandTRM/RetailDemandTRM_2017_01_01_00_00_00"
     )
+
+
+@mock_sts
+def test_dataset_import_job_parquet(configuration_data):
+    datasets = configuration_data["RetailDemandTRM"]["Datasets"]
+    for dataset in datasets:
+        dataset["ImportFormat"] = "PARQUET"
+    config = Config()
+    config.config = configuration_data
+
+    dataset_file = DatasetFile("train/RetailDemandTRM.csv", "some_bucket")
+    params = config.dataset_import_job(dataset_file)._import_job_params
+    assert params["Format"] == "PARQUET"
+    assert (
+        params["DataSource"]["S3Config"]["Path"]
+        == "s3://some_bucket/converted/train/RetailDemandTRM.parquet"
+    )
+
+
+@mock_sts
+def test_dataset_import_job_resample(configuration_data):
+    datasets = configuration_data["RetailDemandTRM"]["Datasets"]
+    for dataset in datasets:
+        dataset["Aggregation"] = {"demand": "sum"}
+    config = Config()
+    config.config = configuration_data
+
+    dataset_file = DatasetFile("train/RetailDemandTRM.csv", "some_bucket")
+    dataset_import_job = config.dataset_import_job(dataset_file)
+    assert dataset_import_job.resample
+    assert dataset_import_job.import_file.key == "resampled/train/RetailDemandTRM.csv"
+    assert (
+        dataset_import_job._import_job_params["DataSource"]["S3Config"]["Path"]
+        == "s3://some_bucket/resampled/train/RetailDemandTRM.csv"
+    )
+
+    # resampled datasets imported as Parquet are imported from the conversion of the resampled dataset
+    for dataset in datasets:
+        dataset["ImportFormat"] = "PARQUET"
+    config.config = configuration_data
+    params = config.dataset_import_job(dataset_file)._import_job_params
+    assert (
+        params["DataSource"]["S3Config"]["Path"]
+        == "s3://some_bucket/converted/resampled/train/RetailDemandTRM.parquet"
+    )
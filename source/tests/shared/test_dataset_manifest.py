@@ -0,0 +1,97 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import json
+
+import pytest
+
+from shared.Dataset.dataset_file import DatasetFile
+from shared.Dataset.dataset_manifest import DatasetManifest, MANIFEST_VERSION
+from shared.Dataset.line_counter import LineCounter
+
+KEY = "train/RetailDemandTRM.csv"
+
+
+@pytest.fixture
+def dataset_bucket(s3):
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(
+        Bucket="testbucket", Key=KEY, Body=b"item_1,2020-01-01,1\nitem_2,2020-01-01,2\n"
+    )
+    return s3
+
+
+def test_manifest_written(dataset_bucket):
+    dataset_file = DatasetFile(KEY, "testbucket")
+    assert dataset_file.size == 2
+
+    body = dataset_bucket.get_object(Bucket="testbucket", Key=DatasetManifest.key(KEY))
+    manifest = json.loads(body["Body"].read())
+    assert manifest["Version"] == MANIFEST_VERSION
+    assert manifest["Lines"] == 2
+    assert manifest["Fingerprint"] == dataset_file.fingerprint
+    assert (
+        manifest["ETag"]
+        == dataset_bucket.head_object(Bucket="testbucket", Key=KEY)["ETag"]
+    )
+
+
+def test_manifest_reused(dataset_bucket, mocker):
+    assert DatasetFile(KEY, "testbucket").size == 2
+
+    # later invocations (e.g. each status poll) read the manifest instead of scanning the file
+    count = mocker.spy(LineCounter, "count")
+    assert DatasetFile(KEY, "testbucket").size == 2
+    assert DatasetFile(KEY, "testbucket").fingerprint
+    assert count.call_count == 0
+
+
+def test_manifest_stale(dataset_bucket, mocker):
+    fingerprint = DatasetFile(KEY, "testbucket").fingerprint
+    dataset_bucket.put_object(
+        Bucket="testbucket", Key=KEY, Body=b"item_1,2020-01-01,1\n"
+    )
+
+    count = mocker.spy(LineCounter, "count")
+    dataset_file = DatasetFile(KEY, "testbucket")
+    assert dataset_file.size == 1
+    assert dataset_file.fingerprint != fingerprint
+    assert count.call_count == 1
+
+
+def test_manifest_versioned(dataset_bucket):
+    dataset_bucket.put_bucket_versioning(
+        Bucket="testbucket", VersioningConfiguration={"Status": "Enabled"}
+    )
+    dataset_bucket.put_object(
+        Bucket="testbucket", Key=KEY, Body=b"item_1,2020-01-01,1\n"
+    )
+
+    dataset_file = DatasetFile(KEY, "testbucket")
+    assert dataset_file.size == 1
+    assert dataset_file.manifest.version_id
+
+    head = dataset_bucket.head_object(Bucket="testbucket", Key=KEY)
+    assert DatasetManifest.load(
+        dataset_bucket, "testbucket", KEY, head["ETag"], head["VersionId"]
+    )
+    assert not DatasetManifest.load(
+        dataset_bucket, "testbucket", KEY, head["ETag"], "another-version"
+    )
+
+
+def test_manifest_corrupt(dataset_bucket):
+    dataset_bucket.put_object(
+        Bucket="testbucket", Key=DatasetManifest.key(KEY), Body=b"{"
+    )
+    assert DatasetFile(KEY, "testbucket").size == 2
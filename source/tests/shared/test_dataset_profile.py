@@ -0,0 +1,124 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import pytest
+
+from shared.Dataset.dataset_file import DatasetFile
+from shared.Dataset.dataset_profile import DatasetProfiler, DistinctCounter
+from shared.Dataset.line_counter import LineCounter
+
+SCHEMA = {
+    "Attributes": [
+        {"AttributeName": "item_id", "AttributeType": "string"},
+        {"AttributeName": "timestamp", "AttributeType": "timestamp"},
+        {"AttributeName": "demand", "AttributeType": "float"},
+    ]
+}
+
+KEY = "train/RetailDemandTRM.csv"
+BODY = (
+    b"item_1,2020-01-01,1\n"
+    b"item_1,2020-01-02,\n"
+    b"item_2,2020-01-01,3.5\n"
+    b"\n"
+    b"item_2,2020-01-03,-2\n"
+    b"item_3,2020-01-02,n/a\n"
+    b"item_3,2020-01-04"
+)
+
+
+def chunks(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 1024])
+def test_profile(read_size):
+    profiler = DatasetProfiler(SCHEMA, chunk_size=16)
+    profile = profiler.profile(chunks(BODY, read_size))
+
+    assert profile["Rows"] == 6
+    assert profile["Bytes"] == len(BODY)
+    assert profile["Items"] == 3
+    assert not profile["ItemsEstimated"]
+    assert profile["StartTimestamp"] == "2020-01-01"
+    assert profile["EndTimestamp"] == "2020-01-04"
+    assert profile["Frequency"] == "D"
+    assert profile["Columns"] == {
+        "item_id": {"Nulls": 0},
+        "timestamp": {"Nulls": 0},
+        "demand": {"Nulls": 2, "Min": -2.0, "Max": 3.5, "Invalid": 1},
+    }
+
+
+def test_profile_matches_line_counter(s3):
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(Bucket="testbucket", Key=KEY, Body=BODY)
+
+    count = LineCounter(s3, chunk_size=16).count("testbucket", KEY)
+    profiler = DatasetProfiler(SCHEMA, chunk_size=16, read_size=5)
+    profile = profiler.profile_object(s3, "testbucket", KEY)
+
+    assert profile["Rows"] == count.lines
+    assert profiler.fingerprint == count.fingerprint
+
+
+def test_profile_extra_columns():
+    profile = DatasetProfiler(SCHEMA).profile([b"item_1,2020-01-01,1,red\n"])
+    assert profile["Columns"]["_3"] == {"Nulls": 0}
+
+
+@pytest.mark.parametrize(
+    "timestamps,frequency",
+    [
+        (
+            ["2020-01-01 00:00:00", "2020-01-01 00:15:00", "2020-01-01 00:30:00"],
+            "15min",
+        ),
+        (["2020-01-01 00:00:00", "2020-01-01 01:00:00", "2020-01-01 03:00:00"], "H"),
+        (["2020-01-06", "2020-01-13", "2020-01-20"], "W"),
+        (["2020-01-01", "2020-02-01", "2020-03-01", "2020-04-01"], "M"),
+        (["2018-01-01", "2019-01-01", "2020-01-01"], "Y"),
+        (["2020-01-01", "2020-01-04"], None),
+        (["2020-01-01"], None),
+    ],
+)
+def test_profile_frequency(timestamps, frequency):
+    body = "".join(f"item_1,{timestamp},1\n" for timestamp in timestamps)
+    profile = DatasetProfiler(SCHEMA).profile([body.encode("utf-8")])
+    assert profile["Frequency"] == frequency
+
+
+def test_distinct_counter_estimate():
+    counter = DistinctCounter(max_size=1000)
+    counter.add(f"item_{n}" for n in range(50000))
+    counter.add(f"item_{n}" for n in range(10000))
+
+    assert counter.estimated
+    assert abs(counter.count() - 50000) < 50000 * 0.05
+
+
+def test_dataset_file_profile(s3, mocker):
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(Bucket="testbucket", Key=KEY, Body=BODY)
+
+    profile = DatasetFile(KEY, "testbucket").profile(SCHEMA)
+    assert profile["Rows"] == 6
+
+    # the profile is stored in the manifest, and reused for the size and profile of the file
+    count = mocker.spy(LineCounter, "count")
+    get_profile = mocker.spy(DatasetProfiler, "profile")
+    dataset_file = DatasetFile(KEY, "testbucket")
+    assert dataset_file.size == 6
+    assert dataset_file.profile(SCHEMA)["Items"] == 3
+    assert count.call_count == 0
+    assert get_profile.call_count == 0
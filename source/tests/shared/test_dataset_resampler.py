@@ -0,0 +1,213 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import io
+from datetime import datetime
+
+import boto3
+import pyarrow as pa
+import pytest
+from botocore.config import Config
+
+from shared.Dataset.dataset_file import DatasetFile
+from shared.Dataset.dataset_resampler import DatasetResampler, resampled_key
+from shared.Dataset.dataset_type import DatasetType
+from shared.s3.multipart_upload import SOURCE_ETAG_METADATA
+
+SCHEMA = {
+    "Attributes": [
+        {"AttributeName": "item_id", "AttributeType": "string"},
+        {"AttributeName": "timestamp", "AttributeType": "timestamp"},
+        {"AttributeName": "demand", "AttributeType": "float"},
+    ]
+}
+
+MINUTES = (
+    b"item_1,2020-01-01 00:01:00,1.0\n"
+    b"item_1,2020-01-01 00:59:00,2.0\n"
+    b"item_2,2020-01-01 00:30:00,5\n"
+    b"\n"
+    b"item_1,2020-01-01 01:00:00,3.0\n"
+    b"item_1,2020-01-01 01:15:00,\n"
+    b",2020-01-01 01:15:00,1.0\n"
+    b"item_2,not a timestamp,1.0\n"
+)
+
+
+def resample(data, schema=SCHEMA, **kwargs):
+    resampler = DatasetResampler(None, schema, **kwargs)
+    resampler.add(io.BytesIO(data))
+    out = io.BytesIO()
+    resampler.write(out)
+    return resampler, out.getvalue().decode("utf-8")
+
+
+def test_resampled_key():
+    assert resampled_key("train/demand.csv") == "resampled/train/demand.csv"
+    assert resampled_key("train/demand/") == "resampled/train/demand.csv"
+
+
+def test_resample_hourly():
+    resampler, out = resample(MINUTES, frequency="H")
+    assert out == (
+        "item_1,2020-01-01 00:00:00,3\n"
+        "item_1,2020-01-01 01:00:00,3\n"
+        "item_2,2020-01-01 00:00:00,5\n"
+    )
+    assert resampler.rows == 5
+    assert resampler.skipped == 2
+    assert resampler.groups == 3
+
+
+@pytest.mark.parametrize(
+    "aggregation,expected",
+    [
+        ("sum", "6"),
+        ("mean", "2"),
+        ("min", "1"),
+        ("max", "3"),
+        ("first", "1"),
+        ("last", "3"),
+        ("count", "3"),
+    ],
+)
+def test_resample_aggregation(aggregation, expected):
+    data = (
+        b"item_1,2020-01-01 10:00:00,2.0\n"
+        b"item_1,2020-01-01 00:00:00,1.0\n"
+        b"item_1,2020-01-01 23:59:00,3.0\n"
+    )
+    _, out = resample(
+        data,
+        frequency="D",
+        timestamp_format="yyyy-MM-dd",
+        aggregation={"demand": aggregation},
+    )
+    assert out == f"item_1,2020-01-01,{expected}\n"
+
+
+@pytest.mark.parametrize(
+    "frequency,timestamp,bucket",
+    [
+        ("15min", "2020-01-01 10:44:59", "2020-01-01 10:30:00"),
+        ("D", "2020-01-01 10:44:59", "2020-01-01 00:00:00"),
+        ("W", "2020-01-01 10:44:59", "2019-12-30 00:00:00"),
+        ("M", "2020-02-29", "2020-02-01 00:00:00"),
+        ("Y", "2020-02-29", "2020-01-01 00:00:00"),
+    ],
+)
+def test_resample_bucket(frequency, timestamp, bucket):
+    buckets, _ = DatasetResampler(None, SCHEMA, frequency)._buckets(
+        pa.array([timestamp, "not a timestamp"])
+    )
+    assert buckets.to_pylist() == [datetime.fromisoformat(bucket), None]
+
+
+def test_resample_related_dimensions():
+    schema = {
+        "Attributes": [
+            {"AttributeName": "timestamp", "AttributeType": "timestamp"},
+            {"AttributeName": "item_id", "AttributeType": "string"},
+            {"AttributeName": "location", "AttributeType": "string"},
+            {"AttributeName": "price", "AttributeType": "float"},
+            {"AttributeName": "promotions", "AttributeType": "integer"},
+        ]
+    }
+    data = (
+        b"2020-01-01 00:00:00,item_1,a,1.0,1\n"
+        b"2020-01-01 01:00:00,item_1,a,2.0,2\n"
+        b"2020-01-01 01:00:00,item_1,b,4.0,\n"
+    )
+    _, out = resample(
+        data,
+        schema=schema,
+        frequency="D",
+        data_type=DatasetType.RELATED_TIME_SERIES,
+        aggregation={"promotions": "sum"},
+    )
+    assert out == (
+        "2020-01-01 00:00:00,item_1,a,1.5,3\n" "2020-01-01 00:00:00,item_1,b,4,\n"
+    )
+
+
+@pytest.mark.parametrize("aggregation", ["mean", "first", "last", "count"])
+def test_resample_merge(aggregation):
+    data = b"".join(
+        f"item_{n % 7},2020-01-01 {n % 24:02d}:{n % 60:02d}:00,{n}\n".encode("utf-8")
+        for n in range(1000)
+    )
+    _, expected = resample(data, frequency="H", aggregation={"demand": aggregation})
+    resampler, out = resample(
+        data,
+        frequency="H",
+        aggregation={"demand": aggregation},
+        block_size=256,
+        max_partial_rows=20,
+    )
+    assert resampler.groups == len(expected.splitlines()) == 7 * 24
+    assert out == expected
+
+
+def test_resample_first_last_ties():
+    data = (
+        b"item_1,2020-01-01 00:10:00,1\n"
+        b"item_1,2020-01-01 00:10:00,2\n"
+        b"item_1,2020-01-01 00:10:00,\n"
+    )
+    for aggregation, expected in [("first", "1"), ("last", "2")]:
+        _, out = resample(
+            data, frequency="H", aggregation={"demand": aggregation}, block_size=32
+        )
+        assert out == f"item_1,2020-01-01 00:00:00,{expected}\n"
+
+
+def test_resample_quoting():
+    _, out = resample(b'"item, 1",2020-01-01 00:10:00,1\n', frequency="H")
+    assert out == '"item, 1","2020-01-01 00:00:00",1\n'
+
+
+def test_resample_dataset_file(s3, mocker):
+    # moto stores the aws-chunked encoding of parts uploaded with checksums
+    s3 = boto3.client("s3", config=Config(request_checksum_calculation="when_required"))
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(Bucket="testbucket", Key="train/demand.csv", Body=MINUTES)
+    dataset_file = DatasetFile("train/demand.csv", "testbucket")
+
+    resampler = DatasetResampler(s3, SCHEMA, "H")
+    assert resampler.resample(dataset_file) == "resampled/train/demand.csv"
+    resampled = s3.get_object(Bucket="testbucket", Key="resampled/train/demand.csv")
+    assert resampled["Metadata"][SOURCE_ETAG_METADATA] == dataset_file.head["ETag"]
+    assert resampled["Body"].read().count(b"\n") == 3
+
+    # the current version of the dataset file is resampled once
+    add = mocker.patch.object(DatasetResampler, "add")
+    DatasetResampler(s3, SCHEMA, "H").resample(dataset_file)
+    add.assert_not_called()
+
+    # and again if it is resampled with other settings
+    DatasetResampler(s3, SCHEMA, "H", aggregation={"demand": "mean"}).resample(
+        dataset_file
+    )
+    add.assert_called_once()
+
+
+def test_resample_multipart(s3):
+    s3 = boto3.client("s3", config=Config(request_checksum_calculation="when_required"))
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(Bucket="testbucket", Key="train/demand/part-0000.csv", Body=MINUTES)
+    s3.put_object(Bucket="testbucket", Key="train/demand/part-0001.csv", Body=b"")
+    dataset_file = DatasetFile("train/demand/", "testbucket")
+
+    resampler = DatasetResampler(s3, SCHEMA, "H")
+    assert resampler.resample(dataset_file) == "resampled/train/demand.csv"
+    assert resampler.groups == 3
@@ -0,0 +1,202 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import pytest
+
+from shared.Dataset.dataset_file import DatasetFile
+from shared.Dataset.dataset_validator import DatasetValidator, DatasetValidationError
+
+SCHEMA = {
+    "Attributes": [
+        {"AttributeName": "item_id", "AttributeType": "string"},
+        {"AttributeName": "timestamp", "AttributeType": "timestamp"},
+        {"AttributeName": "demand", "AttributeType": "float"},
+        {"AttributeName": "price", "AttributeType": "integer"},
+    ]
+}
+
+BODY = (
+    b"item_1,2020-01-01,1,10\n"
+    b"item_1,2020-01-02,,10\n"
+    b"\n"
+    b'"item, 2",2020-01-01,3.5,-2\n'
+    b"item_2,2020-01-03,-2e3,+7"
+)
+
+
+def chunks(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def errors(body, timestamp_format="yyyy-MM-dd", frequency="D", **kwargs):
+    validator = DatasetValidator(SCHEMA, timestamp_format, frequency, **kwargs)
+    return [str(error) for error in validator.validate([body]).errors]
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 1024])
+@pytest.mark.parametrize("batch_size", [1, 2, 10000])
+def test_validate(read_size, batch_size):
+    validator = DatasetValidator(SCHEMA, "yyyy-MM-dd", "D", batch_size=batch_size)
+    report = validator.validate(chunks(BODY, read_size))
+
+    assert report.valid
+    assert report.rows == 4
+    assert report.size == len(BODY)
+    assert report.as_dict()["RowsPerSecond"] >= 0
+
+
+def test_validate_columns():
+    assert errors(b"item_1,2020-01-01,1,10\nitem_1,2020-01-02,1\n") == [
+        "row 2: expected 4 columns (item_id, timestamp, demand, price) but found 3"
+    ]
+
+
+@pytest.mark.parametrize("block_size", [64, 1024])
+def test_validate_row_numbers(block_size):
+    body = (
+        b"item_1,2020-01-01,1,10\n\n"
+        b"item_1,2020-01-01,1\n\n\n"
+        b"item_1,2020-01-01,x,10\n"
+        b"item_1,2020-01-01,1,10,5\n"
+    )
+    assert errors(body * 2, block_size=block_size) == [
+        "row 3: expected 4 columns (item_id, timestamp, demand, price) but found 3",
+        "row 6: demand value 'x' is not a float",
+        "row 7: expected 4 columns (item_id, timestamp, demand, price) but found 5",
+        "row 10: expected 4 columns (item_id, timestamp, demand, price) but found 3",
+        "row 13: demand value 'x' is not a float",
+        "row 14: expected 4 columns (item_id, timestamp, demand, price) but found 5",
+    ]
+
+
+def test_validate_columns_fails_fast():
+    validator = DatasetValidator(SCHEMA, "yyyy-MM-dd", "D", max_errors=3)
+    report = validator.validate([b"item_1,2020-01-01\n" * 100000])
+
+    assert [error.row for error in report.errors] == [1, 2, 3]
+    assert report.rows == 3
+
+
+def test_validate_types():
+    body = b"item_1,2020-01-01,n/a,10\n,2020-01-01,1,1.5\nitem_1,,1,1\n"
+    assert errors(body) == [
+        "row 1: demand value 'n/a' is not a float",
+        "row 2: item_id is missing",
+        "row 2: price value '1.5' is not an integer",
+        "row 3: timestamp is missing",
+    ]
+
+
+@pytest.mark.parametrize(
+    "timestamp,timestamp_format,frequency,problem",
+    [
+        ("2020-01-01", "yyyy-MM-dd", "D", None),
+        (
+            "2020-01-01 00:00:00",
+            "yyyy-MM-dd",
+            "D",
+            "does not match the timestamp format yyyy-MM-dd",
+        ),
+        (
+            "2020-01-01",
+            "yyyy-MM-dd HH:mm:ss",
+            "H",
+            "does not match the timestamp format yyyy-MM-dd HH:mm:ss",
+        ),
+        ("2020-02-30", "yyyy-MM-dd", "D", "is not a valid timestamp"),
+        ("2020-01-01 24:00:00", "yyyy-MM-dd HH:mm:ss", "H", "is not a valid timestamp"),
+        ("2020-01-01 10:00:00", "yyyy-MM-dd HH:mm:ss", "H", None),
+        (
+            "2020-01-01 10:30:00",
+            "yyyy-MM-dd HH:mm:ss",
+            "H",
+            "is not on the sampling grid of data frequency H",
+        ),
+        ("2020-01-01 10:45:00", "yyyy-MM-dd HH:mm:ss", "15min", None),
+        (
+            "2020-01-01 10:45:00",
+            "yyyy-MM-dd HH:mm:ss",
+            "30min",
+            "is not on the sampling grid of data frequency 30min",
+        ),
+        (
+            "2020-01-01 10:00:00",
+            "yyyy-MM-dd HH:mm:ss",
+            "D",
+            "is not at midnight (data frequency D)",
+        ),
+    ],
+)
+def test_validate_timestamps(timestamp, timestamp_format, frequency, problem):
+    body = f"item_1,{timestamp},1,1\n".encode("utf-8")
+    expected = [f"row 1: timestamp value '{timestamp}' {problem}"] if problem else []
+    assert errors(body, timestamp_format, frequency) == expected
+
+
+@pytest.mark.parametrize(
+    "frequency,timestamps,invalid",
+    [
+        ("W", ["2020-01-06", "2020-01-13", "2020-01-20"], None),
+        ("W", ["2020-01-06", "2020-01-14"], "2020-01-14"),
+        ("M", ["2020-01-01", "2020-02-01", "2020-03-01"], None),
+        ("M", ["2020-01-31", "2020-02-29", "2020-04-30"], None),
+        ("M", ["2020-01-01", "2020-02-02"], "2020-02-02"),
+        ("Y", ["2019-01-01", "2020-01-01"], None),
+        ("Y", ["2019-01-01", "2020-02-01"], "2020-02-01"),
+    ],
+)
+def test_validate_grid(frequency, timestamps, invalid):
+    body = "".join(f"item_1,{timestamp},1,1\n" for timestamp in timestamps)
+    problems = errors(body.encode("utf-8"), frequency=frequency, batch_size=1)
+    assert len(problems) == (1 if invalid else 0)
+    if invalid:
+        assert f"'{invalid}' is not on the same" in problems[0]
+
+
+def test_validate_grid_anchor():
+    timestamps = ["2020-01-06", "2020-01-14", "2020-01-21", "2020-01-28"]
+    body = "".join(f"item_1,{timestamp},1,1\n" for timestamp in timestamps)
+    problems = errors(body.encode("utf-8"), frequency="W")
+    assert len(problems) == 3
+    assert all("is not on the same weekday as 2020-01-06" in p for p in problems)
+
+
+def test_validate_fails_fast():
+    body = b"item_1,2020-01-01,x,1\n" * 100000
+    validator = DatasetValidator(
+        SCHEMA, "yyyy-MM-dd", "D", batch_size=100, max_errors=3
+    )
+    report = validator.validate(chunks(body, 1024))
+
+    assert len(report.errors) == 3
+    assert report.rows == 100
+    assert "validation stopped after 100 rows" in str(DatasetValidationError(report))
+
+
+def test_dataset_file_validate_multipart(s3):
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(Bucket="testbucket", Key="train/demand/part-0000.csv", Body=BODY)
+    s3.put_object(
+        Bucket="testbucket",
+        Key="train/demand/part-0001.csv",
+        Body=b"item_3,2020-01-01,1\n",
+    )
+    s3.put_object(Bucket="testbucket", Key="train/demand_SUCCESS", Body=b"")
+
+    report = DatasetFile("train/demand/", "testbucket").validate(
+        SCHEMA, "yyyy-MM-dd", "D"
+    )
+    assert report.rows == 5
+    assert [str(error) for error in report.errors] == [
+        "train/demand/part-0001.csv row 1: expected 4 columns (item_id, timestamp, demand, price) but found 3"
+    ]
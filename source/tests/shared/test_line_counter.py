@@ -0,0 +1,79 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import pytest
+
+from shared.Dataset.dataset_file import DatasetFile
+from shared.Dataset.line_counter import LineCounter
+
+BODIES = {
+    "empty": b"",
+    "one line": b"item_1,2020-01-01,1",
+    "trailing newline": b"item_1,2020-01-01,1\nitem_2,2020-01-01,2\n",
+    "blank lines": b"\n\nitem_1,2020-01-01,1\n\n\n\nitem_2,2020-01-01,2\n\n",
+    "empty first field": b",2020-01-01,1\nitem_1,2020-01-01,1\n,\n",
+    "empty quoted first field": b'"",2020-01-01,1\n""\n"item_1",2020-01-01,1\n""',
+    "crlf": b"item_1,2020-01-01,1\r\n\r\nitem_2,2020-01-01,2\r\n\r",
+    "whitespace": b" \nitem_1,2020-01-01,1\n\t,1\n",
+}
+
+
+def expected_lines(body: bytes):
+    """Count the lines with a non-empty first field, one line at a time"""
+    lines = 0
+    for line in body.split(b"\n"):
+        first_field = line.rstrip(b"\r").split(b",")[0]
+        if first_field not in (b"", b'""'):
+            lines += 1
+    return lines
+
+
+@pytest.mark.parametrize("name", BODIES.keys())
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 1024])
+def test_line_counter(s3, name, chunk_size):
+    body = BODIES[name]
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(Bucket="testbucket", Key="train/data.csv", Body=body)
+
+    counter = LineCounter(s3, chunk_size=chunk_size, workers=4)
+    result = counter.count("testbucket", "train/data.csv")
+
+    assert result.lines == expected_lines(body)
+    assert result.size == len(body)
+    assert result.ranges == -(-len(body) // chunk_size)
+    assert result.as_dict()["MiBPerSecond"] >= 0
+
+
+def test_dataset_file_size(s3):
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(
+        Bucket="testbucket",
+        Key="train/RetailDemandTRM.csv",
+        Body=b"item_1,2020-01-01,1\n\nitem_2,2020-01-01,2\n",
+    )
+
+    dataset_file = DatasetFile("train/RetailDemandTRM.csv", "testbucket")
+    assert dataset_file.size == 2
+
+
+def test_line_counter_fingerprint(s3):
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(Bucket="testbucket", Key="a.csv", Body=b"item_1,2020-01-01,1\n")
+    s3.put_object(Bucket="testbucket", Key="b.csv", Body=b"item_1,2020-01-01,1\n")
+    s3.put_object(Bucket="testbucket", Key="c.csv", Body=b"item_1,2020-01-01,2\n")
+
+    counter = LineCounter(s3, chunk_size=4, workers=4)
+    fingerprint = counter.count("testbucket", "a.csv").fingerprint
+    assert fingerprint.startswith("sha256-4:")
+    assert counter.count("testbucket", "b.csv").fingerprint == fingerprint
+    assert counter.count("testbucket", "c.csv").fingerprint != fingerprint
@@ -0,0 +1,90 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pa_parquet
+from botocore.config import Config
+
+from shared.Dataset.dataset_file import DatasetFile
+from shared.Dataset.parquet_converter import ParquetConverter, converted_key
+from shared.s3.multipart_upload import SOURCE_ETAG_METADATA
+
+SCHEMA = {
+    "Attributes": [
+        {"AttributeName": "item_id", "AttributeType": "string"},
+        {"AttributeName": "timestamp", "AttributeType": "timestamp"},
+        {"AttributeName": "demand", "AttributeType": "float"},
+    ]
+}
+
+
+def test_converted_key():
+    assert converted_key("train/demand.csv") == "converted/train/demand.parquet"
+    assert converted_key("train/demand/") == "converted/train/demand/"
+    assert (
+        converted_key("train/demand/part-0000.csv")
+        == "converted/train/demand/part-0000.parquet"
+    )
+
+
+def test_convert_current(s3, mocker):
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(Bucket="testbucket", Key="train/demand/part-0000.csv", Body=b"")
+    s3.put_object(Bucket="testbucket", Key="train/demand_SUCCESS", Body=b"")
+    dataset_file = DatasetFile("train/demand/", "testbucket")
+    etag = dataset_file.shards[0]["ETag"]
+
+    # the shard is already converted, and a shard that no longer exists was converted
+    s3.put_object(
+        Bucket="testbucket",
+        Key="converted/train/demand/part-0000.parquet",
+        Body=b"",
+        Metadata={SOURCE_ETAG_METADATA: etag},
+    )
+    s3.put_object(
+        Bucket="testbucket", Key="converted/train/demand/part-0001.parquet", Body=b""
+    )
+
+    upload = mocker.patch("shared.Dataset.parquet_converter.MultipartUpload")
+    assert (
+        ParquetConverter(s3, SCHEMA).convert(dataset_file) == "converted/train/demand/"
+    )
+    upload.assert_not_called()
+    keys = [
+        obj["Key"]
+        for obj in s3.list_objects_v2(Bucket="testbucket", Prefix="converted/")[
+            "Contents"
+        ]
+    ]
+    assert keys == ["converted/train/demand/part-0000.parquet"]
+
+
+def test_convert(s3):
+    # moto stores the aws-chunked encoding of parts uploaded with checksums
+    s3 = boto3.client("s3", config=Config(request_checksum_calculation="when_required"))
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(
+        Bucket="testbucket",
+        Key="train/demand.csv",
+        Body=b"item_1,2020-01-01,1.5\n,2020-01-01,1\n\nitem_2,2020-01-02,\n",
+    )
+
+    key = ParquetConverter(s3, SCHEMA).convert(
+        DatasetFile("train/demand.csv", "testbucket")
+    )
+    body = s3.get_object(Bucket="testbucket", Key=key)["Body"].read()
+    table = pa_parquet.read_table(pa.BufferReader(body))
+    assert table.column_names == ["item_id", "timestamp", "demand"]
+    assert table.column("item_id").to_pylist() == ["item_1", "item_2"]
+    assert table.column("demand").to_pylist() == [1.5, None]
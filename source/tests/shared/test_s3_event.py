@@ -87,3 +87,27 @@ def test_s3_event_handler_id(event_no_key):
     id_matcher = re.compile(f"test-key_target_time_series_[0-9a-f]+")
     id = s3_handler.event_id
     assert id_matcher.match(id)
+
+
+def test_s3_event_multipart(event_no_key):
+    event_no_key["Records"][0]["s3"]["object"] = {"key": "train/demand_SUCCESS"}
+    evt = Event(event_no_key)
+    assert evt.key == "train/demand/"
+    assert evt.file.multipart
+    assert not evt.shard
+    assert not evt.stray_marker
+    assert evt.event_id.startswith("demand_target_time_series_")
+
+    event_no_key["Records"][0]["s3"]["object"] = {"key": "train/demand/part-0000.csv"}
+    assert Event(event_no_key).shard
+
+    event_no_key["Records"][0]["s3"]["object"] = {"key": "train/demand/2020/data.csv"}
+    assert not Event(event_no_key).shard
+
+
+@pytest.mark.parametrize("key", ["train/_SUCCESS", "train/demand/_SUCCESS"])
+def test_s3_event_stray_marker(event_no_key, key):
+    event_no_key["Records"][0]["s3"]["object"] = {"key": key}
+    evt = Event(event_no_key)
+    assert evt.stray_marker
+    assert not evt.shard
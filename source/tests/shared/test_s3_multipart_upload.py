@@ -0,0 +1,68 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import boto3
+import pytest
+from botocore.config import Config
+
+from shared.s3.multipart_upload import (
+    MultipartUpload,
+    SOURCE_ETAG_METADATA,
+    source_etag,
+)
+
+
+def test_multipart_upload(s3):
+    # upload parts without aws-chunked checksums, which the S3 mock does not decode
+    s3 = boto3.client("s3", config=Config(request_checksum_calculation="when_required"))
+    s3.create_bucket(Bucket="testbucket")
+    part_size = 5 * 1024 * 1024
+    data = b"0123456789abcdef" * (part_size // 8) + b"last part"
+
+    with MultipartUpload(
+        s3, "testbucket", "converted/data", part_size, {SOURCE_ETAG_METADATA: "x"}
+    ) as upload:
+        for start in range(0, len(data), 1000000):
+            upload.write(data[start : start + 1000000])
+
+    assert len(upload.parts) == 3
+    obj = s3.get_object(Bucket="testbucket", Key="converted/data")
+    assert obj["Body"].read() == data
+    assert obj["Metadata"] == {SOURCE_ETAG_METADATA: "x"}
+
+
+def test_multipart_upload_abort(s3):
+    s3.create_bucket(Bucket="testbucket")
+
+    with pytest.raises(ValueError):
+        with MultipartUpload(s3, "testbucket", "converted/data") as upload:
+            upload.write(b"partial")
+            raise ValueError("conversion failed")
+
+    assert "Contents" not in s3.list_objects_v2(Bucket="testbucket")
+    assert not s3.list_multipart_uploads(Bucket="testbucket").get("Uploads")
+
+
+def test_source_etag(s3):
+    s3.create_bucket(Bucket="testbucket")
+    s3.put_object(Bucket="testbucket", Key="plain", Body=b"")
+    s3.put_object(
+        Bucket="testbucket",
+        Key="derived",
+        Body=b"",
+        Metadata={SOURCE_ETAG_METADATA: '"abc"'},
+    )
+
+    assert source_etag(s3, "testbucket", "derived") == '"abc"'
+    assert source_etag(s3, "testbucket", "plain") is None
+    assert source_etag(s3, "testbucket", "missing") is None
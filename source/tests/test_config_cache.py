@@ -0,0 +1,241 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+
+import json
+
+import pytest
+import yaml
+from moto import mock_sts
+
+from shared.config import Config, ConfigNotFound, DEFAULT_S3_KEY
+from shared.config_cache import (
+    CompiledConfig,
+    ConfigCache,
+    ConfigCacheEntry,
+    ConfigSnapshots,
+    COMPILED_VERSION,
+)
+
+
+@mock_sts
+def test_from_s3_cached(s3_valid_config, configuration_data, mocker):
+    config = Config.from_s3(bucket="testbucket")
+    parse = mocker.spy(Config, "_parse")
+
+    # unchanged configuration files are not downloaded or parsed again
+    cached = Config.from_s3(bucket="testbucket")
+    assert cached.config == configuration_data
+    assert cached.config is config.config
+    assert parse.call_count == 0
+
+
+@mock_sts
+def test_from_s3_changed(s3_valid_config, configuration_data):
+    Config.from_s3(bucket="testbucket")
+
+    configuration_data["Default"]["DatasetGroup"]["Domain"] = "WEB_TRAFFIC"
+    s3_valid_config.put_object(
+        Bucket="testbucket", Key=DEFAULT_S3_KEY, Body=json.dumps(configuration_data)
+    )
+
+    config = Config.from_s3(bucket="testbucket")
+    assert config.config["Default"]["DatasetGroup"]["Domain"] == "WEB_TRAFFIC"
+
+
+@mock_sts
+def test_from_s3_deleted(s3_valid_config, config_cache):
+    Config.from_s3(bucket="testbucket")
+    s3_valid_config.delete_object(Bucket="testbucket", Key=DEFAULT_S3_KEY)
+
+    with pytest.raises(ConfigNotFound):
+        Config.from_s3(bucket="testbucket")
+    assert not config_cache.get("testbucket", DEFAULT_S3_KEY)
+
+
+@mock_sts
+def test_validate_cached(s3_valid_config, mocker):
+    assert Config.from_s3(bucket="testbucket").validate() == []
+
+    subkeys = mocker.spy(Config, "_valid_subkeys")
+    assert Config.from_s3(bucket="testbucket").validate() == []
+    assert subkeys.call_count == 0
+
+
+def test_config_cache_file(tmp_path):
+    cache = ConfigCache(path=str(tmp_path))
+    cache.put("bucket", "key", ConfigCacheEntry('"etag"', {"Default": {}}, ["error"]))
+
+    # a new process in the same container reads the cached entry from its file
+    entry = ConfigCache(path=str(tmp_path)).get("bucket", "key")
+    assert entry.etag == '"etag"'
+    assert entry.config == {"Default": {}}
+    assert entry.errors == ["error"]
+
+    cache.invalidate("bucket", "key")
+    assert not ConfigCache(path=str(tmp_path)).get("bucket", "key")
+
+
+def test_config_cache_corrupt(tmp_path):
+    cache = ConfigCache(path=str(tmp_path))
+    cache.put("bucket", "key", ConfigCacheEntry('"etag"', {"Default": {}}))
+    with open(cache._file("bucket", "key"), "w") as f:
+        f.write("{")
+
+    assert not ConfigCache(path=str(tmp_path)).get("bucket", "key")
+
+
+@mock_sts
+def test_snapshot(s3_valid_config, configuration_data, mocker):
+    config = Config.from_s3(bucket="testbucket")
+    ref = config.snapshot("testbucket")
+    assert ref.startswith("s3://testbucket/config-snapshots/")
+
+    # equal configurations have equal snapshots
+    assert config.snapshot("testbucket") == ref
+
+    # snapshots are fetched once per container
+    snapshots = ConfigSnapshots()
+    cli = mocker.MagicMock(wraps=s3_valid_config)
+    assert snapshots.get(cli, ref) == configuration_data
+    assert snapshots.get(cli, ref) == configuration_data
+    assert cli.get_object.call_count == 1
+
+
+@mock_sts
+def test_from_sfn_snapshot(s3_valid_config, configuration_data):
+    ref = Config.from_s3(bucket="testbucket").snapshot("testbucket")
+
+    config = Config.from_sfn(event={"config_ref": ref})
+    assert config.config == configuration_data
+
+
+def test_snapshot_tampered(s3_valid_config):
+    snapshots = ConfigSnapshots()
+    ref = snapshots.put(s3_valid_config, "testbucket", {"Default": {}})
+    key = ref[len("s3://testbucket/") :]
+    s3_valid_config.put_object(Bucket="testbucket", Key=key, Body=b'{"Default": 1}')
+
+    with pytest.raises(ValueError):
+        ConfigSnapshots().get(s3_valid_config, ref)
+
+
+@mock_sts
+def test_from_s3_prefix(s3_valid_config, configuration_data):
+    config = Config.from_s3(bucket="testbucket", prefix="Override")
+
+    # only the Default config and the config for the prefix are loaded
+    assert config.config == {
+        "Default": configuration_data["Default"],
+        "Override": configuration_data["Override"],
+    }
+    assert not config.validate()
+
+
+@mock_sts
+def test_from_s3_prefix_shard(s3_valid_config, configuration_data):
+    s3_valid_config.put_object(
+        Bucket="testbucket",
+        Key="config/Sharded.yaml",
+        Body=yaml.safe_dump(configuration_data["Override"]),
+    )
+
+    config = Config.from_s3(bucket="testbucket", prefix="Sharded")
+    assert config.config == {
+        "Default": configuration_data["Default"],
+        "Sharded": configuration_data["Override"],
+    }
+
+    # prefixes without a config file of their own use Default
+    config = Config.from_s3(bucket="testbucket", prefix="Unknown")
+    assert config.config == {"Default": configuration_data["Default"]}
+
+
+@mock_sts
+def test_validate_prefix_cached(s3_valid_config, configuration_data, mocker):
+    assert Config.from_s3(bucket="testbucket", prefix="Override").validate() == []
+
+    subkeys = mocker.spy(Config, "_valid_subkeys")
+    assert Config.from_s3(bucket="testbucket", prefix="Override").validate() == []
+    assert subkeys.call_count == 0
+
+    # a new config file for the prefix is validated again
+    configuration_data["Override"]["Datasets"][0]["ImportFormat"] = "JSON"
+    s3_valid_config.put_object(
+        Bucket="testbucket",
+        Key="config/Override.yaml",
+        Body=yaml.safe_dump(configuration_data["Override"]),
+    )
+    assert Config.from_s3(bucket="testbucket", prefix="Override").validate()
+    assert subkeys.call_count > 0
+
+
+@mock_sts
+def test_from_s3_prefix_shard_malformed(s3_valid_config):
+    s3_valid_config.put_object(
+        Bucket="testbucket", Key="config/Sharded.yaml", Body="- not a dict"
+    )
+
+    with pytest.raises(ValueError) as excinfo:
+        Config.from_s3(bucket="testbucket", prefix="Sharded")
+    assert "config/Sharded.yaml" in str(excinfo.value)
+
+
+@mock_sts
+def test_from_s3_compiled(s3_valid_config, configuration_data, mocker):
+    Config.from_s3(bucket="testbucket")
+    compiled = s3_valid_config.get_object(
+        Bucket="testbucket", Key=CompiledConfig.key(DEFAULT_S3_KEY)
+    )
+    assert json.loads(compiled["Body"].read())["Version"] == COMPILED_VERSION
+
+    # a cold container loads the compiled configuration instead of parsing the YAML
+    mocker.patch("shared.config_cache.config_cache_global", ConfigCache())
+    parse = mocker.spy(Config, "_parse")
+    config = Config.from_s3(bucket="testbucket")
+    assert config.config == configuration_data
+    assert parse.call_count == 0
+
+
+@mock_sts
+def test_from_s3_compiled_stale(s3_valid_config, configuration_data, mocker):
+    Config.from_s3(bucket="testbucket")
+
+    configuration_data["Default"]["DatasetGroup"]["Domain"] = "WEB_TRAFFIC"
+    s3_valid_config.put_object(
+        Bucket="testbucket", Key=DEFAULT_S3_KEY, Body=json.dumps(configuration_data)
+    )
+
+    # the compiled configuration no longer matches the YAML ETag, so the YAML is parsed (and compiled) again
+    mocker.patch("shared.config_cache.config_cache_global", ConfigCache())
+    parse = mocker.spy(Config, "_parse")
+    config = Config.from_s3(bucket="testbucket")
+    assert config.config["Default"]["DatasetGroup"]["Domain"] == "WEB_TRAFFIC"
+    assert parse.call_count == 1
+
+    mocker.patch("shared.config_cache.config_cache_global", ConfigCache())
+    config = Config.from_s3(bucket="testbucket")
+    assert config.config["Default"]["DatasetGroup"]["Domain"] == "WEB_TRAFFIC"
+    assert parse.call_count == 1
+
+
+def test_compiled_config_version():
+    body = CompiledConfig.serialize('"etag"', {"Default": {}})
+    assert CompiledConfig.deserialize(body, '"etag"') == {"Default": {}}
+    assert CompiledConfig.deserialize(body, '"other"') is None
+    assert CompiledConfig.deserialize(b"{", '"etag"') is None
+
+    outdated = json.dumps(
+        {"Version": COMPILED_VERSION - 1, "SourceETag": '"etag"', "Config": {}}
+    )
+    assert CompiledConfig.deserialize(outdated.encode("utf-8"), '"etag"') is None
@@ -26,6 +26,7 @@ from shared.Dataset.dataset_file import DatasetFile
 from shared.Dataset.dataset_type import DatasetType
 from shared.config import Config, ConfigNotFound
 from shared.status import Status
+from shared.validation import ModelValidator, ValidationCache
 
 
 @pytest.fixture
@@ -297,6 +298,41 @@ def test_config_valid(configuration_data):
     assert not errors
 
 
+@mock_sts
+def test_config_import_format(configuration_data):
+    configuration_data["Override"]["Datasets"][0]["ImportFormat"] = "PARQUET"
+    config = Config()
+    config.config = copy.deepcopy(configuration_data)
+    assert not config.validate()
+
+    configuration_data["Override"]["Datasets"][0]["ImportFormat"] = "JSON"
+    config = Config()
+    config.config = configuration_data
+    assert config.validate() == [
+        "configuration issue for Override.Datasets: ImportFormat must be one of CSV, PARQUET"
+    ]
+
+
+def test_config_aggregation(configuration_data):
+    config = Config()
+    config.config = copy.deepcopy(configuration_data)
+    dataset_file = DatasetFile("Override.csv", "some_bucket")
+    assert config.aggregation(dataset_file) is None
+
+    configuration_data["Override"]["Datasets"][0]["Aggregation"] = {"demand": "mean"}
+    config = Config()
+    config.config = copy.deepcopy(configuration_data)
+    assert not config.validate()
+    assert config.aggregation(dataset_file) == {"demand": "mean"}
+
+    configuration_data["Override"]["Datasets"][0]["Aggregation"] = {"demand": "median"}
+    config = Config()
+    config.config = configuration_data
+    assert config.validate() == [
+        "configuration issue for Override.Datasets: Aggregation must map columns to one of sum, mean, min, max, first, last, count"
+    ]
+
+
 def test_config_validation_doesnt_mutate_config(configuration_data):
     config = Config()
     config.config = configuration_data
@@ -305,3 +341,70 @@ def test_config_validation_doesnt_mutate_config(configuration_data):
     config.validate()
 
     assert config.config == config_copy
+
+
+def test_config_item_doesnt_mutate_config(configuration_data):
+    config = Config()
+    config.config = configuration_data
+    config_copy = copy.deepcopy(configuration_data)
+
+    dataset_file = DatasetFile("Override.csv", "some_bucket")
+    for data_type in DatasetType:
+        dataset_file.data_type = data_type
+        config.config_item(dataset_file, "Dataset.Schema")["Attributes"].clear()
+
+    assert config.config == config_copy
+    assert not config.validate()
+
+
+def test_config_item_by_dataset_type(configuration_data):
+    config = Config()
+    config.config = configuration_data
+
+    dataset_file = DatasetFile("Override.csv", "some_bucket")
+    assert config.config_item(dataset_file, "Dataset.DataFrequency") == "15min"
+    assert config.config_item(dataset_file, "DatasetGroup.Domain") == "WEB_TRAFFIC"
+
+    dataset_file.data_type = DatasetType.RELATED_TIME_SERIES
+    assert config.config_item(dataset_file, "Dataset.Domain") == "WEB_TRAFFIC"
+    dataset_file.data_type = DatasetType.ITEM_METADATA
+    assert config.config_item(dataset_file, "Dataset.Domain") == "RETAIL"
+
+    # item metadata has no data frequency, in Override or in Default
+    with pytest.raises(ValueError):
+        config.config_item(dataset_file, "Dataset.DataFrequency")
+
+
+def test_config_item_reindexes(configuration_data):
+    config = Config()
+    config.config = configuration_data
+    dataset_file = DatasetFile("Override.csv", "some_bucket")
+    assert config.config_item(dataset_file, "DatasetGroup.Domain") == "WEB_TRAFFIC"
+
+    config.config = {"Default": configuration_data["Default"]}
+    assert config.config_item(dataset_file, "DatasetGroup.Domain") == "RETAIL"
+
+
+def test_config_validation_incremental(configuration_data, mocker):
+    validator = ModelValidator("forecast", cache=ValidationCache())
+    mocker.patch("shared.validation.validation_forecast_validator", validator)
+    subkeys = mocker.spy(Config, "_valid_subkeys")
+
+    config = Config()
+    config.config = configuration_data
+    errors = config.validate()
+    sections = subkeys.call_count
+
+    # unchanged sections are not validated again
+    subkeys.reset_mock()
+    assert config.validate() == errors
+    assert subkeys.call_count == 0
+
+    # only the changed section is validated
+    changed = copy.deepcopy(configuration_data)
+    changed["Override"]["Predictor"]["ForecastHorizon"] = "invalid"
+    config.config = changed
+    changed_errors = config.validate()
+    assert subkeys.call_count == 1
+    assert len(changed_errors) == len(errors) + 1
+    assert sections == len(configuration_data) - 1  # __Testing__ is not validated
@@ -13,8 +13,10 @@
 
 import os
 
+import boto3
 import pytest
 from botocore.exceptions import ParamValidationError
+from botocore.stub import Stubber
 from moto import mock_sts
 
 from shared.helpers import (
@@ -25,11 +27,20 @@ from shared.helpers import (
     get_sns_client,
     ResourceFailed,
     ResourceInvalid,
-    ResourcePending,
+    ResourceTimedOut,
     EnvironmentVariableError,
     get_s3_client,
     get_sfn_client,
     InputValidator,
+    ForecastClient,
+    resource_state_cache,
+    AccountResolver,
+    ClientFactory,
+    DescribeManyError,
+    pending_result,
+    POLLING_DEFAULT_SCHEDULE,
+    POLLING_MAX_POLLS,
+    POLLING_TIMEOUTS,
 )
 from shared.status import Status
 
@@ -51,8 +62,77 @@ def test_step_function_step_failed(wrapped_function):
 
 def test_step_function_step_pending(wrapped_function):
     for status in [Status.UPDATE_PENDING, Status.UPDATE_PENDING, Status.CREATE_PENDING]:
-        with pytest.raises(ResourcePending):
-            wrapped_function(status, None)
+        result = wrapped_function(status, None)
+        assert result["Pending"]
+        assert result["Step"] == "func_to_wrap"
+        assert result["Status"] == str(status)
+        assert result["Output"] == "arn:"
+        assert result["Polls"] == 1
+        assert result["WaitSeconds"] == POLLING_DEFAULT_SCHEDULE[0]
+
+
+def test_pending_result_backoff():
+    event = {"bucket": "some_bucket"}
+    result = pending_result(
+        "createpredictor", Status.CREATE_IN_PROGRESS, "arn:", event, now=1000
+    )
+    assert result["StartedAt"] == 1000
+    assert result["WaitSeconds"] == 300
+
+    # the state machine passes the pending result back to the step at its ResultPath
+    event["PredictorArn"] = result
+    result = pending_result(
+        "createpredictor", Status.CREATE_IN_PROGRESS, "arn:", event, now=1000 + 7200
+    )
+    assert result["StartedAt"] == 1000
+    assert result["Polls"] == 2
+    assert result["WaitSeconds"] == 1800
+
+
+def test_pending_result_other_step():
+    event = {
+        "DatasetArn": pending_result(
+            "createdataset", Status.CREATE_PENDING, "arn:", {}, now=0
+        )
+    }
+    result = pending_result(
+        "createdatasetimportjob", Status.CREATE_PENDING, "arn:", event, now=100
+    )
+    assert result["StartedAt"] == 100
+    assert result["Polls"] == 1
+    assert result["WaitSeconds"] == 60
+
+
+def test_pending_result_timeout():
+    timeout = POLLING_TIMEOUTS["createdataset"]
+    event = {
+        "DatasetArn": pending_result(
+            "createdataset", Status.CREATE_PENDING, "arn:", {}, now=0
+        )
+    }
+    result = pending_result(
+        "createdataset", Status.CREATE_PENDING, "arn:", event, now=timeout
+    )
+    assert result["Polls"] == 2
+
+    with pytest.raises(ResourceTimedOut) as excinfo:
+        pending_result(
+            "createdataset", Status.CREATE_PENDING, "arn:", event, now=timeout + 1
+        )
+    assert "after 3601 seconds and 1 status checks" in str(excinfo.value)
+
+
+def test_pending_result_max_polls():
+    event = {
+        "DatasetArn": {
+            "Pending": True,
+            "Step": "createdataset",
+            "StartedAt": 0,
+            "Polls": POLLING_MAX_POLLS,
+        }
+    }
+    with pytest.raises(ResourceTimedOut):
+        pending_result("createdataset", Status.CREATE_PENDING, "arn:", event, now=10)
 
 
 def test_step_function_step_finalized(wrapped_function):
@@ -77,6 +157,72 @@ def test_with_account_id():
     assert get_account_id() == "abcdefghijkl"
 
 
+class LambdaContext:
+    invoked_function_arn = (
+        "arn:aws:lambda:eu-west-1:210987654321:function:CreateDataset-abc:live"
+    )
+
+
+def test_account_resolver_context(mocker):
+    sts = mocker.patch("shared.helpers.get_sts_client")
+
+    resolver = AccountResolver()
+    resolver.from_context(LambdaContext())
+
+    assert resolver.account_id == "210987654321"
+    assert resolver.region == "eu-west-1"
+    sts.assert_not_called()
+
+
+def test_account_resolver_bad_context(mocker):
+    sts = mocker.patch("shared.helpers.get_sts_client")
+    sts().get_caller_identity.return_value = {"Account": "abcdefghijkl"}
+
+    resolver = AccountResolver()
+    resolver.from_context(None)
+
+    class BadContext:
+        invoked_function_arn = "arn:aws:lambda"
+
+    resolver.from_context(BadContext())
+
+    assert resolver.region == "us-east-1"
+    assert resolver.account_id == "abcdefghijkl"
+
+
+def test_account_resolver_sts_once(mocker):
+    sts = mocker.patch("shared.helpers.get_sts_client")
+    sts().get_caller_identity.return_value = {"Account": "abcdefghijkl"}
+
+    resolver = AccountResolver()
+    for _ in range(3):
+        assert resolver.account_id == "abcdefghijkl"
+    sts().get_caller_identity.assert_called_once()
+
+
+def test_account_resolver_injected(mocker):
+    sts = mocker.patch("shared.helpers.get_sts_client")
+    mocker.patch(
+        "shared.helpers.account_resolver",
+        AccountResolver(account_id="111111111111", region="ap-south-1"),
+    )
+
+    client = ForecastClient(
+        "dataset_group", DatasetGroupName="Testing123", Domain="RETAIL"
+    )
+    assert client.account_id == "111111111111"
+    assert client.region == "ap-south-1"
+    sts.assert_not_called()
+
+
+def test_account_resolver_step(mocker, wrapped_function):
+    resolver = AccountResolver()
+    mocker.patch("shared.helpers.account_resolver", resolver)
+
+    wrapped_function(Status.ACTIVE, LambdaContext())
+    assert resolver.account_id == "210987654321"
+
+
 def test_forecast_getter():
     cli = get_sns_client()
     assert "https://sns.us-east-1.amazonaws.com" in cli.meta.endpoint_url
@@ -97,6 +243,64 @@ def test_sfn_getter():
     assert "https://states.us-east-1.amazonaws.com" in cli.meta.endpoint_url
 
 
+def test_client_factory_defaults():
+    factory = ClientFactory()
+    cli = factory.client("forecast")
+
+    assert factory.client("forecast") is cli
+    assert cli.meta.config.retries["mode"] == "adaptive"
+    assert cli.meta.config.max_pool_connections == 20
+    assert cli.meta.config.tcp_keepalive
+    assert cli.meta.region_name == "us-east-1"
+
+
+def test_client_factory_settings(monkeypatch):
+    monkeypatch.setenv("CLIENT_RETRY_MODE", "standard")
+    monkeypatch.setenv("CLIENT_MAX_ATTEMPTS", "3")
+    monkeypatch.setenv("CLIENT_MAX_POOL_CONNECTIONS", "50")
+    monkeypatch.setenv("CLIENT_CONNECT_TIMEOUT", "2")
+    monkeypatch.setenv("CLIENT_READ_TIMEOUT", "7")
+    monkeypatch.setenv("CLIENT_TCP_KEEPALIVE", "false")
+
+    config = ClientFactory().client("s3").meta.config
+    assert config.retries == {"mode": "standard", "total_max_attempts": 3}
+    assert config.max_pool_connections == 50
+    assert config.connect_timeout == 2
+    assert config.read_timeout == 7
+    assert not config.tcp_keepalive
+
+
+def test_client_factory_warm():
+    factory = ClientFactory()
+    factory.warm("forecast", "s3", "stepfunctions")
+
+    assert set(factory._clients.keys()) == {"forecast", "s3", "stepfunctions"}
+    assert factory._session is not None
+
+
+def test_client_factory_warm_no_region(monkeypatch):
+    monkeypatch.delenv("AWS_REGION")
+
+    factory = ClientFactory()
+    factory.warm("forecast")
+    assert not factory._clients
+
+
+def test_client_factory_warm_skips_failed(monkeypatch):
+    factory = ClientFactory()
+    client = factory.client
+
+    def warm_client(service_name):
+        if service_name == "forecast":
+            raise EnvironmentVariableError("Missing FORECAST environment variable.")
+        return client(service_name)
+
+    # a service that can't be warmed doesn't leave the services after it cold
+    monkeypatch.setattr(factory, "client", warm_client)
+    factory.warm("forecast", "s3")
+    assert set(factory._clients.keys()) == {"s3"}
+
+
 def test_input_validator_invalid():
     iv = InputValidator("create_dataset_group")
 
@@ -109,3 +313,131 @@ def test_input_validator_valid():
     iv = InputValidator(
         "create_dataset_group", Domain="RETAIL", DatasetGroupName="Testing123"
     )
+
+
+@pytest.fixture
+def forecast_stub():
+    client = boto3.client("forecast", region_name="us-east-1")
+    with Stubber(client) as stubber:
+        yield stubber
+
+
+@pytest.fixture
+def forecast_client(forecast_stub):
+    with mock_sts():
+        client = ForecastClient(
+            "dataset_group", DatasetGroupName="Testing123", Domain="RETAIL"
+        )
+    client.cli = forecast_stub.client
+    return client
+
+
+def test_resource_state_cache_disabled(forecast_client, forecast_stub):
+    forecast_stub.add_response("describe_dataset_group", {"Status": "ACTIVE"})
+    forecast_stub.add_response("describe_dataset_group", {"Status": "UPDATE_PENDING"})
+
+    assert not resource_state_cache.enabled
+    cli = forecast_client.cli
+    assert cli.describe_dataset_group(DatasetGroupArn="arn:")["Status"] == "ACTIVE"
+    status = cli.describe_dataset_group(DatasetGroupArn="arn:")["Status"]
+    assert status == "UPDATE_PENDING"
+    forecast_stub.assert_no_pending_responses()
+
+
+def test_resource_state_cache_memoizes(forecast_client, forecast_stub):
+    forecast_stub.add_response("describe_dataset_group", {"Status": "ACTIVE"})
+    forecast_stub.add_response("list_predictors", {"Predictors": []})
+
+    with resource_state_cache.scope():
+        for _ in range(3):
+            info = forecast_client.cli.describe_dataset_group(DatasetGroupArn="arn:")
+            assert info["Status"] == "ACTIVE"
+
+            paginator = forecast_client.cli.get_paginator("list_predictors")
+            pages = paginator.paginate(Filters=[])
+            assert [page["Predictors"] for page in pages] == [[]]
+
+    forecast_stub.assert_no_pending_responses()
+    assert not resource_state_cache.enabled
+
+
+def test_resource_state_cache_invalidates(forecast_client, forecast_stub):
+    forecast_stub.add_response("describe_dataset_group", {"Status": "ACTIVE"})
+    forecast_stub.add_response("update_dataset_group", {})
+    forecast_stub.add_response("describe_dataset_group", {"Status": "UPDATE_PENDING"})
+    forecast_stub.add_response("describe_dataset_group", {"Status": "ACTIVE"})
+
+    with resource_state_cache.scope():
+        cli = forecast_client.cli
+        assert cli.describe_dataset_group(DatasetGroupArn="arn:")["Status"] == "ACTIVE"
+
+        # update calls invalidate the cache
+        cli.update_dataset_group(DatasetGroupArn="arn:", DatasetArns=[])
+        status = cli.describe_dataset_group(DatasetGroupArn="arn:")["Status"]
+        assert status == "UPDATE_PENDING"
+
+        # as does an explicit refresh
+        forecast_client.refresh()
+        assert cli.describe_dataset_group(DatasetGroupArn="arn:")["Status"] == "ACTIVE"
+
+    forecast_stub.assert_no_pending_responses()
+
+
+def test_resource_state_cache_scoped_to_step(forecast_client, forecast_stub):
+    forecast_stub.add_response("describe_dataset_group", {"Status": "ACTIVE"})
+    forecast_stub.add_response("describe_dataset_group", {"Status": "ACTIVE"})
+
+    @step_function_step
+    def step(event, context):
+        for _ in range(2):
+            info = forecast_client.cli.describe_dataset_group(DatasetGroupArn="arn:")
+        return Status[info["Status"]], "arn:"
+
+    # each invocation starts with an empty cache
+    assert step(None, None) == "arn:"
+    assert step(None, None) == "arn:"
+    forecast_stub.assert_no_pending_responses()
+
+
+def test_describe_many(forecast_client, mocker):
+    cli = mocker.MagicMock()
+    cli.describe_dataset.side_effect = lambda DatasetArn: {"DatasetArn": DatasetArn}
+    forecast_client.cli = cli
+
+    arns = ["arn:1", "arn:2", "arn:1", "arn:3"]
+    results = forecast_client.describe_many("describe_dataset", arns)
+
+    # duplicates are described once, results are in the order given
+    assert [result["DatasetArn"] for result in results] == ["arn:1", "arn:2", "arn:3"]
+    assert cli.describe_dataset.call_count == 3
+
+
+def test_describe_many_arn_key(forecast_client, forecast_stub):
+    forecast_stub.add_response(
+        "describe_dataset_import_job",
+        {"Status": "ACTIVE"},
+        {"DatasetImportJobArn": "arn:1"},
+    )
+
+    results = forecast_client.describe_many("describe_dataset_import_job", ["arn:1"])
+    assert results == [{"Status": "ACTIVE"}]
+    assert forecast_client.describe_many("describe_dataset", []) == []
+
+
+def test_describe_many_errors(forecast_client, mocker):
+    def describe_dataset(DatasetArn):
+        if DatasetArn == "arn:2":
+            raise ValueError("not found")
+        return {"DatasetArn": DatasetArn}
+
+    cli = mocker.MagicMock()
+    cli.describe_dataset.side_effect = describe_dataset
+    forecast_client.cli = cli
+
+    with pytest.raises(DescribeManyError) as excinfo:
+        forecast_client.describe_many("describe_dataset", ["arn:1", "arn:2", "arn:3"])
+
+    # every describe is attempted, and the errors are collected per ARN
+    assert list(excinfo.value.errors.keys()) == ["arn:2"]
+    assert list(excinfo.value.results.keys()) == ["arn:1", "arn:3"]
+    assert cli.describe_dataset.call_count == 3
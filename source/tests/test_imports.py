@@ -0,0 +1,25 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+
+import pytest
+
+from benchmarks.importtime import BUDGETS, DEFERRED_MODULES, import_times
+
+
+@pytest.mark.parametrize("handler", BUDGETS.keys())
+def test_handler_defers_imports(handler):
+    modules = import_times(handler)
+
+    assert handler in modules
+    assert [name for name in DEFERRED_MODULES if name in modules] == []
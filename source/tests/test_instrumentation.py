@@ -0,0 +1,124 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import json
+
+import boto3
+import pytest
+from botocore.hooks import HierarchicalEmitter
+from botocore.stub import Stubber
+
+from shared.helpers import ClientFactory
+from shared.instrumentation import ApiCallRecorder, api_call_recorder, instrumented
+
+
+@pytest.fixture
+def recorder():
+    return ApiCallRecorder()
+
+
+@pytest.fixture
+def forecast_stub(recorder):
+    client = boto3.client("forecast", region_name="us-east-1")
+    recorder.register(client)
+    with Stubber(client) as stubber:
+        yield stubber
+
+
+def emitted(capsys):
+    lines = capsys.readouterr().out.strip().splitlines()
+    assert len(lines) == 1
+    return json.loads(lines[0])
+
+
+def test_records_only_in_scope(recorder, forecast_stub):
+    forecast_stub.add_response("describe_dataset", {"Status": "ACTIVE"})
+    forecast_stub.client.describe_dataset(DatasetArn="arn:")
+    assert not recorder.operations
+
+
+def test_records_calls(recorder, forecast_stub, capsys):
+    forecast_stub.add_response("describe_dataset", {"Status": "ACTIVE"})
+    forecast_stub.add_response("describe_dataset", {"Status": "ACTIVE"})
+    forecast_stub.add_client_error("describe_dataset_group", "ThrottlingException")
+
+    with recorder.scope("handler"):
+        for _ in range(2):
+            forecast_stub.client.describe_dataset(DatasetArn="arn:")
+        with pytest.raises(forecast_stub.client.exceptions.ClientError):
+            forecast_stub.client.describe_dataset_group(DatasetGroupArn="arn:")
+
+        describe = recorder.operations["forecast.DescribeDataset"]
+        assert describe.calls == 2
+        assert describe.errors == 0
+        assert describe.request_bytes > 0
+        assert recorder.operations["forecast.DescribeDatasetGroup"].errors == 1
+
+    document = emitted(capsys)
+    assert document["Handler"] == "handler"
+    assert document["Calls"] == 3
+    assert document["forecast.DescribeDataset.Calls"] == 2
+    assert document["ApiCalls"]["forecast.DescribeDatasetGroup"]["Errors"] == 1
+
+    directive = document["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Dimensions"] == [["Handler"]]
+    for metric in directive["Metrics"]:
+        assert metric["Name"] in document
+
+    # the recorder is reset after each scope
+    assert not recorder.operations
+
+
+def test_records_throttles(recorder, mocker):
+    # use an emitter without the botocore retry handlers
+    client = mocker.MagicMock()
+    client.meta.events = HierarchicalEmitter()
+    recorder.register(client)
+
+    model = boto3.client("forecast", region_name="us-east-1").meta.service_model
+    operation = model.operation_model("ListPredictors")
+
+    with recorder.scope("handler"):
+        for code in ["ThrottlingException", "ThrottlingException", "Other"]:
+            client.meta.events.emit(
+                "needs-retry.forecast.ListPredictors",
+                response=(None, {"Error": {"Code": code}}),
+                operation=operation,
+                attempts=1,
+            )
+
+        assert recorder.operations["forecast.ListPredictors"].throttles == 2
+
+
+def test_client_factory_registers():
+    factory = ClientFactory()
+    cli = factory.client("forecast")
+
+    with Stubber(cli) as stubber:
+        stubber.add_response("list_predictors", {"Predictors": []})
+        with api_call_recorder.scope("handler"):
+            cli.list_predictors()
+            assert api_call_recorder.operations["forecast.ListPredictors"].calls == 1
+
+
+def test_instrumented(capsys):
+    @instrumented
+    def handler(event, context):
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        handler({}, None)
+
+    document = emitted(capsys)
+    assert document["Handler"] == "handler"
+    assert document["Calls"] == 0
@@ -0,0 +1,235 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+import boto3
+import pytest
+from botocore.hooks import HierarchicalEmitter
+from moto import mock_dynamodb
+
+from shared.helpers import ClientFactory
+from shared.rate_limiter import DynamoDBTokenBucket, TokenBucket
+
+TABLE_NAME = "rate-limits"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def budgets():
+    return {"list_predictors": {"rate": 2, "burst": 4}}
+
+
+@pytest.fixture
+def dynamodb():
+    with mock_dynamodb():
+        cli = boto3.client("dynamodb", region_name="us-east-1")
+        cli.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[{"AttributeName": "operation", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "operation", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield cli
+
+
+def bucket_for(cls, clock, budgets, **kwargs):
+    return cls(budgets=budgets, max_wait=10, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_budgets(budgets, monkeypatch):
+    assert TokenBucket(budgets=budgets).budget("list_predictors") == (2.0, 4.0)
+    assert TokenBucket(budgets=budgets).budget("describe_dataset") == (10.0, 20.0)
+
+    monkeypatch.setenv("RATE_LIMIT_BUDGETS", '{"describe_dataset": {"rate": 1}}')
+    assert TokenBucket().budget("describe_dataset") == (1.0, 20.0)
+
+
+def test_local_bucket(clock, budgets):
+    bucket = bucket_for(TokenBucket, clock, budgets)
+
+    # the burst is available immediately
+    for _ in range(4):
+        assert bucket.acquire("list_predictors")
+    assert not clock.sleeps
+
+    # then tokens refill at the budgeted rate
+    assert bucket.acquire("list_predictors")
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+    # other operations have their own bucket
+    assert bucket.acquire("describe_dataset")
+    assert len(clock.sleeps) == 1
+
+
+def test_local_bucket_timeout(clock, budgets):
+    bucket = TokenBucket(budgets=budgets, max_wait=0.1, clock=clock, sleep=clock.sleep)
+    for _ in range(4):
+        assert bucket.acquire("list_predictors")
+    assert not bucket.acquire("list_predictors")
+
+
+def test_dynamodb_bucket_shared(clock, budgets, dynamodb):
+    first = bucket_for(
+        DynamoDBTokenBucket,
+        clock,
+        budgets,
+        table_name=TABLE_NAME,
+        get_client=lambda: dynamodb,
+    )
+    second = bucket_for(
+        DynamoDBTokenBucket,
+        clock,
+        budgets,
+        table_name=TABLE_NAME,
+        get_client=lambda: dynamodb,
+    )
+
+    # both buckets take from the same budget
+    for bucket in [first, second, first, second]:
+        assert bucket.acquire("list_predictors")
+    assert not clock.sleeps
+
+    assert second.acquire("list_predictors")
+    assert clock.sleeps == [pytest.approx(0.5)]
+    assert not first.fallback and not second.fallback
+
+    item = dynamodb.get_item(
+        TableName=TABLE_NAME, Key={"operation": {"S": "list_predictors"}}
+    )["Item"]
+    assert float(item["tokens"]["N"]) == pytest.approx(0)
+
+
+def test_dynamodb_bucket_contention(clock, budgets, dynamodb, mocker):
+    bucket = bucket_for(
+        DynamoDBTokenBucket,
+        clock,
+        budgets,
+        table_name=TABLE_NAME,
+        get_client=lambda: dynamodb,
+    )
+    assert bucket.acquire("list_predictors")
+
+    # another invocation takes a token between our first read and our write
+    get_item = dynamodb.get_item
+    races = [True]
+
+    def racing_get_item(**kwargs):
+        item = get_item(**kwargs)
+        if races:
+            races.pop()
+            dynamodb.update_item(
+                TableName=TABLE_NAME,
+                Key={"operation": {"S": "list_predictors"}},
+                UpdateExpression="SET #updated = :now",
+                ExpressionAttributeNames={"#updated": "updated"},
+                ExpressionAttributeValues={":now": {"N": repr(clock.now + 0.01)}},
+            )
+        return item
+
+    mocker.patch.object(dynamodb, "get_item", side_effect=racing_get_item)
+    assert bucket.acquire("list_predictors")
+    assert clock.sleeps == [pytest.approx(0.001)]
+
+
+def test_dynamodb_bucket_fallback(clock, budgets):
+    with mock_dynamodb():
+        cli = boto3.client("dynamodb", region_name="us-east-1")
+        bucket = bucket_for(
+            DynamoDBTokenBucket,
+            clock,
+            budgets,
+            table_name="missing",
+            get_client=lambda: cli,
+        )
+
+        for _ in range(5):
+            assert bucket.acquire("list_predictors")
+
+    assert bucket.fallback
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_dynamodb_bucket_retry(clock, budgets, dynamodb, mocker):
+    bucket = bucket_for(
+        DynamoDBTokenBucket,
+        clock,
+        budgets,
+        table_name=TABLE_NAME,
+        get_client=lambda: dynamodb,
+    )
+    get_item = mocker.patch.object(
+        dynamodb,
+        "get_item",
+        side_effect=dynamodb.exceptions.ProvisionedThroughputExceededException(
+            {"Error": {"Code": "ProvisionedThroughputExceededException"}},
+            "GetItem",
+        ),
+    )
+
+    # a throttled table is not used until the backoff has passed, and the backoff doubles while it fails
+    assert bucket.acquire("list_predictors")
+    assert bucket.fallback and bucket.retry_at == clock.now + 1
+    assert bucket.acquire("list_predictors")
+    assert get_item.call_count == 1
+
+    clock.now += 1
+    assert bucket.acquire("list_predictors")
+    assert get_item.call_count == 2
+    assert bucket.retry_at == clock.now + 2
+
+    # once the table is available, the budget is shared again
+    mocker.stopall()
+    clock.now += 2
+    assert bucket.acquire("list_predictors")
+    assert not bucket.fallback and bucket.retry_at is None
+    item = dynamodb.get_item(
+        TableName=TABLE_NAME, Key={"operation": {"S": "list_predictors"}}
+    )["Item"]
+    assert float(item["tokens"]["N"]) == pytest.approx(3)
+
+
+def test_register(clock, budgets, mocker):
+    client = mocker.MagicMock()
+    client.meta.events = HierarchicalEmitter()
+
+    bucket = bucket_for(TokenBucket, clock, budgets)
+    bucket.register(client)
+    for _ in range(5):
+        client.meta.events.emit("before-send.forecast.ListPredictors", request=None)
+
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_client_factory_rate_limiter(monkeypatch):
+    assert type(ClientFactory().rate_limiter) == TokenBucket
+
+    monkeypatch.setenv("RATE_LIMIT_TABLE", TABLE_NAME)
+    factory = ClientFactory()
+    assert isinstance(factory.rate_limiter, DynamoDBTokenBucket)
+    assert factory.rate_limiter.table_name == TABLE_NAME
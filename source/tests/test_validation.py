@@ -0,0 +1,184 @@
+# #####################################################################################################################
+#  Copyright 2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.                                            #
+#                                                                                                                     #
+#  Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance     #
+#  with the License. A copy of the License is located at                                                              #
+#                                                                                                                     #
+#  http://www.apache.org/licenses/LICENSE-2.0                                                                         #
+#                                                                                                                     #
+#  or in the 'license' file accompanying this file. This file is distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES  #
+#  OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions     #
+#  and limitations under the License.                                                                                 #
+# #####################################################################################################################
+
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pytest
+from botocore.exceptions import ParamValidationError
+from botocore.stub import Stubber
+from botocore.validate import ParamValidator
+
+from shared.validation import ModelValidator, ValidationCache, get_forecast_validator
+
+
+@pytest.fixture
+def validator():
+    return get_forecast_validator()
+
+
+def test_validator_is_global(validator):
+    assert get_forecast_validator() is validator
+
+
+def test_validator_cache_is_isolated(validator, validation_cache):
+    assert validator.cache.path == str(validation_cache)
+    validator.validate(
+        "create_dataset_group", Domain="RETAIL", DatasetGroupName="Testing123"
+    )
+    assert validation_cache.exists()
+
+
+def test_validator_operations(validator):
+    for method in [
+        "create_dataset",
+        "create_dataset_group",
+        "create_dataset_import_job",
+        "create_predictor",
+        "create_forecast",
+    ]:
+        assert method in validator.shapes
+    assert "describe_dataset" not in validator.shapes
+
+
+def test_validator_valid(validator):
+    # there should be no error in the following call
+    validator.validate(
+        "create_dataset_group", Domain="RETAIL", DatasetGroupName="Testing123"
+    )
+
+
+def test_validator_invalid(validator):
+    with pytest.raises(ParamValidationError) as excinfo:
+        validator.validate("create_dataset_group", Domain="RETAIL")
+
+    assert "DatasetGroupName" in str(excinfo.value)
+
+
+def test_validator_unknown_operation(validator):
+    with pytest.raises(ValueError):
+        validator.validate("describe_dataset_group", DatasetGroupArn="arn:")
+
+
+def test_validator_matches_stubber(validator):
+    params = {"DatasetGroupName": "Testing123", "Domain": 1, "Unknown": True}
+
+    cli = boto3.client("forecast", region_name="us-east-1")
+    with Stubber(cli) as stubber:
+        stubber.add_response("create_dataset_group", {}, params)
+        with pytest.raises(ParamValidationError) as stubber_excinfo:
+            cli.create_dataset_group(**params)
+
+    with pytest.raises(ParamValidationError) as excinfo:
+        validator.validate("create_dataset_group", **params)
+
+    assert str(excinfo.value) == str(stubber_excinfo.value)
+
+
+def test_validator_threads():
+    validator = ModelValidator("forecast")
+
+    def validate(i):
+        params = {"DatasetGroupName": f"Testing{i}", "Domain": "RETAIL"}
+        if i % 2:
+            params.pop("Domain")
+        try:
+            validator.validate("create_dataset_group", **params)
+        except ParamValidationError:
+            return False
+        return True
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(validate, range(200)))
+
+    assert results == [not i % 2 for i in range(200)]
+
+
+def test_validation_cache_fingerprint():
+    fingerprint = ValidationCache.fingerprint(
+        "create_dataset_group", {"Domain": "RETAIL", "DatasetGroupName": "a"}, "1"
+    )
+    assert fingerprint == ValidationCache.fingerprint(
+        "create_dataset_group", {"DatasetGroupName": "a", "Domain": "RETAIL"}, "1"
+    )
+    assert fingerprint != ValidationCache.fingerprint(
+        "create_dataset_group", {"DatasetGroupName": "a", "Domain": "RETAIL"}, "2"
+    )
+    assert fingerprint != ValidationCache.fingerprint(
+        "create_dataset", {"DatasetGroupName": "a", "Domain": "RETAIL"}, "1"
+    )
+    assert ValidationCache.fingerprint(
+        "create_predictor", {"ForecastHorizon": 1}, "1"
+    ) != ValidationCache.fingerprint("create_predictor", {"ForecastHorizon": "1"}, "1")
+
+
+def test_validation_cache_lru():
+    cache = ValidationCache(max_size=2)
+    cache.put("a", "")
+    cache.put("b", "error")
+    assert cache.get("a") == ""
+    cache.put("c", "")
+
+    # b was the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == ""
+    assert cache.get("c") == ""
+
+
+def test_validation_cache_persists(tmp_path):
+    path = str(tmp_path / "cache.jsonl")
+
+    cache = ValidationCache(path=path, max_size=2)
+    for i in range(10):
+        cache.put(str(i), f"error {i}")
+
+    # the file is compacted as it grows
+    with open(path) as f:
+        assert len(f.readlines()) <= 4
+
+    warm = ValidationCache(path=path, max_size=2)
+    assert warm.get("9") == "error 9"
+    assert warm.get("8") == "error 8"
+    assert warm.get("0") is None
+
+
+def test_validation_cache_corrupt(tmp_path):
+    path = tmp_path / "cache.jsonl"
+    path.write_text("this is not json")
+
+    cache = ValidationCache(path=str(path))
+    assert cache.get("this") is None
+    cache.put("a", "")
+    assert ValidationCache(path=str(path)).get("a") == ""
+
+
+def test_validator_cached(tmp_path, mocker):
+    cache = ValidationCache(path=str(tmp_path / "cache.jsonl"))
+    validator = ModelValidator("forecast", cache=cache)
+    param_validator = mocker.spy(ParamValidator, "validate")
+
+    for _ in range(3):
+        validator.validate(
+            "create_dataset_group", Domain="RETAIL", DatasetGroupName="Testing123"
+        )
+        with pytest.raises(ParamValidationError) as excinfo:
+            validator.validate("create_dataset_group", Domain="RETAIL")
+        assert "DatasetGroupName" in str(excinfo.value)
+    assert param_validator.call_count == 2
+
+    # a new container with the same /tmp skips validation entirely
+    validator = ModelValidator("forecast", cache=ValidationCache(cache.path))
+    validator.validate(
+        "create_dataset_group", Domain="RETAIL", DatasetGroupName="Testing123"
+    )
+    assert param_validator.call_count == 2